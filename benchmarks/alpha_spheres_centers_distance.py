@@ -0,0 +1,54 @@
+"""
+Cost per neighbor edge of the distance between alpha-sphere centers: pint quantities versus the
+raw arrays stored by AlphaSpheres.
+"""
+
+import time
+import numpy as np
+import topomt as tmt
+
+puw = tmt.pyunitwizard
+
+
+if __name__ == '__main__':
+
+    rng = np.random.default_rng(0)
+
+    n_points = 20000
+    side = (n_points/0.1)**(1/3)
+    points = puw.quantity(rng.random((n_points, 3))*side, 'angstroms')
+
+    min_radius = puw.quantity(3.0, 'angstroms')
+    max_radius = puw.quantity(6.0, 'angstroms')
+    aspheres = tmt.alpha_spheres.AlphaSpheres(points, min_radius=min_radius, max_radius=max_radius)
+    neighbors = aspheres.get_neighbors('edge')
+    edges = [(ii, jj) for ii, neighs in neighbors.items() for jj in neighs]
+    max_neighbor_dist = puw.quantity(1.73, 'angstroms')
+
+    # Former hot path: pint arithmetic on every edge
+
+    centers = aspheres.centers
+    start = time.perf_counter()
+    n_close = 0
+    for ii, jj in edges:
+        diff = centers[ii] - centers[jj]
+        if (diff[0]**2+diff[1]**2+diff[2]**2) ** 0.5 <= max_neighbor_dist:
+            n_close += 1
+    time_pint = time.perf_counter()-start
+
+    # Raw arrays in the length unit of the object
+
+    centers_value = aspheres._centers
+    max_neighbor_dist_value = puw.get_value(max_neighbor_dist, to_unit=aspheres.length_unit)
+    start = time.perf_counter()
+    n_close_raw = 0
+    for ii, jj in edges:
+        diff = centers_value[ii] - centers_value[jj]
+        if np.sqrt(diff @ diff) <= max_neighbor_dist_value:
+            n_close_raw += 1
+    time_raw = time.perf_counter()-start
+
+    assert n_close == n_close_raw
+
+    print(f'{len(edges)} edges | pint {time_pint/len(edges)*1e6:.2f} us/edge | '
+          f'raw arrays {time_raw/len(edges)*1e6:.2f} us/edge | speedup x{time_pint/time_raw:.1f}')
@@ -0,0 +1,61 @@
+"""
+Construction of AlphaSpheres: vectorized Delaunay build versus the former Voronoi-regions loop.
+"""
+
+import time
+import numpy as np
+from scipy.spatial import Voronoi
+from scipy.spatial.distance import euclidean
+import topomt as tmt
+
+
+def voronoi_regions_loop(points):
+
+    # Former implementation of AlphaSpheres.__init__, kept here as reference
+
+    voronoi = Voronoi(points)
+    n_alpha_spheres = voronoi.vertices.shape[0]
+
+    points_of_alpha_sphere = [[] for ii in range(n_alpha_spheres)]
+    region_point = {voronoi.point_region[ii]:ii for ii in range(points.shape[0])}
+
+    for region_index, region in enumerate(voronoi.regions):
+        if len(region)>0:
+            point_index = region_point[region_index]
+            for vertex_index in region:
+                if vertex_index != -1:
+                    points_of_alpha_sphere[vertex_index].append(point_index)
+    for ii in range(n_alpha_spheres):
+        points_of_alpha_sphere[ii] = sorted(points_of_alpha_sphere[ii])
+
+    radii = []
+    for ii in range(n_alpha_spheres):
+        radii.append(euclidean(voronoi.vertices[ii], points[points_of_alpha_sphere[ii][0]]))
+
+    return voronoi.vertices, np.array(radii), np.array(points_of_alpha_sphere)
+
+
+if __name__ == '__main__':
+
+    rng = np.random.default_rng(0)
+
+    for n_points in [5000, 20000, 60000]:
+
+        # Random cloud with the density of heavy atoms in a protein (~0.1 atoms/A^3)
+        side = (n_points/0.1)**(1/3)
+        points = rng.random((n_points, 3))*side
+
+        start = time.perf_counter()
+        centers, radii, points_of_alpha_sphere = voronoi_regions_loop(points)
+        time_loop = time.perf_counter()-start
+
+        start = time.perf_counter()
+        aspheres = tmt.alpha_spheres.AlphaSpheres(tmt.pyunitwizard.quantity(points, 'angstroms'))
+        time_vectorized = time.perf_counter()-start
+
+        assert np.array_equal(points_of_alpha_sphere, aspheres.points_of_alpha_sphere)
+        assert np.allclose(radii, tmt.pyunitwizard.get_value(aspheres.radii, to_unit='angstroms'))
+
+        print(f'{n_points:>6d} points | {aspheres.n_alpha_spheres:>7d} alpha-spheres | '
+              f'voronoi loop {time_loop:7.2f} s | delaunay vectorized {time_vectorized:7.2f} s | '
+              f'speedup x{time_loop/time_vectorized:.1f}')
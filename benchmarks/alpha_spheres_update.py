@@ -0,0 +1,43 @@
+"""
+Frames per second over a short synthetic trajectory: incremental AlphaSpheres.update versus a full
+rebuild of AlphaSpheres for every frame, for several displacements per frame.
+"""
+
+import time
+import numpy as np
+import topomt as tmt
+
+puw = tmt.pyunitwizard
+
+
+if __name__ == '__main__':
+
+    rng = np.random.default_rng(0)
+
+    n_points = 5000
+    n_frames = 20
+    side = (n_points/0.1)**(1/3)
+    min_radius = puw.quantity(3.0, 'angstroms')
+    max_radius = puw.quantity(6.0, 'angstroms')
+
+    for displacement in [0.0001, 0.001, 0.01, 0.1]:
+
+        # Random walk of the points, with a displacement per frame in angstroms
+
+        steps = rng.normal(scale=displacement, size=(n_frames, n_points, 3))
+        coordinates = rng.random((n_points, 3))*side + np.cumsum(steps, axis=0)
+        coordinates = puw.quantity(coordinates, 'angstroms')
+
+        start = time.perf_counter()
+        for frame in coordinates:
+            tmt.alpha_spheres.AlphaSpheres(frame, min_radius=min_radius, max_radius=max_radius)
+        time_rebuild = time.perf_counter()-start
+
+        aspheres = tmt.alpha_spheres.AlphaSpheres(coordinates[0], min_radius=min_radius, max_radius=max_radius)
+        start = time.perf_counter()
+        for frame in coordinates[1:]:
+            aspheres.update(frame)
+        time_update = time.perf_counter()-start
+
+        print(f'{displacement} A/frame | rebuild {n_frames/time_rebuild:.1f} fps | '
+              f'update {(n_frames-1)/time_update:.1f} fps')
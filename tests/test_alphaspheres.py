@@ -41,6 +41,10 @@ def test_alphaspheres_original_points():
 
     assert np.allclose(points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
 
+    assert alphaspheres.points_of_alpha_sphere.shape == (4, 4)
+
+    assert alphaspheres.points_of_alpha_sphere.dtype == np.int32
+
     merged_selected_point_indices = [0, 2, 3, 4, 5]
 
     assert np.allclose(merged_selected_point_indices, alphaspheres.get_points_of_alpha_spheres([1,3]))
@@ -70,3 +74,521 @@ def test_alphaspheres_original_points():
     remaining_no_small_centers= ([[-0.25, -0.75,  1.75]])
 
     assert np.allclose(remaining_no_small_centers, alphaspheres.centers)
+
+
+def test_alphaspheres_weighted_voronoi():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(0)
+    points = puw.quantity(rng.random((200, 3))*2.0, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    # With null radii the regular triangulation is the Delaunay triangulation
+
+    zero_radii = puw.quantity(np.zeros(200), 'nm')
+    weighted = pom.alpha_spheres.AlphaSpheres(points, radii=zero_radii, method='weighted_voronoi')
+
+    assert weighted.n_alpha_spheres == alphaspheres.n_alpha_spheres
+    assert set(map(tuple, weighted.points_of_alpha_sphere)) == set(map(tuple, alphaspheres.points_of_alpha_sphere))
+
+    # With finite radii, each alpha-sphere is orthogonal to the spheres of its four points
+
+    radii = puw.quantity(np.full(200, 0.15), 'nm')
+    weighted = pom.alpha_spheres.AlphaSpheres(points, radii=radii, method='weighted_voronoi')
+
+    assert weighted.n_alpha_spheres < alphaspheres.n_alpha_spheres
+
+    centers = puw.get_value(weighted.centers, to_unit='nm')
+    spheres_radii = puw.get_value(weighted.radii, to_unit='nm')
+    points_value = puw.get_value(points, to_unit='nm')
+    power = ((points_value[weighted.points_of_alpha_sphere]-centers[:,np.newaxis,:])**2).sum(axis=2) - 0.15**2
+
+    assert np.allclose(power, spheres_radii[:,np.newaxis]**2)
+
+
+def test_alphaspheres_tiled():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(1)
+    points = puw.quantity(rng.random((2000, 3))*3.0, 'nm')
+    max_radius = puw.quantity(0.4, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points, max_radius=max_radius)
+    tiled = pom.alpha_spheres.AlphaSpheres(points, max_radius=max_radius, tile_size=puw.quantity(1.0, 'nm'))
+
+    assert tiled.n_alpha_spheres == alphaspheres.n_alpha_spheres
+    assert set(map(tuple, tiled.points_of_alpha_sphere)) == set(map(tuple, alphaspheres.points_of_alpha_sphere))
+    assert np.isclose(puw.get_value(tiled.radii, to_unit='nm').sum(), puw.get_value(alphaspheres.radii, to_unit='nm').sum())
+
+
+def test_alphaspheres_radius_window():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(2)
+    points = puw.quantity(rng.random((500, 3))*2.0, 'nm')
+    min_radius = puw.quantity(0.15, 'nm')
+    max_radius = puw.quantity(0.3, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+    windowed = pom.alpha_spheres.AlphaSpheres(points, min_radius=min_radius, max_radius=max_radius)
+
+    assert np.array_equal(alphaspheres.points_of_alpha_sphere[windowed.kept_indices],
+                          windowed.points_of_alpha_sphere)
+
+    alphaspheres.remove_small_alpha_spheres(min_radius)
+    alphaspheres.remove_big_alpha_spheres(max_radius)
+
+    assert windowed.n_alpha_spheres == alphaspheres.n_alpha_spheres
+    assert np.array_equal(windowed.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
+    assert np.allclose(windowed.radii, alphaspheres.radii)
+    assert np.array_equal(windowed.kept_indices, alphaspheres.kept_indices)
+
+
+def test_alphaspheres_unit_free_storage():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(3)
+    points = puw.quantity(rng.random((100, 3))*20.0, 'angstroms')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    assert isinstance(alphaspheres._centers, np.ndarray)
+    assert isinstance(alphaspheres._radii, np.ndarray)
+    assert puw.is_quantity(alphaspheres.centers)
+    assert puw.is_quantity(alphaspheres.radii)
+    assert np.allclose(puw.get_value(alphaspheres.points, to_unit='angstroms'), puw.get_value(points, to_unit='angstroms'))
+
+    distance = alphaspheres.get_centers_distance(0, 1)
+    diff = alphaspheres._centers[0]-alphaspheres._centers[1]
+
+    assert np.isclose(puw.get_value(distance, to_unit=alphaspheres.length_unit), np.sqrt(diff @ diff))
+
+
+def test_alphaspheres_neighbor_graph():
+
+    points = ([[-1.,  2.,  0.],
+               [ 0.,  2.,  1.],
+               [ 1., -2.,  1.],
+               [ 0.,  1.,  1.],
+               [ 0.,  0.,  0.],
+               [-1., -1.,  0.]])
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    graph = alphaspheres.get_neighbor_graph('face', weighted=True)
+
+    assert graph.shape == (4, 4)
+    assert (graph != graph.T).nnz == 0
+    assert np.all(graph.data == 3)
+    assert alphaspheres.get_neighbors('face') == {0: [1, 2], 1: [0, 3], 2: [0, 3], 3: [1, 2]}
+
+    graph = alphaspheres.get_neighbor_graph('point', weighted=True)
+
+    assert graph.nnz == 12
+    assert alphaspheres.get_neighbors('point') == {0: [1, 2, 3], 1: [0, 2, 3], 2: [0, 1, 3], 3: [0, 1, 2]}
+
+
+def test_alphaspheres_centers_distances():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(4)
+    points = puw.quantity(rng.random((100, 3))*2.0, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    pairs = np.array([[0, 1], [2, 3], [4, 4]])
+    distances = puw.get_value(alphaspheres.get_centers_distances(pairs), to_unit='nm')
+    expected = [puw.get_value(alphaspheres.get_centers_distance(ii, jj), to_unit='nm') for ii, jj in pairs]
+
+    assert np.allclose(distances, expected)
+
+    graph = alphaspheres.get_neighbor_graph('face')
+    lengths = puw.get_value(alphaspheres.get_edge_lengths(graph), to_unit='nm')
+    rows, cols = graph.nonzero()
+    expected = puw.get_value(alphaspheres.get_centers_distances(np.column_stack([rows, cols])), to_unit='nm')
+
+    assert lengths.shape == (graph.nnz,)
+    assert np.allclose(lengths, expected)
+
+
+def test_alphaspheres_save_load(tmp_path):
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(5)
+    points = puw.quantity(rng.random((100, 3))*2.0, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points, max_radius=puw.quantity(0.5, 'nm'))
+
+    for path in [tmp_path / 'bundle', tmp_path / 'archive.npz']:
+
+        alphaspheres.save(path)
+        loaded = pom.alpha_spheres.AlphaSpheres.load(path)
+
+        assert loaded.n_alpha_spheres == alphaspheres.n_alpha_spheres
+        assert np.array_equal(loaded.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
+        assert np.allclose(puw.get_value(loaded.radii, to_unit='nm'), puw.get_value(alphaspheres.radii, to_unit='nm'))
+
+    assert isinstance(pom.alpha_spheres.AlphaSpheres.load(tmp_path / 'bundle')._centers, np.memmap)
+
+    cached = pom.alpha_spheres.AlphaSpheres.from_cache(tmp_path / 'cache', points, max_radius=puw.quantity(0.5, 'nm'))
+    reloaded = pom.alpha_spheres.AlphaSpheres.from_cache(tmp_path / 'cache', points, max_radius=puw.quantity(0.5, 'nm'))
+
+    assert isinstance(reloaded._centers, np.memmap)
+    assert np.array_equal(reloaded.points_of_alpha_sphere, cached.points_of_alpha_sphere)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_alphaspheres_trajectory():
+
+    from topomt.alpha_spheres.alpha_spheres_trajectory import _get_alpha_spheres_trajectory
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(6)
+    coordinates = puw.quantity(rng.random((3, 100, 3))*2.0, 'nm')
+    max_radius = puw.quantity(0.5, 'nm')
+
+    serial = _get_alpha_spheres_trajectory(coordinates, [0, 1, 2], max_radius=max_radius)
+    pool = _get_alpha_spheres_trajectory(coordinates, [0, 1, 2], max_radius=max_radius, n_workers=2)
+
+    assert len(pool) == 3
+    assert np.array_equal(serial.n_alpha_spheres, pool.n_alpha_spheres)
+
+    for index, frame in enumerate(pool):
+        alphaspheres = pom.alpha_spheres.AlphaSpheres(coordinates[index], max_radius=max_radius)
+        assert np.array_equal(frame.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
+        assert np.allclose(frame._centers, alphaspheres._centers)
+
+    assert len(pool[1:]) == 2
+
+
+def test_alphaspheres_trajectory_lazy(monkeypatch):
+
+    from topomt.alpha_spheres import alpha_spheres_trajectory
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(6)
+    coordinates = puw.quantity(rng.random((5, 100, 3))*2.0, 'nm')
+    max_radius = puw.quantity(0.5, 'nm')
+
+    built = []
+    build = alpha_spheres_trajectory._build_frame_alpha_spheres
+
+    def counted_build(points, *parameters):
+        built.append(points)
+        return build(points, *parameters)
+
+    monkeypatch.setattr(alpha_spheres_trajectory, '_build_frame_alpha_spheres', counted_build)
+
+    trajectory = alpha_spheres_trajectory._get_alpha_spheres_trajectory(coordinates, np.arange(5),
+                                                                        max_radius=max_radius)
+    assert len(built) == 0
+
+    frame = trajectory[3]
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(coordinates[3], max_radius=max_radius)
+
+    assert len(built) == 1
+    assert np.array_equal(frame.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
+    assert len(trajectory[1:3]) == 2
+    assert len(built) == 1
+
+    n_alpha_spheres = trajectory.n_alpha_spheres
+    assert len(built) == 6
+    assert n_alpha_spheres[3] == alphaspheres.n_alpha_spheres
+    assert trajectory.n_alpha_spheres is n_alpha_spheres
+    assert len(built) == 6
+
+
+def test_alphaspheres_trajectory_pbc():
+
+    from topomt.alpha_spheres.alpha_spheres_trajectory import _get_alpha_spheres_trajectory
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(6)
+    coordinates = puw.quantity(rng.random((2, 200, 3))*2.0, 'nm')
+    boxes = puw.quantity(np.array([np.eye(3)*2.0, np.eye(3)*2.1]), 'nm')
+    max_radius = puw.quantity(0.4, 'nm')
+
+    trajectory = _get_alpha_spheres_trajectory(coordinates, [0, 1], max_radius=max_radius, box=boxes,
+                                               n_workers=2)
+
+    for index, frame in enumerate(trajectory):
+        alphaspheres = pom.alpha_spheres.AlphaSpheres(coordinates[index], max_radius=max_radius,
+                                                      box=boxes[index])
+        assert np.array_equal(frame.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere)
+        assert np.allclose(frame._centers, alphaspheres._centers)
+
+    assert np.array_equal(trajectory[1:]._boxes, trajectory._boxes[1:])
+
+    with pytest.raises(Exception):
+        _get_alpha_spheres_trajectory(coordinates, [0, 1], box=boxes)
+
+    with pytest.raises(Exception):
+        _get_alpha_spheres_trajectory(coordinates, [0, 1], max_radius=puw.quantity(1.2, 'nm'), box=boxes)
+
+
+def test_alphaspheres_update():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(7)
+    points = rng.random((300, 3))*3.0
+    max_radius = puw.quantity(0.6, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=max_radius)
+
+    for scale in [0.0001, 0.001, 0.1]:
+
+        points = points + rng.normal(scale=scale, size=points.shape)
+        alphaspheres.update(puw.quantity(points, 'nm'))
+        expected = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=max_radius)
+
+        order = np.lexsort(alphaspheres.points_of_alpha_sphere.T[::-1])
+        expected_order = np.lexsort(expected.points_of_alpha_sphere.T[::-1])
+
+        assert np.array_equal(alphaspheres.points_of_alpha_sphere[order], expected.points_of_alpha_sphere[expected_order])
+        assert np.allclose(alphaspheres._radii[order], expected._radii[expected_order])
+        assert np.array_equal(alphaspheres._simplices[alphaspheres.kept_indices], alphaspheres.points_of_alpha_sphere)
+
+
+def test_alphaspheres_update_face_keys(monkeypatch):
+
+    from topomt.alpha_spheres import _incremental
+
+    # Faces of more than 2**21 points do not fit in an int64 key
+
+    n_points = 3_000_000
+    faces = np.array([[n_points-3, n_points-2, n_points-1],
+                      [n_points-4, n_points-2, n_points-1],
+                      [n_points-3, n_points-2, n_points-1]])
+    keys = _incremental._get_face_keys(faces, n_points)
+
+    assert keys[0] == keys[2]
+    assert keys[0] != keys[1]
+
+    # The update with the keys of the large systems is the one with the integer keys
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(7)
+    points = rng.random((300, 3))*3.0
+    max_radius = puw.quantity(0.6, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=max_radius)
+    neighbors = _incremental._get_simplex_neighbors(alphaspheres._simplices)
+
+    monkeypatch.setattr(_incremental, '_MAX_FACE_KEY_POINTS', 0)
+
+    assert np.array_equal(_incremental._get_simplex_neighbors(alphaspheres._simplices), neighbors)
+
+    # Small enough displacements for the local repair of the triangulation
+    points = points + rng.normal(scale=0.0001, size=points.shape)
+    alphaspheres.update(puw.quantity(points, 'nm'))
+    expected = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=max_radius)
+
+    order = np.lexsort(alphaspheres.points_of_alpha_sphere.T[::-1])
+    expected_order = np.lexsort(expected.points_of_alpha_sphere.T[::-1])
+
+    assert np.array_equal(alphaspheres.points_of_alpha_sphere[order], expected.points_of_alpha_sphere[expected_order])
+
+
+def test_alphaspheres_point_elements():
+
+    points = ([[-1.,  2.,  0.],
+               [ 0.,  2.,  1.],
+               [ 1.,  2.,  0.],
+               [ 0.,  2., -1.],
+               [ 0.,  0.,  0.],
+               [-1., -1.,  0.]])
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    assert alphaspheres.is_apolar is None
+
+    alphaspheres.set_point_elements(['C', 'N', 'C', 'O', 'S', 'Cl'])
+
+    is_polar = np.array([False, True, False, True, False, True])
+    expected = is_polar[alphaspheres.points_of_alpha_sphere].sum(axis=1)
+
+    assert np.array_equal(alphaspheres.n_polar_contacts, expected)
+    assert np.array_equal(alphaspheres.is_apolar, expected <= 1)
+
+    with pytest.raises(Exception):
+        alphaspheres.set_point_elements(['C', 'N'])
+
+
+def test_alphaspheres_buriedness():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(8)
+    points = rng.random((200, 3))*3.0
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'))
+    shell_radii = puw.quantity([3.0, 6.0], 'angstroms')
+
+    counts = alphaspheres.get_buriedness(shell_radii)
+    distances = np.linalg.norm(alphaspheres._centers[:,np.newaxis,:] - points[np.newaxis,:,:], axis=2)
+
+    assert counts.shape == (alphaspheres.n_alpha_spheres, 2)
+    assert np.array_equal(counts[:,0], (distances <= 0.3).sum(axis=1))
+    assert np.array_equal(counts[:,1], (distances <= 0.6).sum(axis=1))
+    assert np.array_equal(alphaspheres.get_buriedness(puw.quantity(0.6, 'nm')), counts[:,1])
+
+
+def test_alphaspheres_point_to_alpha_spheres():
+
+    rng = np.random.default_rng(9)
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(rng.random((60, 3)))
+
+    point_to_alpha_spheres = alphaspheres.get_point_to_alpha_spheres()
+
+    assert point_to_alpha_spheres.shape == (alphaspheres.n_points, alphaspheres.n_alpha_spheres)
+    assert alphaspheres.get_point_to_alpha_spheres() is point_to_alpha_spheres
+    for point in [0, 10, 59]:
+        expected = np.nonzero(np.any(alphaspheres.points_of_alpha_sphere == point, axis=1))[0]
+        assert np.array_equal(point_to_alpha_spheres[point].indices, expected)
+
+    expected = sorted(set(alphaspheres.points_of_alpha_sphere[[1, 3, 5]].ravel().tolist()))
+    assert alphaspheres.get_points_of_alpha_spheres([1, 3, 5]) == expected
+
+    alphaspheres.remove_alpha_spheres([0, 1])
+
+    assert alphaspheres.get_point_to_alpha_spheres().shape == (alphaspheres.n_points, alphaspheres.n_alpha_spheres)
+
+
+def test_alphaspheres_subset_view():
+
+    rng = np.random.default_rng(10)
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(rng.random((80, 3)))
+
+    view = alphaspheres.subset(np.arange(0, alphaspheres.n_alpha_spheres, 2))
+    subview = view.subset([0, 1, 2, 3, 4])
+    subview.remove_alpha_spheres([1])
+
+    assert subview.parent is alphaspheres
+    assert np.array_equal(subview.indices, [0, 4, 6, 8])
+    assert np.array_equal(subview.points_of_alpha_sphere, alphaspheres.points_of_alpha_sphere[[0, 4, 6, 8]])
+    assert np.array_equal(subview._radii, alphaspheres._radii[[0, 4, 6, 8]])
+    assert subview.n_alpha_spheres == 4
+    assert view.n_alpha_spheres == (alphaspheres.n_alpha_spheres + 1) // 2
+
+    graph = subview.get_neighbor_graph('point')
+    assert graph.shape == (4, 4)
+
+    copy = subview.to_alpha_spheres()
+    assert np.array_equal(copy._centers, alphaspheres._centers[[0, 4, 6, 8]])
+
+
+def test_alphaspheres_show_buffers():
+
+    class Shape():
+        def __init__(self):
+            self.buffers = []
+        def add_buffer(self, name, **kwargs):
+            self.buffers.append((name, kwargs))
+
+    class View():
+        def __init__(self):
+            self.shape = Shape()
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(11)
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(puw.quantity(rng.random((100, 3)), 'nm'))
+
+    view = alphaspheres.show_alpha_spheres(view=View())
+    (_, points_buffer), (_, spheres_buffer) = view.shape.buffers
+
+    assert len(points_buffer['radius']) == 100
+    assert len(spheres_buffer['radius']) == alphaspheres.n_alpha_spheres
+    assert len(spheres_buffer['position']) == len(spheres_buffer['color']) == 3*alphaspheres.n_alpha_spheres
+
+    view = alphaspheres.show_alpha_spheres(view=View(), show_points=False, max_spheres=50, sampling='random', seed=0)
+    (_, spheres_buffer), = view.shape.buffers
+
+    assert len(spheres_buffer['radius']) == 50
+
+
+def test_alphaspheres_periodic():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(11)
+    points = rng.random((400, 3))*2.0
+    box = puw.quantity(np.diag([2.0, 2.0, 2.0]), 'nm')
+    max_radius = puw.quantity(0.3, 'nm')
+
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=max_radius, box=box)
+
+    # Same alpha-spheres as the 27 copies of the cell, centered in the primary cell
+    shifts = np.array([[i, j, k] for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)])*2.0
+    replicas = pom.alpha_spheres.AlphaSpheres(puw.quantity((points[np.newaxis] + shifts[:,np.newaxis]).reshape(-1, 3), 'nm'),
+                                              max_radius=max_radius)
+    inside = np.all((replicas._centers >= 0.0) & (replicas._centers < 2.0), axis=1)
+    expected = np.sort(replicas.points_of_alpha_sphere[inside] % 400, axis=1)
+
+    assert alphaspheres.n_alpha_spheres == np.count_nonzero(inside)
+    assert set(map(tuple, alphaspheres.points_of_alpha_sphere)) == set(map(tuple, expected))
+    assert np.all((alphaspheres._centers >= 0.0) & (alphaspheres._centers < 2.0))
+
+    # Invariant under a translation of the points
+    shifted = pom.alpha_spheres.AlphaSpheres(puw.quantity(points + 0.7, 'nm'), max_radius=max_radius, box=box)
+
+    assert set(map(tuple, shifted.points_of_alpha_sphere)) == set(map(tuple, alphaspheres.points_of_alpha_sphere))
+    assert np.isclose(shifted._radii.sum(), alphaspheres._radii.sum())
+
+    # Distances between centers with the minimum image convention
+    distances = puw.get_value(alphaspheres.get_centers_distances([[0, 1], [1, 2]]), to_unit='nm')
+    assert np.all(distances <= np.sqrt(3.0))
+
+    with pytest.raises(Exception):
+        pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), box=box)
+
+    # An alpha-sphere wider than half the cell could touch two images of the same point
+    with pytest.raises(Exception):
+        pom.alpha_spheres.AlphaSpheres(puw.quantity(points, 'nm'), max_radius=puw.quantity(1.2, 'nm'), box=box)
+
+
+def test_alphaspheres_volumes():
+
+    puw = pom.pyunitwizard
+
+    rng = np.random.default_rng(5)
+    points = puw.quantity(rng.random((200, 3))*2.0, 'nm')
+    alphaspheres = pom.alpha_spheres.AlphaSpheres(points)
+
+    # Union of two alpha-spheres: sum of the volumes minus the lens of the intersection
+    radii = puw.get_value(alphaspheres.radii, to_unit='nm')
+    ii = int(np.argmax(radii))
+    distances = puw.get_value(alphaspheres.get_centers_distances([[ii, jj] for jj in range(alphaspheres.n_alpha_spheres)]),
+                              to_unit='nm')
+    overlapping = (distances > 0.0) & (distances < radii[ii] + radii - 1e-3) & (distances > np.abs(radii[ii] - radii) + 1e-3)
+    jj = int(np.nonzero(overlapping)[0][0])
+    r1, r2, d = radii[ii], radii[jj], distances[jj]
+    lens = np.pi*(r1 + r2 - d)**2*(d**2 + 2*d*(r1 + r2) - 3*(r1 - r2)**2)/(12*d)
+    expected = np.array([4.0/3.0*np.pi*r1**3, 4.0/3.0*np.pi*(r1**3 + r2**3) - lens])
+
+    groups = [[ii], [ii, jj]]
+
+    volumes, errors = alphaspheres.get_volumes(groups, seed=0, return_errors=True)
+    assert np.allclose(puw.get_value(volumes, to_unit='nm**3'), expected, rtol=0.05)
+    assert np.all(errors <= 0.01)
+
+    same_volumes = alphaspheres.get_volumes(groups, seed=0)
+    assert np.array_equal(puw.get_value(volumes), puw.get_value(same_volumes))
+
+    grid_volumes = alphaspheres.get_volumes(groups, method='grid')
+    assert np.allclose(puw.get_value(grid_volumes, to_unit='nm**3'), expected, rtol=0.05)
+
+    with pytest.raises(Exception):
+        alphaspheres.get_volumes([[]])
@@ -0,0 +1,32 @@
+"""
+Unit to test the Profiler of the pocket pipelines
+"""
+
+import topomt as tmt
+import numpy as np
+from topomt.methods.profiler import _get_profiler
+
+def test_profiler_stages():
+
+    with tmt.methods.Profiler() as profiler:
+        with _get_profiler() as active:
+            with active.stage('build', n_points=10):
+                array = np.ones(1000000)
+                active.count(n_spheres=3)
+
+    report = profiler.report
+
+    assert active is profiler
+    assert [record['name'] for record in report['stages']] == ['build']
+    assert report['stages'][0]['counters'] == {'n_points': 10, 'n_spheres': 3}
+    assert report['stages'][0]['wall_time'] > 0.0
+    assert report['stages'][0]['peak_memory'] >= array.nbytes
+
+
+def test_profiler_disabled():
+
+    with _get_profiler(False) as profiler:
+        with profiler.stage('build'):
+            profiler.count(n_points=10)
+
+    assert not isinstance(profiler, tmt.methods.Profiler)
@@ -80,3 +80,308 @@ def test_Topography_new_pocket(topography_empty_1tcd):
     assert topography._make_next_feature_id('pocket')=='POC-2'
     assert topography._make_next_feature_id('void')=='VOI-1'
 
+
+
+def test_Topography_pockets_from_alpha_spheres():
+
+    import numpy as np
+    from topomt.methods._pockets import _add_pockets_to_topography
+
+    rng = np.random.default_rng(0)
+    points = tmt.pyunitwizard.quantity(rng.random((300, 3))*2.0, 'nm')
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(points)
+
+    topography = tmt.Topography()
+    pockets = [list(range(0, 50)), [], list(range(100, 130))]
+    feature_ids = _add_pockets_to_topography(topography, alpha_spheres, pockets, np.arange(300) + 1000)
+
+    assert feature_ids == ['POC-1', 'POC-2']
+    assert isinstance(topography['POC-1'], Pocket)
+    assert topography['POC-2'].n_alpha_spheres == 30
+    assert topography['POC-1'].atom_indices == [ii + 1000 for ii in alpha_spheres.get_points_of_alpha_spheres(pockets[0])]
+    assert np.allclose(tmt.pyunitwizard.get_value(topography['POC-2'].center, to_unit='nm'),
+                       alpha_spheres._centers[100:130].mean(axis=0))
+
+
+def test_pocket_descriptors():
+
+    import numpy as np
+    from topomt.methods._pockets import _get_pocket_descriptors
+    from topomt.alpha_spheres._chemistry import _get_hydropathy
+
+    rng = np.random.default_rng(0)
+    points = tmt.pyunitwizard.quantity(rng.random((400, 3))*3.0, 'nm')
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(points)
+    elements = rng.choice(['C', 'N', 'O', 'S'], 400)
+    alpha_spheres.set_point_elements(elements)
+    hydropathy = _get_hydropathy(rng.choice(['ALA', 'LEU', 'ASP', 'HOH'], 400))
+
+    pockets = [list(range(0, 50)), list(range(100, 130))]
+    descriptors = _get_pocket_descriptors(alpha_spheres, pockets, point_hydropathy=hydropathy,
+                                          buriedness_radius=tmt.pyunitwizard.quantity(0.8, 'nm'))
+
+    for ii, pocket in enumerate(pockets):
+        lining = alpha_spheres.get_points_of_alpha_spheres(pocket)
+        assert descriptors['n_atoms'][ii] == len(lining)
+        assert np.isclose(descriptors['polarity'][ii], np.isin(elements[lining], ['N', 'O']).mean())
+        assert np.isclose(descriptors['hydrophobicity'][ii], np.nanmean(hydropathy[lining]))
+        assert np.isclose(descriptors['apolar_fraction'][ii], alpha_spheres.is_apolar[pocket].mean())
+
+    assert 'druggability_score' not in descriptors
+    assert np.all((descriptors['heuristic_druggability'] > 0.0) & (descriptors['heuristic_druggability'] < 1.0))
+
+    # Absolute per-pocket values: the same with or without the other pockets
+    counts = alpha_spheres.get_buriedness(tmt.pyunitwizard.quantity(0.8, 'nm'))
+    alone = _get_pocket_descriptors(alpha_spheres, pockets[1:], point_hydropathy=hydropathy,
+                                    buriedness_radius=tmt.pyunitwizard.quantity(0.8, 'nm'))
+
+    assert np.isclose(descriptors['buriedness'][1], counts[pockets[1]].mean())
+    for key in ['buriedness', 'score', 'heuristic_druggability']:
+        assert np.isclose(alone[key][0], descriptors[key][1])
+
+
+def test_pocket_features_buriedness_radius():
+
+    import numpy as np
+    from topomt.methods._pockets import _add_pockets_to_topography
+
+    class FeatureRecorder():
+        def __init__(self):
+            self.features = []
+        def add_new_feature(self, **kwargs):
+            self.features.append(kwargs)
+            return str(len(self.features) - 1)
+
+    rng = np.random.default_rng(0)
+    points = tmt.pyunitwizard.quantity(rng.random((400, 3))*3.0, 'nm')
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(points)
+    pockets = [list(range(0, 50)), list(range(100, 130))]
+
+    # The buriedness of the features uses the radius passed, not the 8 angstroms of the pipelines
+    for radius in [0.5, 1.2]:
+        buriedness_radius = tmt.pyunitwizard.quantity(radius, 'nm')
+        topography = FeatureRecorder()
+        _add_pockets_to_topography(topography, alpha_spheres, pockets, np.arange(400),
+                                   buriedness_radius=buriedness_radius)
+        counts = alpha_spheres.get_buriedness(buriedness_radius)
+
+        for pocket, feature in zip(pockets, topography.features):
+            assert feature['buriedness_radius'] is buriedness_radius
+            assert np.isclose(feature['buriedness'], counts[pocket].mean())
+
+
+def test_fpocket4_sparse_single_linkage():
+
+    import numpy as np
+    from scipy.spatial.distance import pdist
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from topomt.methods.fpocket4 import _fpocket4_clustering
+
+    rng = np.random.default_rng(0)
+    points = tmt.pyunitwizard.quantity(rng.random((400, 3))*3.0, 'nm')
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(points)
+
+    # Same clusters as cutting the single-linkage dendrogram, numbered by their first alpha-sphere
+    for distance_metric, metric in [('e', 'euclidean'), ('b', 'cityblock')]:
+        pockets = _fpocket4_clustering(alpha_spheres, tmt.pyunitwizard.quantity(0.1, 'nm'), 's', distance_metric,
+                                       1, None)
+        labels = fcluster(linkage(pdist(alpha_spheres._centers, metric=metric), method='single'), t=0.1,
+                          criterion='distance')
+        expected = {tuple(np.nonzero(labels == label)[0]) for label in np.unique(labels)}
+
+        assert set(map(tuple, pockets)) == expected
+        assert [pocket[0] for pocket in pockets] == sorted(pocket[0] for pocket in pockets)
+
+
+def test_fpocket4_partitioned_linkage():
+
+    import numpy as np
+    from scipy.spatial.distance import pdist
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from topomt.methods.fpocket4 import _fpocket4_clustering
+
+    rng = np.random.default_rng(0)
+    points = tmt.pyunitwizard.quantity(rng.random((400, 3))*3.0, 'nm')
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(points)
+
+    # Linkage per connected component, with the same clusters as the global dendrogram
+    for linkage_method, method in [('m', 'complete'), ('a', 'average'), ('c', 'centroid')]:
+        pockets = _fpocket4_clustering(alpha_spheres, tmt.pyunitwizard.quantity(0.1, 'nm'), linkage_method, 'e',
+                                       1, None, n_workers=2)
+        labels = fcluster(linkage(pdist(alpha_spheres._centers), method=method), t=0.1, criterion='distance')
+        expected = {tuple(np.nonzero(labels == label)[0]) for label in np.unique(labels)}
+
+        assert set(map(tuple, pockets)) == expected
+
+
+def test_fpocket4_pocket_order():
+
+    import numpy as np
+    from scipy.spatial.distance import pdist
+    from scipy.cluster.hierarchy import linkage
+    from topomt.methods import PocketDendrogram
+    from topomt.methods.fpocket4 import _fpocket4_clustering
+
+    puw = tmt.pyunitwizard
+
+    rng = np.random.default_rng(0)
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(puw.quantity(rng.random((400, 3))*3.0, 'nm'))
+
+    # Pockets sorted by their lowest alpha-sphere index, not by the labels of fcluster
+    for linkage_method, method in [('s', 'single'), ('m', 'complete'), ('a', 'average'), ('c', 'centroid')]:
+        pockets = _fpocket4_clustering(alpha_spheres, puw.quantity(0.1, 'nm'), linkage_method, 'e', 2, None)
+        dendrogram = PocketDendrogram(alpha_spheres, linkage(pdist(alpha_spheres._centers), method=method),
+                                      linkage_method=method)
+
+        assert len(pockets) > 1
+        assert [pocket[0] for pocket in pockets] == sorted(pocket[0] for pocket in pockets)
+        assert all(pocket == sorted(pocket) for pocket in pockets)
+        assert dendrogram.cut(puw.quantity(0.1, 'nm'), min_pock_nb_asph=2) == pockets
+
+def test_fpocket4_centroid_inversion():
+
+    import numpy as np
+    from scipy.spatial.distance import pdist
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from topomt.methods.fpocket4 import _get_partitioned_linkage_labels
+
+    # First component: the first two points merge at 0.9, above the cut, and the third one joins
+    # their centroid at 0.87 (an inversion). The second component, a single point, is farther
+    # than the cut from every point of the first one but only 0.85 from that centroid.
+    points = np.array([[0.0, 0.0, 0.0], [0.9, 0.0, 0.0], [0.45, 0.87, 0.0], [0.45, -0.85, 0.0]])
+    components = np.array([0, 0, 0, 1])
+    cut = 0.88
+
+    assert np.all(pdist(points)[[2, 4, 5]] > cut)
+    assert _get_partitioned_linkage_labels(points, components, cut, 'centroid', 'euclidean') is None
+
+    # Far from the centroid, the linkage per component is the global one
+    points[3] = [0.45, -2.0, 0.0]
+    labels = _get_partitioned_linkage_labels(points, components, cut, 'centroid', 'euclidean')
+    expected = fcluster(linkage(pdist(points), method='centroid'), t=cut, criterion='distance')
+
+    assert labels is not None
+    assert {tuple(np.nonzero(labels == label)[0]) for label in np.unique(labels)} == \
+           {tuple(np.nonzero(expected == label)[0]) for label in np.unique(expected)}
+
+def test_pocket_dendrogram():
+
+    import numpy as np
+    from scipy.spatial.distance import pdist
+    from scipy.cluster.hierarchy import linkage
+    from topomt.methods import PocketDendrogram
+    from topomt.methods.fpocket4 import _fpocket4_clustering
+
+    puw = tmt.pyunitwizard
+
+    rng = np.random.default_rng(0)
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(puw.quantity(rng.random((400, 3))*3.0, 'nm'))
+
+    for linkage_method, method in [('s', 'single'), ('a', 'average'), ('c', 'centroid')]:
+        dendrogram = PocketDendrogram(alpha_spheres, linkage(pdist(alpha_spheres._centers), method=method),
+                                      linkage_method=method)
+        cuts = np.arange(0.02, 0.3, 0.02)
+
+        for cut in cuts:
+            assert dendrogram.cut(puw.quantity(cut, 'nm'), min_pock_nb_asph=5) == \
+                   _fpocket4_clustering(alpha_spheres, puw.quantity(cut, 'nm'), linkage_method, 'e', 5, None)
+
+        counts = dendrogram.get_pocket_counts(puw.quantity(cuts, 'nm'), min_pock_nb_asph=5)
+        assert counts.tolist() == [len(dendrogram.cut(puw.quantity(cut, 'nm'), min_pock_nb_asph=5)) for cut in cuts]
+
+    # A single alpha-sphere is one pocket of size 1, kept by the same size filter in both paths
+
+    alpha_spheres.remove_alpha_spheres(np.arange(1, alpha_spheres.n_alpha_spheres))
+    dendrogram = PocketDendrogram(alpha_spheres, np.zeros((0, 4)))
+
+    for min_pock_nb_asph, pockets in [(1, [[0]]), (2, [])]:
+        assert dendrogram.cut(puw.quantity(0.1, 'nm'), min_pock_nb_asph=min_pock_nb_asph) == pockets
+        assert _fpocket4_clustering(alpha_spheres, puw.quantity(0.1, 'nm'), 's', 'e', min_pock_nb_asph, None) == pockets
+        assert dendrogram.get_pocket_counts(puw.quantity([0.1], 'nm'), min_pock_nb_asph).tolist() == [len(pockets)]
+
+
+def test_fpocket2_sweep():
+
+    import itertools
+
+    pdb_file = tmt.demo['TcTIM']['1tcd.pdb']
+    puw = tmt.pyunitwizard
+
+    param_grid = {'min_radius': [puw.quantity(3.0, 'angstroms'), puw.quantity(3.2, 'angstroms')],
+                  'min_buriedness': [None, 60],
+                  'max_neighbor_dist': [puw.quantity(1.73, 'angstroms'), puw.quantity(2.0, 'angstroms')],
+                  'max_cluster_dist': [puw.quantity(4.5, 'angstroms'), puw.quantity(5.0, 'angstroms')]}
+
+    # Same pockets as running fpocket2 once per combination
+    results = tmt.methods.fpocket2_sweep(pdb_file, param_grid, min_spheres_per_pocket=10)
+
+    assert len(results) == 16
+    for params, pockets in results:
+        assert pockets == tmt.methods.fpocket2(pdb_file, min_spheres_per_pocket=10, **params)
+
+    # The parameters returned are the entries given, not their digested values
+    combinations = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    assert all(params == combination and all(params[name] is combination[name] for name in params)
+               for (params, _), combination in zip(results, combinations))
+
+    param_list = [{'max_pair_dist': '2.5 angstroms'}, {'max_pair_dist': '3.0 angstroms', 'min_contacts': 3}]
+    results = tmt.methods.fpocket2_sweep(pdb_file, param_list, min_spheres_per_pocket=10)
+
+    assert [params for params, _ in results] == param_list
+    assert all(params is entry for (params, _), entry in zip(results, param_list))
+
+
+def _fpocket2_step3_reference(centers, clusters, max_pair_dist, min_contacts):
+
+    # Paso 3 original: un árbol por cluster y todas las parejas de clusters
+
+    from scipy.spatial import cKDTree
+    from topomt._private.edges_list import connected_components_union_find
+
+    trees = [cKDTree(centers[cluster]) for cluster in clusters]
+    contacts = {}
+    edges = []
+    for ii in range(len(clusters)):
+        if len(clusters[ii]) < min_contacts:
+            continue
+        for jj in range(ii + 1, len(clusters)):
+            if len(clusters[jj]) < min_contacts:
+                continue
+            n_pairs = sum(len(lst) for lst in trees[ii].query_ball_tree(trees[jj], r=max_pair_dist))
+            contacts[(ii, jj)] = n_pairs
+            if n_pairs >= min_contacts:
+                edges.append([ii, jj])
+
+    if not edges:
+        return clusters, contacts
+
+    pockets = [[sphere for idx in group for sphere in clusters[idx]]
+               for group in connected_components_union_find(edges)]
+
+    return pockets, contacts
+
+
+def test_fpocket2_step3():
+
+    import numpy as np
+    from topomt.methods.fpocket2 import _fpocket2_step3
+
+    puw = tmt.pyunitwizard
+
+    rng = np.random.default_rng(3)
+    alpha_spheres = tmt.alpha_spheres.AlphaSpheres(puw.quantity(rng.random((300, 3))*3.0, 'nm'))
+
+    # Many small clusters, sorted by size as step 2 leaves them
+    order = rng.permutation(alpha_spheres.n_alpha_spheres)
+    bounds = np.cumsum(rng.integers(1, 6, size=alpha_spheres.n_alpha_spheres))
+    clusters = [chunk.tolist() for chunk in np.split(order, bounds[bounds < order.shape[0]])]
+    clusters.sort(key=len, reverse=True)
+
+    for max_pair_dist, min_contacts in [(0.1, 1), (0.15, 2), (0.2, 3)]:
+        pockets = _fpocket2_step3(alpha_spheres, [cluster.copy() for cluster in clusters],
+                                  puw.quantity(max_pair_dist, 'nm'), min_contacts)
+        expected, contacts = _fpocket2_step3_reference(alpha_spheres._centers, clusters, max_pair_dist,
+                                                       min_contacts)
+
+        assert min_contacts in contacts.values()
+        assert pockets == expected
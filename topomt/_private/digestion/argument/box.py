@@ -0,0 +1,16 @@
+import numpy as np
+from topomt import pyunitwizard as puw
+from ...exceptions import ArgumentError
+
+def digest_box(box, caller=None):
+
+    if box is None:
+        return None
+
+    if puw.is_quantity(box):
+        if puw.check(box, dimensionality={'[L]':1}):
+            value = np.asarray(puw.get_value(box))
+            if value.shape in [(3,3), (1,3,3)]:
+                return puw.standardize(box)
+
+    raise ArgumentError('box', value=box, caller=caller, message=None)
@@ -0,0 +1,11 @@
+import numpy as np
+from topomt import pyunitwizard as puw
+from ...exceptions import ArgumentError
+
+def digest_buriedness_radius(buriedness_radius, caller=None):
+
+    if puw.is_quantity(buriedness_radius):
+        if puw.check(buriedness_radius, dimensionality={'[L]':1}):
+            return puw.standardize(buriedness_radius)
+
+    raise ArgumentError('buriedness_radius', value=buriedness_radius, caller=caller, message=None)
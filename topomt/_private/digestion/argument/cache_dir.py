@@ -0,0 +1,12 @@
+from pathlib import Path
+from ...exceptions import ArgumentError
+
+def digest_cache_dir(cache_dir, caller=None):
+
+    if cache_dir is None:
+        return None
+
+    if isinstance(cache_dir, (str, Path)):
+        return Path(cache_dir)
+
+    raise ArgumentError('cache_dir', value=cache_dir, caller=caller, message=None)
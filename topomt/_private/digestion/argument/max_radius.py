@@ -4,6 +4,11 @@ from ...exceptions import ArgumentError
 
 def digest_max_radius(max_radius, caller=None):
 
+    if max_radius is None:
+        if caller in ['topomt.alpha_spheres.alpha_spheres.__init__',
+                      'topomt.alpha_spheres.alpha_spheres.from_trajectory']:
+            return None
+
     if puw.is_quantity(max_radius):
         if puw.check(max_radius, dimensionality={'[L]':1}):
             return puw.standardize(max_radius)
@@ -8,5 +8,10 @@ def digest_method(method, caller=None):
         if isinstance(method, str):
             return method
 
-    return ArgumentError('method', value=method, caller=caller, message=None)
+    if caller in ['topomt.alpha_spheres.alpha_spheres.__init__',
+                  'topomt.alpha_spheres.alpha_spheres.from_trajectory']:
+        if method in ['voronoi', 'weighted_voronoi']:
+            return method
+
+    raise ArgumentError('method', value=method, caller=caller, message=None)
 
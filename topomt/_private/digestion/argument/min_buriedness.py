@@ -0,0 +1,13 @@
+import numpy as np
+from ...exceptions import ArgumentError
+
+def digest_min_buriedness(min_buriedness, caller=None):
+
+    if min_buriedness is None:
+        return None
+
+    if isinstance(min_buriedness, (int, np.integer)) and not isinstance(min_buriedness, bool):
+        if min_buriedness >= 0:
+            return min_buriedness
+
+    raise ArgumentError('min_buriedness', value=min_buriedness, caller=caller, message=None)
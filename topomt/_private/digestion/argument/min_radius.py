@@ -4,6 +4,11 @@ from ...exceptions import ArgumentError
 
 def digest_min_radius(min_radius, caller=None):
 
+    if min_radius is None:
+        if caller in ['topomt.alpha_spheres.alpha_spheres.__init__',
+                      'topomt.alpha_spheres.alpha_spheres.from_trajectory']:
+            return None
+
     if puw.is_quantity(min_radius):
         if puw.check(min_radius, dimensionality={'[L]':1}):
             return puw.standardize(min_radius)
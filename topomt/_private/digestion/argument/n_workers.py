@@ -0,0 +1,13 @@
+import numpy as np
+from ...exceptions import ArgumentError
+
+def digest_n_workers(n_workers, caller=None):
+
+    if n_workers is None:
+        return None
+
+    if isinstance(n_workers, (int, np.integer)) and not isinstance(n_workers, bool):
+        if n_workers > 0:
+            return int(n_workers)
+
+    raise ArgumentError('n_workers', value=n_workers, caller=caller, message=None)
@@ -0,0 +1,13 @@
+from ...exceptions import ArgumentError
+
+def digest_output_type(output_type, caller=None):
+
+    if caller in ['topomt.methods.fpocket2.fpocket2', 'topomt.methods.fpocket4.fpocket4']:
+        if output_type in ['indices', 'topography']:
+            return output_type
+
+    if caller == 'topomt.methods.fpocket4.fpocket4':
+        if output_type == 'dendrogram':
+            return output_type
+
+    raise ArgumentError('output_type', value=output_type, caller=caller, message=None)
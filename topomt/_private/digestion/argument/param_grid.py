@@ -0,0 +1,50 @@
+import itertools
+from ...exceptions import ArgumentError
+
+_SWEEP_PARAMETERS = {
+    'topomt.methods.fpocket2_sweep.fpocket2_sweep': ['min_radius', 'max_radius', 'min_buriedness',
+                                                     'buriedness_radius', 'max_neighbor_dist', 'max_cluster_dist',
+                                                     'max_pair_dist', 'min_contacts', 'min_spheres_per_pocket'],
+}
+
+def digest_param_grid(param_grid, caller=None):
+    """Expands a grid of parameters into the list of its combinations, with digested values.
+
+    Parameters
+    ----------
+    param_grid : dict or list of dict
+        Values of each swept parameter (a single value or a list of values), or the explicit list
+        of combinations.
+    caller : str, optional
+        Name of the function or method that is being digested.
+
+    Returns
+    -------
+    list of tuple
+        (combination, digested_combination) for every combination of parameters, in the order of
+        the grid. `combination` is the dict given by the caller, or the one of the product of the
+        values given by the caller, with the values as given. `digested_combination` holds the
+        same parameters with digested values.
+    """
+
+    from ..digest import digestion_functions
+
+    if caller in _SWEEP_PARAMETERS:
+
+        if isinstance(param_grid, dict):
+            names = list(param_grid.keys())
+            values = [value if isinstance(value, (list, tuple)) else [value] for value in param_grid.values()]
+            param_grid = [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+        if isinstance(param_grid, (list, tuple)) and all(isinstance(params, dict) for params in param_grid):
+            combinations = []
+            for params in param_grid:
+                for name in params:
+                    if name not in _SWEEP_PARAMETERS[caller]:
+                        raise ArgumentError('param_grid', value=param_grid, caller=caller,
+                                            message=f' {name} can not be swept. ')
+                combinations.append((params, {name: digestion_functions[name](value, caller=caller)
+                                              for name, value in params.items()}))
+            return combinations
+
+    raise ArgumentError('param_grid', value=param_grid, caller=caller, message=None)
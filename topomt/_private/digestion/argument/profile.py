@@ -0,0 +1,8 @@
+from ...exceptions import ArgumentError
+
+def digest_profile(profile, caller=None):
+
+    if isinstance(profile, bool):
+        return profile
+
+    raise ArgumentError('profile', value=profile, caller=caller, message=None)
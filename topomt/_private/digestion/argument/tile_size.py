@@ -0,0 +1,14 @@
+import numpy as np
+from topomt import pyunitwizard as puw
+from ...exceptions import ArgumentError
+
+def digest_tile_size(tile_size, caller=None):
+
+    if tile_size is None:
+        return None
+
+    if puw.is_quantity(tile_size):
+        if puw.check(tile_size, dimensionality={'[L]':1}):
+            return puw.standardize(tile_size)
+
+    raise ArgumentError('tile_size', value=tile_size, caller=caller, message=None)
@@ -105,7 +105,7 @@ def digest(**kwargs):
 
 
             for arg_name in not_digested_args:
-                if arg_name not in ['self']:
+                if arg_name not in ['self', 'cls']:
                     warnings.warn(arg_name+' from '+caller, NotDigestedArgumentWarning, stacklevel=2)
 
 
@@ -113,6 +113,8 @@ def digest(**kwargs):
 
             if 'self' in all_args:
                 return func(all_args['self'], **final_args)
+            elif 'cls' in all_args:
+                return func(all_args['cls'], **final_args)
             else:
                 return func(**final_args)
 
@@ -1,3 +1,5 @@
+import numpy as np
+
 def connected_components_union_find(edges):
     parent = {}
 
@@ -27,3 +29,27 @@ def connected_components_union_find(edges):
         comps.setdefault(r, []).append(x)
 
     return list(comps.values())
+
+
+def components_from_labels(labels, min_size=1):
+    """Groups of indices sharing the same component label.
+
+    Parameters
+    ----------
+    labels : numpy.ndarray (shape=[n_nodes], dtype=int)
+        Component label of each node, as returned by ``scipy.sparse.csgraph.connected_components``.
+    min_size : int, default 1
+        Components with fewer nodes are not returned.
+
+    Returns
+    -------
+    components : list[list[int]]
+        Sorted node indices of each component, ordered by label.
+    """
+
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    sizes = np.bincount(labels)
+    components = np.split(order, np.cumsum(sizes)[:-1])
+
+    return [comp.tolist() for comp in components if comp.shape[0] >= min_size]
@@ -1 +1,3 @@
 from .alpha_spheres import AlphaSpheres
+from .alpha_spheres_trajectory import AlphaSpheresTrajectory
+from .alpha_spheres_view import AlphaSpheresView
@@ -0,0 +1,68 @@
+import numpy as np
+
+# Pauling electronegativities of the elements found in biomolecular systems
+_ELECTRONEGATIVITY = {
+    'H': 2.20, 'B': 2.04, 'C': 2.55, 'N': 3.04, 'O': 3.44, 'F': 3.98, 'NA': 0.93, 'MG': 1.31,
+    'SI': 1.90, 'P': 2.19, 'S': 2.58, 'CL': 3.16, 'K': 0.82, 'CA': 1.00, 'MN': 1.55, 'FE': 1.83,
+    'CO': 1.88, 'NI': 1.91, 'CU': 1.90, 'ZN': 1.65, 'SE': 2.55, 'BR': 2.96, 'I': 2.66,
+}
+
+# As in fpocket, atoms with an electronegativity at or above this value are polar
+_POLAR_ELECTRONEGATIVITY = 2.8
+
+
+def _get_polar_mask(elements):
+
+    """Polarity of a set of atoms from their elements
+
+    Parameters
+    ----------
+    elements : array_like of str (shape=[n_points])
+        Element symbol of each atom, case insensitive.
+
+    Returns
+    -------
+    is_polar : numpy.ndarray (shape=[n_points], dtype=bool)
+        True for the atoms with an electronegativity of at least 2.8 (N, O, F, Cl and Br). Unknown
+        elements are apolar.
+
+    """
+
+    # One lookup per distinct element, gathered back to the atoms
+    symbols, inverse = np.unique(np.asarray(elements, dtype=str), return_inverse=True)
+    polar = np.array([_ELECTRONEGATIVITY.get(symbol.strip().upper(), 0.0) >= _POLAR_ELECTRONEGATIVITY
+                      for symbol in symbols], dtype=bool)
+
+    return polar[inverse.ravel()]
+
+
+# Kyte-Doolittle hydropathy index of the standard amino acids
+_KYTE_DOOLITTLE = {
+    'ALA': 1.8, 'ARG': -4.5, 'ASN': -3.5, 'ASP': -3.5, 'CYS': 2.5, 'GLN': -3.5, 'GLU': -3.5, 'GLY': -0.4,
+    'HIS': -3.2, 'ILE': 4.5, 'LEU': 3.8, 'LYS': -3.9, 'MET': 1.9, 'PHE': 2.8, 'PRO': -1.6, 'SER': -0.8,
+    'THR': -0.7, 'TRP': -0.9, 'TYR': -1.3, 'VAL': 4.2,
+}
+
+
+def _get_hydropathy(residue_names):
+
+    """Kyte-Doolittle hydropathy of a set of atoms from the names of their residues
+
+    Parameters
+    ----------
+    residue_names : array_like of str (shape=[n_points])
+        Name of the residue of each atom, case insensitive.
+
+    Returns
+    -------
+    hydropathy : numpy.ndarray (shape=[n_points], dtype=float)
+        Hydropathy index of the residue of each atom, NaN for residues other than the standard
+        amino acids.
+
+    """
+
+    # One lookup per distinct residue name, gathered back to the atoms
+    names, inverse = np.unique(np.asarray(residue_names, dtype=str), return_inverse=True)
+    hydropathy = np.array([_KYTE_DOOLITTLE.get(name.strip().upper(), np.nan) for name in names], dtype=np.float64)
+
+    return hydropathy[inverse.ravel()]
@@ -0,0 +1,465 @@
+import numpy as np
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import Delaunay, ConvexHull, QhullError
+
+
+def _build_alpha_spheres(points, weights=None):
+
+    """Alpha-spheres of a set of points
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    weights : numpy.ndarray (shape=[n_points], dtype=float), default None
+        Weights of the points (square of their radii). If None, the alpha-spheres come from the
+        Delaunay triangulation ('voronoi' method); otherwise, from the regular triangulation
+        ('weighted_voronoi' method).
+
+    Returns
+    -------
+    points_of_alpha_sphere : numpy.ndarray (shape=[n_simplices,4], dtype=int32)
+        Sorted indices of the four points in contact with each alpha-sphere.
+    centers : numpy.ndarray (shape=[n_simplices,3], dtype=float)
+        Centers of the alpha-spheres.
+    radii : numpy.ndarray (shape=[n_simplices], dtype=float)
+        Radii of the alpha-spheres. NaN for those tetrahedra of the regular triangulation with an
+        imaginary orthogonal sphere, which are not alpha-spheres.
+
+    Notes
+    -----
+    One entry is returned for every tetrahedron of the triangulation, in the order given by Qhull,
+    so that these indices can be used to refer to the raw triangulation.
+
+    """
+
+    if weights is None:
+        # Each Delaunay tetrahedron defines an alpha-sphere: its circumcenter is a vertex of the
+        # Voronoi diagram and its four vertices are the points in contact with the sphere.
+        simplices = Delaunay(points).simplices
+    else:
+        # Regular (power) triangulation, dual of the power diagram of the weighted points.
+        simplices = _get_regular_triangulation(points, weights)
+
+    points_of_alpha_sphere = np.sort(simplices, axis=1).astype(np.int32, copy=False)
+    centers, radii = _get_circumspheres(points, points_of_alpha_sphere, weights=weights)
+
+    return points_of_alpha_sphere, centers, radii
+
+
+def _get_radius_window_mask(radii, min_radius=None, max_radius=None):
+
+    """Mask of the alpha-spheres with a radius in the window [min_radius, max_radius]
+
+    Parameters
+    ----------
+    radii : numpy.ndarray (shape=[n_simplices], dtype=float)
+        Radii of the alpha-spheres, NaN for those which are not alpha-spheres.
+    min_radius : float, default None
+        Minimum radius, in the units of `radii`. No lower bound if None.
+    max_radius : float, default None
+        Maximum radius, in the units of `radii`. No upper bound if None.
+
+    Returns
+    -------
+    mask : numpy.ndarray (shape=[n_simplices], dtype=bool)
+        True for the alpha-spheres inside the window.
+
+    """
+
+    mask = ~np.isnan(radii)
+
+    if min_radius is not None:
+        mask &= radii >= min_radius
+
+    if max_radius is not None:
+        mask &= radii <= max_radius
+
+    return mask
+
+
+def _build_filtered_alpha_spheres(points, weights=None, min_radius=None, max_radius=None, tile_size=None,
+                                  n_workers=None, return_simplices=False):
+
+    """Alpha-spheres of a set of points inside a radius window
+
+    Builds the alpha-spheres globally, or by tiles when `tile_size` is given, and keeps only those
+    with a radius in the window [`min_radius`, `max_radius`].
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    weights : numpy.ndarray (shape=[n_points], dtype=float), default None
+        Weights of the points (square of their radii), as in `_build_alpha_spheres`.
+    min_radius : float, default None
+        Minimum radius of the alpha-spheres, in the units of `points`.
+    max_radius : float, default None
+        Maximum radius of the alpha-spheres, in the units of `points`. Required by the tiled build.
+    tile_size : float, default None
+        Side of the tiles, in the units of `points`.
+    n_workers : int, default None
+        Number of processes triangulating tiles at the same time.
+    return_simplices : bool, default False
+        If True, the sorted simplices of the whole triangulation are also returned (None for the
+        tiled build).
+
+    Returns
+    -------
+    points_of_alpha_sphere : numpy.ndarray (shape=[n_alpha_spheres,4], dtype=int32)
+        Sorted indices of the four points in contact with each alpha-sphere.
+    centers : numpy.ndarray (shape=[n_alpha_spheres,3], dtype=float)
+        Centers of the alpha-spheres.
+    radii : numpy.ndarray (shape=[n_alpha_spheres], dtype=float)
+        Radii of the alpha-spheres.
+    kept_indices : numpy.ndarray (shape=[n_alpha_spheres], dtype=int) or None
+        Indices of the kept alpha-spheres among all the tetrahedra of the triangulation. None for
+        the tiled build.
+    simplices : numpy.ndarray (shape=[n_simplices,4], dtype=int32) or None
+        Only if `return_simplices` is True.
+
+    """
+
+    if tile_size is not None:
+        points_of_alpha_sphere, centers, radii = _build_tiled_alpha_spheres(points, max_radius, tile_size,
+                min_radius=min_radius, weights=weights, n_workers=n_workers)
+        if return_simplices:
+            return points_of_alpha_sphere, centers, radii, None, None
+        return points_of_alpha_sphere, centers, radii, None
+
+    simplices, centers, radii = _build_alpha_spheres(points, weights=weights)
+
+    kept_indices = np.nonzero(_get_radius_window_mask(radii, min_radius, max_radius))[0]
+
+    if return_simplices:
+        return simplices[kept_indices], centers[kept_indices], radii[kept_indices], kept_indices, simplices
+    return simplices[kept_indices], centers[kept_indices], radii[kept_indices], kept_indices
+
+
+def _is_cell_too_small(box, halo):
+
+    # Two images of the same point are at least the smallest width of the cell (distance between
+    # opposite faces) apart: an alpha-sphere whose halo reaches half that width can touch both
+
+    widths = np.abs(np.linalg.det(box)) / np.linalg.norm(np.cross(box[[1,2,0]], box[[2,0,1]]), axis=1)
+
+    return bool(np.any(2.0 * halo >= widths))
+
+
+def _build_periodic_alpha_spheres(points, box, max_radius, min_radius=None, weights=None, tile_size=None,
+                                  n_workers=None):
+
+    """Alpha-spheres of a set of points with periodic boundary conditions
+
+    The points are wrapped into the primary cell and replicated only within a halo around its
+    faces. The alpha-spheres of the extended set whose center falls inside the primary cell and
+    whose radius is in the window [`min_radius`, `max_radius`] are kept, with their points of
+    contact mapped back to the original points.
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    box : numpy.ndarray (shape=[3,3], dtype=float)
+        Vectors of the periodic cell, one per row, in the units of `points`.
+    max_radius : float
+        Maximum radius of the alpha-spheres, in the units of `points`.
+    min_radius : float, default None
+        Minimum radius of the alpha-spheres, in the units of `points`.
+    weights : numpy.ndarray (shape=[n_points], dtype=float), default None
+        Weights of the points (square of their radii), as in `_build_alpha_spheres`.
+    tile_size : float, default None
+        Side of the tiles to build the extended set by tiles, in the units of `points`.
+    n_workers : int, default None
+        Number of processes triangulating tiles at the same time.
+
+    Returns
+    -------
+    points_of_alpha_sphere : numpy.ndarray (shape=[n_alpha_spheres,4], dtype=int32)
+        Sorted indices of the four original points in contact with each alpha-sphere.
+    centers : numpy.ndarray (shape=[n_alpha_spheres,3], dtype=float)
+        Centers of the alpha-spheres, inside the primary cell.
+    radii : numpy.ndarray (shape=[n_alpha_spheres], dtype=float)
+        Radii of the alpha-spheres.
+
+    Notes
+    -----
+    As in the tiled build, a halo of width `max_radius` (``sqrt(max_radius**2 + max(weights))``
+    with weights) holds every point an alpha-sphere centered in the cell can touch. Twice the halo
+    must be smaller than the width of the cell (see `_is_cell_too_small`), so that no alpha-sphere
+    touches two images of the same point.
+
+    """
+
+    halo = max_radius if weights is None else np.sqrt(max_radius**2 + weights.max())
+
+    extended_points, point_indices = _get_periodic_images(points, box, halo)
+    extended_weights = None if weights is None else weights[point_indices]
+
+    points_of_alpha_sphere, centers, radii, _ = _build_filtered_alpha_spheres(extended_points,
+            weights=extended_weights, min_radius=min_radius, max_radius=max_radius, tile_size=tile_size,
+            n_workers=n_workers)
+
+    # Only the alpha-spheres centered in the primary cell, each one found once
+
+    fractional = centers @ np.linalg.inv(box)
+    inside = np.all((fractional >= 0.0) & (fractional < 1.0), axis=1)
+
+    points_of_alpha_sphere = np.sort(point_indices[points_of_alpha_sphere[inside]], axis=1).astype(np.int32)
+
+    return points_of_alpha_sphere, centers[inside], radii[inside]
+
+
+def _get_periodic_images(points, box, halo):
+
+    """Points wrapped into the primary cell plus their images within a halo around it
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    box : numpy.ndarray (shape=[3,3], dtype=float)
+        Vectors of the periodic cell, one per row.
+    halo : float
+        Width of the layer around the cell where the images are kept.
+
+    Returns
+    -------
+    extended_points : numpy.ndarray (shape=[n_extended,3], dtype=float)
+        The wrapped points, followed by the images.
+    point_indices : numpy.ndarray (shape=[n_extended], dtype=int)
+        Index of the original point of every extended point.
+
+    """
+
+    n_points = points.shape[0]
+
+    fractional = points @ np.linalg.inv(box)
+    fractional -= np.floor(fractional)
+
+    # Halo in fractional units along each cell vector: distance between opposite faces
+    widths = np.abs(np.linalg.det(box)) / np.linalg.norm(np.cross(box[[1,2,0]], box[[2,0,1]]), axis=1)
+    halo_fractional = halo / widths
+
+    # Image shifted by +1 along a vector for the points close to the lower face, and by -1 for
+    # those close to the upper face; the 26 shifts at once
+    shifts = np.array([shift for shift in itertools.product([-1, 0, 1], repeat=3) if any(shift)])
+    near_lower = fractional < halo_fractional
+    near_upper = fractional >= 1.0 - halo_fractional
+    needed = np.where(shifts[:,np.newaxis,:] == 1, near_lower,
+                      np.where(shifts[:,np.newaxis,:] == -1, near_upper, True)).all(axis=2)
+    shift_indices, image_indices = np.nonzero(needed)
+
+    images = fractional[image_indices] + shifts[shift_indices]
+
+    extended_points = np.concatenate([fractional, images]) @ box
+    point_indices = np.concatenate([np.arange(n_points), image_indices])
+
+    return extended_points, point_indices
+
+
+def _build_tiled_alpha_spheres(points, max_radius, tile_size, min_radius=None, weights=None, n_workers=None):
+
+    """Alpha-spheres of a set of points built by spatial tiles
+
+    The bounding box of the points is split in cubic tiles of side `tile_size`. Each tile is
+    triangulated independently with the points found in the tile and in a halo around it, and
+    keeps only the alpha-spheres whose center falls inside the tile and whose radius is in the
+    window [`min_radius`, `max_radius`].
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    max_radius : float
+        Maximum radius of the alpha-spheres, in the units of `points`.
+    tile_size : float
+        Side of the tiles, in the units of `points`.
+    min_radius : float, default None
+        Minimum radius of the alpha-spheres, in the units of `points`.
+    weights : numpy.ndarray (shape=[n_points], dtype=float), default None
+        Weights of the points (square of their radii), as in `_build_alpha_spheres`.
+    n_workers : int, default None
+        Number of processes triangulating tiles at the same time. With None or 1 the tiles are
+        processed one after the other.
+
+    Returns
+    -------
+    points_of_alpha_sphere : numpy.ndarray (shape=[n_alpha_spheres,4], dtype=int32)
+        Sorted indices of the four points in contact with each alpha-sphere.
+    centers : numpy.ndarray (shape=[n_alpha_spheres,3], dtype=float)
+        Centers of the alpha-spheres.
+    radii : numpy.ndarray (shape=[n_alpha_spheres], dtype=float)
+        Radii of the alpha-spheres.
+
+    Notes
+    -----
+    An alpha-sphere with radius r only depends on the points closer than r to its center (or,
+    with weights w, closer than ``sqrt(r**2 + w)``). A halo of that width around every tile makes
+    the tiled result identical to the global build restricted to radii up to `max_radius`. The
+    alpha-spheres are returned sorted by their points of contact.
+
+    """
+
+    halo = max_radius if weights is None else np.sqrt(max_radius**2 + weights.max())
+
+    lower = points.min(axis=0)
+    n_tiles = np.maximum(np.ceil((points.max(axis=0) - lower) / tile_size).astype(int), 1)
+
+    def tiles():
+        for tile in np.ndindex(*n_tiles):
+            tile = np.array(tile)
+            tile_lower = lower + tile * tile_size
+            tile_upper = tile_lower + tile_size
+            # Tiles in the border of the grid extend to infinity
+            tile_lower[tile == 0] = -np.inf
+            tile_upper[tile == n_tiles - 1] = np.inf
+            mask = np.all((points >= tile_lower - halo) & (points <= tile_upper + halo), axis=1)
+            point_indices = np.nonzero(mask)[0]
+            yield (points[point_indices], None if weights is None else weights[point_indices],
+                   point_indices, tile, lower, tile_size, n_tiles, min_radius, max_radius)
+
+    results = []
+
+    if n_workers is None or n_workers == 1:
+        for args in tiles():
+            results.append(_build_tile(*args))
+    else:
+        # At most two tiles per worker in flight to keep the memory bounded
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            pending = []
+            for args in tiles():
+                pending.append(executor.submit(_build_tile, *args))
+                if len(pending) >= 2 * n_workers:
+                    results.append(pending.pop(0).result())
+            for future in pending:
+                results.append(future.result())
+
+    points_of_alpha_sphere = np.concatenate([result[0] for result in results])
+    centers = np.concatenate([result[1] for result in results])
+    radii = np.concatenate([result[2] for result in results])
+
+    # Alpha-spheres found in more than one tile (degenerate cases) are kept once
+    points_of_alpha_sphere, unique_indices = np.unique(points_of_alpha_sphere, axis=0, return_index=True)
+
+    return points_of_alpha_sphere, centers[unique_indices], radii[unique_indices]
+
+
+def _build_tile(points, weights, point_indices, tile, lower, tile_size, n_tiles, min_radius, max_radius):
+
+    if points.shape[0] < 5:
+        return np.empty((0, 4), dtype=np.int32), np.empty((0, 3)), np.empty(0)
+
+    try:
+        points_of_alpha_sphere, centers, radii = _build_alpha_spheres(points, weights=weights)
+    except QhullError:
+        return np.empty((0, 4), dtype=np.int32), np.empty((0, 3)), np.empty(0)
+
+    with np.errstate(invalid='ignore'):
+        centers_tile = np.clip(np.floor((centers - lower) / tile_size), 0, n_tiles - 1).astype(int)
+    mask = np.all(centers_tile == tile, axis=1) & _get_radius_window_mask(radii, min_radius, max_radius)
+
+    points_of_alpha_sphere = point_indices[points_of_alpha_sphere[mask]].astype(np.int32)
+
+    return points_of_alpha_sphere, centers[mask], radii[mask]
+
+
+def _get_circumspheres(points, simplices, weights=None):
+
+    """Centers and radii of the spheres circumscribed to a set of tetrahedra
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    simplices : numpy.ndarray (shape=[n_simplices,4], dtype=int)
+        Indices of the four points of each tetrahedron.
+    weights : numpy.ndarray (shape=[n_points], dtype=float), default None
+        Weights of the points (square of their radii). If given, the power centers and the radii
+        of the orthogonal spheres are returned instead.
+
+    Returns
+    -------
+    centers : numpy.ndarray (shape=[n_simplices,3], dtype=float)
+        Circumcenters (or power centers) of the tetrahedra.
+    radii : numpy.ndarray (shape=[n_simplices], dtype=float)
+        Circumradii (or radii of the orthogonal spheres) of the tetrahedra. NaN where the
+        orthogonal sphere is imaginary.
+
+    Notes
+    -----
+    The center is written relative to the first vertex of each tetrahedron:
+    with a, b and c the edge vectors from that vertex,
+    ``(s_a (b x c) + s_b (c x a) + s_c (a x b)) / (2 a.(b x c))``, where s_a is ``|a|^2`` or, with
+    weights, ``|a|^2 - w_a + w_0``.
+
+    """
+
+    vertices = points[simplices]
+    origin = vertices[:,0,:]
+    a = vertices[:,1,:] - origin
+    b = vertices[:,2,:] - origin
+    c = vertices[:,3,:] - origin
+
+    s_a = np.einsum('ij,ij->i', a, a)
+    s_b = np.einsum('ij,ij->i', b, b)
+    s_c = np.einsum('ij,ij->i', c, c)
+
+    if weights is not None:
+        simplices_weights = weights[simplices]
+        s_a -= simplices_weights[:,1] - simplices_weights[:,0]
+        s_b -= simplices_weights[:,2] - simplices_weights[:,0]
+        s_c -= simplices_weights[:,3] - simplices_weights[:,0]
+
+    b_x_c = np.cross(b, c)
+    numerator = (s_a[:,np.newaxis] * b_x_c
+                 + s_b[:,np.newaxis] * np.cross(c, a)
+                 + s_c[:,np.newaxis] * np.cross(a, b))
+    denominator = 2.0 * np.einsum('ij,ij->i', a, b_x_c)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offsets = numerator / denominator[:,np.newaxis]
+
+    centers = origin + offsets
+    squared_radii = np.einsum('ij,ij->i', offsets, offsets)
+
+    if weights is not None:
+        squared_radii -= simplices_weights[:,0]
+        squared_radii[squared_radii < 0.0] = np.nan
+
+    radii = np.sqrt(squared_radii)
+
+    return centers, radii
+
+
+def _get_regular_triangulation(points, weights):
+
+    """Tetrahedra of the regular (power) triangulation of a set of weighted points
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        Coordinates of the points, without units.
+    weights : numpy.ndarray (shape=[n_points], dtype=float)
+        Weights of the points (square of their radii).
+
+    Returns
+    -------
+    simplices : numpy.ndarray (shape=[n_simplices,4], dtype=int)
+        Indices of the four points of each tetrahedron.
+
+    Notes
+    -----
+    The points are lifted to the paraboloid ``(x, |x|^2 - w)`` and the tetrahedra are the facets of
+    the lower convex hull of the lifted points. With null weights this is the Delaunay
+    triangulation.
+
+    """
+
+    centered = points - points.mean(axis=0)
+    lifted = np.column_stack([centered, np.einsum('ij,ij->i', centered, centered) - weights])
+    hull = ConvexHull(lifted, qhull_options='Qt')
+    lower = hull.equations[:,3] < 0.0
+
+    return hull.simplices[lower]
@@ -0,0 +1,290 @@
+import numpy as np
+from scipy.spatial import Delaunay, ConvexHull, QhullError, cKDTree
+from ._construction import _get_circumspheres
+
+# Positions of the vertices of the face opposite to each vertex of a tetrahedron
+_FACES = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+
+# Largest number of points whose faces fit in a single int64 key, (a*n + b)*n + c < n**3 <= 2**63
+_MAX_FACE_KEY_POINTS = 2**21
+
+
+def _update_delaunay(points, simplices, neighbors=None, n_rings=1, max_invalid_fraction=0.02,
+                     max_region_fraction=0.5):
+
+    """Delaunay triangulation of a set of points updated from the one of a close configuration
+
+    Parameters
+    ----------
+    points : numpy.ndarray (shape=[n_points,3], dtype=float)
+        New coordinates of the points, without units.
+    simplices : numpy.ndarray (shape=[n_simplices,4], dtype=int)
+        Sorted indices of the four points of each tetrahedron of the previous triangulation.
+    neighbors : numpy.ndarray (shape=[n_simplices,4], dtype=int), default None
+        Neighbors of the previous tetrahedra, as returned by `_get_simplex_neighbors`.
+    n_rings : int, default 1
+        Rings of neighbors added around the invalid tetrahedra in the region triangulated again.
+    max_invalid_fraction : float, default 0.02
+        Largest fraction of invalid tetrahedra. Above it the local repair is not attempted.
+    max_region_fraction : float, default 0.5
+        Largest fraction of the points in the region to triangulate again. Above it the local
+        repair is given up in favor of a full rebuild.
+
+    Returns
+    -------
+    triangulation : tuple or None
+        None if the previous triangulation could not be repaired locally. Otherwise, the sorted
+        simplices (shape=[n_simplices,4], dtype=int32) of the Delaunay triangulation of `points`,
+        their neighbors (shape=[n_simplices,4], dtype=int), and the centers (shape=[n_simplices,3])
+        and radii (shape=[n_simplices]) of their circumspheres.
+
+    Notes
+    -----
+    Every face of the previous triangulation is checked at once with the new coordinates: the
+    tetrahedra with a changed orientation and the pairs of tetrahedra whose shared face is not
+    locally Delaunay (the opposite vertex falls inside the circumsphere) are invalid. This check
+    costs a fraction of a full triangulation and decides whether the repair is attempted: with
+    more than `max_invalid_fraction` invalid tetrahedra, None is returned at once. With no invalid
+    tetrahedra and the same convex hull, the triangulation is still the Delaunay one. Otherwise
+    the region made of the invalid tetrahedra and `n_rings` rings of neighbors around them is
+    triangulated again with its own points, the new tetrahedra with an empty circumsphere
+    replace the region, and the result is accepted only if it is a valid triangulation of the
+    convex hull of `points`. There is a single attempt: a failed repair returns None.
+
+    """
+
+    if neighbors is None:
+        neighbors = _get_simplex_neighbors(simplices)
+        if neighbors is None:
+            return None
+
+    centers, radii = _get_circumspheres(points, simplices)
+    invalid = _get_invalid_simplices_mask(points, simplices, neighbors, centers, radii)
+
+    # Cheap check first: many invalid tetrahedra mean a large region, not cheaper than the full build
+    if np.count_nonzero(invalid) > max_invalid_fraction * simplices.shape[0]:
+        return None
+
+    try:
+        hull = ConvexHull(points)
+    except QhullError:
+        return None
+
+    n_points = points.shape[0]
+    hull_keys = np.sort(_get_face_keys(np.sort(hull.simplices, axis=1), n_points))
+
+    # Tetrahedra touching the hull where it changed: boundary faces that are no longer hull faces,
+    # and points of the new hull faces
+
+    owners, boundary_faces = _get_boundary_faces(simplices, neighbors)
+    boundary_keys = _get_face_keys(boundary_faces, n_points)
+    invalid[owners[~np.isin(boundary_keys, hull_keys)]] = True
+    new_hull_points = np.unique(hull.simplices[~np.isin(hull_keys, boundary_keys)])
+    if new_hull_points.shape[0] > 0:
+        on_new_hull = np.zeros(n_points, dtype=bool)
+        on_new_hull[new_hull_points] = True
+        invalid |= np.any(on_new_hull[simplices], axis=1)
+
+    if not np.any(invalid):
+        if _is_triangulation_of_hull(points, simplices, neighbors, hull_keys, hull.volume):
+            return simplices, neighbors, centers, radii
+        return None
+
+    region = invalid.copy()
+    for _ in range(n_rings):
+        ring = neighbors[region].ravel()
+        region[ring[ring >= 0]] = True
+
+    in_region = np.zeros(n_points, dtype=bool)
+    in_region[simplices[region].ravel()] = True
+    region_points = np.nonzero(in_region)[0]
+
+    # A large region is not cheaper than the full triangulation
+    if region_points.shape[0] > max_region_fraction * n_points:
+        return None
+
+    try:
+        local_simplices = Delaunay(points[region_points]).simplices
+    except QhullError:
+        return None
+
+    local_simplices = np.sort(region_points[local_simplices], axis=1).astype(np.int32, copy=False)
+
+    # Only the tetrahedra with an empty circumsphere are tetrahedra of the global triangulation
+
+    local_centers, local_radii = _get_circumspheres(points, local_simplices)
+    empty = np.isfinite(local_radii)
+    empty[empty] = cKDTree(points).query_ball_point(local_centers[empty], local_radii[empty] * (1.0 - 1e-9),
+                                                    return_length=True) == 0
+
+    # and those not kept from the previous triangulation fill the region
+    kept = ~region
+    shared = kept & np.all(in_region[simplices], axis=1)
+    empty[empty] = ~_is_row_in(local_simplices[empty], simplices[shared])
+
+    new_simplices = np.concatenate([simplices[kept], local_simplices[empty]])
+    new_neighbors = _get_simplex_neighbors(new_simplices)
+
+    if new_neighbors is None:
+        return None
+
+    if not _is_triangulation_of_hull(points, new_simplices, new_neighbors, hull_keys, hull.volume):
+        return None
+
+    new_centers = np.concatenate([centers[kept], local_centers[empty]])
+    new_radii = np.concatenate([radii[kept], local_radii[empty]])
+
+    # Only the faces of the new tetrahedra need to be checked
+    new = np.arange(new_simplices.shape[0]) >= np.count_nonzero(kept)
+    if np.any(_get_invalid_simplices_mask(points, new_simplices, new_neighbors, new_centers, new_radii,
+                                          subset=new)):
+        return None
+
+    return new_simplices, new_neighbors, new_centers, new_radii
+
+
+def _get_simplex_neighbors(simplices):
+
+    """Neighbors of the tetrahedra of a triangulation
+
+    Parameters
+    ----------
+    simplices : numpy.ndarray (shape=[n_simplices,4], dtype=int)
+        Sorted indices of the four points of each tetrahedron.
+
+    Returns
+    -------
+    neighbors : numpy.ndarray (shape=[n_simplices,4], dtype=int) or None
+        Index of the tetrahedron sharing the face opposite to each vertex, or -1 if the face is in
+        the boundary. None if a face is shared by more than two tetrahedra.
+
+    """
+
+    n_simplices = simplices.shape[0]
+
+    # Face opposite to the vertex k: the other three vertices, still sorted, as a single key
+    faces = _get_face_keys(simplices[:,_FACES].reshape(-1, 3), simplices.max() + 1)
+    owners = np.repeat(np.arange(n_simplices), 4)
+    opposite = np.tile(np.arange(4), n_simplices)
+
+    order = np.argsort(faces, kind='stable')
+    faces = faces[order]
+
+    same = faces[1:] == faces[:-1]
+
+    if np.any(same[1:] & same[:-1]):
+        return None
+
+    first = order[np.nonzero(same)[0]]
+    second = order[np.nonzero(same)[0] + 1]
+
+    neighbors = np.full((n_simplices, 4), -1, dtype=np.int64)
+    neighbors[owners[first], opposite[first]] = owners[second]
+    neighbors[owners[second], opposite[second]] = owners[first]
+
+    return neighbors
+
+
+def _get_signed_volumes(points, simplices):
+
+    vertices = points[simplices]
+    a = vertices[:,1,:] - vertices[:,0,:]
+    b = vertices[:,2,:] - vertices[:,0,:]
+    c = vertices[:,3,:] - vertices[:,0,:]
+
+    return np.einsum('ij,ij->i', a, np.cross(b, c)) / 6.0
+
+
+def _get_invalid_simplices_mask(points, simplices, neighbors, centers, radii, subset=None):
+
+    # Tetrahedra that are degenerate, folded over a neighbor or with a face that is not locally
+    # Delaunay. Every shared face is checked once, from the tetrahedron with the lowest index, and
+    # only if one of its tetrahedra is in `subset` when given.
+
+    invalid = ~np.isfinite(radii)
+
+    owners, faces = np.nonzero(neighbors > np.arange(simplices.shape[0])[:,np.newaxis])
+    others = neighbors[owners, faces]
+
+    if subset is not None:
+        invalid &= subset
+        checked = subset[owners] | subset[others]
+        owners, faces, others = owners[checked], faces[checked], others[checked]
+
+    face_vertices = simplices[owners[:,np.newaxis], _FACES[faces]]
+    owner_opposite = simplices[owners, faces]
+    # Vertex of the neighbor not shared with the owner
+    other_opposite = simplices[others].sum(axis=1) - face_vertices.sum(axis=1)
+
+    # Both opposite vertices must lie on different sides of the shared face
+    origin = points[face_vertices[:,0]]
+    normals = np.cross(points[face_vertices[:,1]] - origin, points[face_vertices[:,2]] - origin)
+    side_owner = np.einsum('ij,ij->i', normals, points[owner_opposite] - origin)
+    side_other = np.einsum('ij,ij->i', normals, points[other_opposite] - origin)
+    folded = side_owner * side_other >= 0.0
+
+    offsets = points[other_opposite] - centers[owners]
+    with np.errstate(invalid='ignore'):
+        violated = np.einsum('ij,ij->i', offsets, offsets) < radii[owners]**2 * (1.0 - 1e-9)
+
+    wrong = violated | folded
+    invalid[owners[wrong]] = True
+    invalid[others[wrong]] = True
+
+    return invalid
+
+
+def _get_boundary_faces(simplices, neighbors):
+
+    # Faces without neighbor, sorted, and the tetrahedra they belong to
+
+    owners, faces = np.nonzero(neighbors < 0)
+    boundary_faces = simplices[owners[:,np.newaxis], _FACES[faces]]
+
+    return owners, boundary_faces
+
+
+def _is_triangulation_of_hull(points, simplices, neighbors, hull_keys, hull_volume):
+
+    # The boundary faces are those of the convex hull, every point is a vertex and the tetrahedra
+    # fill the hull without overlaps
+
+    _, boundary_faces = _get_boundary_faces(simplices, neighbors)
+    boundary_keys = np.sort(_get_face_keys(boundary_faces, points.shape[0]))
+
+    if not np.array_equal(boundary_keys, hull_keys):
+        return False
+
+    if not np.all(np.bincount(simplices.ravel(), minlength=points.shape[0]) > 0):
+        return False
+
+    volume = np.abs(_get_signed_volumes(points, simplices)).sum()
+
+    return bool(np.isclose(volume, hull_volume, rtol=1e-9, atol=0.0))
+
+
+def _get_face_keys(faces, n_points):
+
+    # One key per sorted face: an integer when it fits in int64, otherwise the bytes of the row,
+    # as in `_is_row_in`, which only keep the equality and a consistent order
+
+    faces = faces.astype(np.int64)
+
+    if n_points <= _MAX_FACE_KEY_POINTS:
+        return (faces[:,0] * n_points + faces[:,1]) * n_points + faces[:,2]
+
+    return np.ascontiguousarray(faces).view(np.dtype((np.void, 8 * faces.shape[1]))).ravel()
+
+
+def _is_row_in(rows, array):
+
+    # Membership of each row in the rows of another integer array
+
+    if array.shape[0] == 0 or rows.shape[0] == 0:
+        return np.zeros(rows.shape[0], dtype=bool)
+
+    dtype = np.dtype((np.void, 8 * rows.shape[1]))
+    rows = np.ascontiguousarray(rows, dtype=np.int64).view(dtype).ravel()
+    array = np.ascontiguousarray(array, dtype=np.int64).view(dtype).ravel()
+
+    return np.isin(rows, array)
@@ -0,0 +1,171 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def _get_union_volumes_monte_carlo(centers, radii, labels, n_groups, relative_error=0.01, batch_size=100000,
+                                   max_points=10000000, seed=None):
+
+    """Volumes of unions of spheres by Monte Carlo integration, for all the groups at once
+
+    Parameters
+    ----------
+    centers : numpy.ndarray (shape=[n_spheres,3], dtype=float)
+        Centers of the spheres, with the spheres of every group unwrapped around the same image.
+    radii : numpy.ndarray (shape=[n_spheres], dtype=float)
+        Radii of the spheres.
+    labels : numpy.ndarray (shape=[n_spheres], dtype=int)
+        Group of every sphere, from 0 to `n_groups`-1.
+    n_groups : int
+        Number of groups.
+    relative_error : float, default 0.01
+        Target relative standard error of every volume. A group stops sampling when reached.
+    batch_size : int, default 100000
+        Number of random points drawn in every round, shared by the groups still sampling.
+    max_points : int, default 10000000
+        Largest number of random points drawn for a single group.
+    seed : int or numpy.random.Generator, default None
+        Seed of the random number generator.
+
+    Returns
+    -------
+    volumes : numpy.ndarray (shape=[n_groups], dtype=float)
+        Estimated volume of the union of the spheres of every group.
+    errors : numpy.ndarray (shape=[n_groups], dtype=float)
+        Relative standard error of every estimate.
+
+    Notes
+    -----
+    Every group is sampled uniformly in the bounding box of its spheres. The points of all the
+    groups of a round are tested at once with a single nearest-neighbor query to a KD-tree of the
+    sphere centers (see `_get_lifted_tree`).
+
+    """
+
+    rng = np.random.default_rng(seed)
+
+    lower, upper, box_volumes = _get_bounding_boxes(centers, radii, labels, n_groups)
+    tree, separation = _get_lifted_tree(centers, radii, labels, lower, upper)
+    max_radius = radii.max()
+
+    n_samples = np.zeros(n_groups, dtype=np.int64)
+    n_hits = np.zeros(n_groups, dtype=np.int64)
+    errors = np.full(n_groups, np.inf)
+    active = np.ones(n_groups, dtype=bool)
+
+    while np.any(active):
+
+        active_groups = np.nonzero(active)[0]
+        n_per_group = max(batch_size // active_groups.shape[0], 1)
+
+        point_labels = np.repeat(active_groups, n_per_group)
+        points = lower[point_labels] + rng.random((point_labels.shape[0], 3)) * (upper - lower)[point_labels]
+
+        inside = _get_inside_mask(tree, max_radius, separation, points, point_labels)
+
+        n_samples[active_groups] += n_per_group
+        n_hits += np.bincount(point_labels[inside], minlength=n_groups)
+
+        # Relative standard error of a binomial proportion
+        fraction = n_hits[active_groups] / n_samples[active_groups]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            errors[active_groups] = np.sqrt((1.0 - fraction) / (fraction * n_samples[active_groups]))
+
+        active[active_groups] = (errors[active_groups] > relative_error) & \
+                                (n_samples[active_groups] + n_per_group <= max_points)
+
+    volumes = box_volumes * n_hits / n_samples
+
+    return volumes, errors
+
+
+def _get_union_volumes_grid(centers, radii, labels, n_groups, spacing, batch_size=1000000):
+
+    """Volumes of unions of spheres counting the voxels of a regular grid, for all the groups
+
+    Parameters
+    ----------
+    centers : numpy.ndarray (shape=[n_spheres,3], dtype=float)
+        Centers of the spheres, with the spheres of every group unwrapped around the same image.
+    radii : numpy.ndarray (shape=[n_spheres], dtype=float)
+        Radii of the spheres.
+    labels : numpy.ndarray (shape=[n_spheres], dtype=int)
+        Group of every sphere, from 0 to `n_groups`-1.
+    n_groups : int
+        Number of groups.
+    spacing : float
+        Side of the cubic voxels.
+    batch_size : int, default 1000000
+        Number of voxels tested at once.
+
+    Returns
+    -------
+    volumes : numpy.ndarray (shape=[n_groups], dtype=float)
+        Volume of the voxels of every group whose center is inside the union of its spheres.
+
+    Notes
+    -----
+    The voxels of the bounding boxes of all the groups are enumerated with a single flat index
+    and tested in batches, so a batch can hold voxels of several groups.
+
+    """
+
+    lower, upper, _ = _get_bounding_boxes(centers, radii, labels, n_groups)
+    tree, separation = _get_lifted_tree(centers, radii, labels, lower, upper)
+    max_radius = radii.max()
+
+    shapes = np.ceil((upper - lower) / spacing).astype(np.int64)
+    n_voxels = np.prod(shapes, axis=1)
+    offsets = np.concatenate([[0], np.cumsum(n_voxels)])
+
+    n_inside = np.zeros(n_groups, dtype=np.int64)
+
+    for start in range(0, offsets[-1], batch_size):
+
+        flat = np.arange(start, min(start + batch_size, offsets[-1]))
+        point_labels = np.searchsorted(offsets, flat, side='right') - 1
+        local = flat - offsets[point_labels]
+
+        shape = shapes[point_labels]
+        ijk = np.column_stack([local // (shape[:,1] * shape[:,2]), (local // shape[:,2]) % shape[:,1],
+                               local % shape[:,2]])
+        points = lower[point_labels] + (ijk + 0.5) * spacing
+
+        inside = _get_inside_mask(tree, max_radius, separation, points, point_labels)
+        n_inside += np.bincount(point_labels[inside], minlength=n_groups)
+
+    return n_inside * spacing**3
+
+
+def _get_bounding_boxes(centers, radii, labels, n_groups):
+
+    lower = np.full((n_groups, 3), np.inf)
+    upper = np.full((n_groups, 3), -np.inf)
+    np.minimum.at(lower, labels, centers - radii[:,np.newaxis])
+    np.maximum.at(upper, labels, centers + radii[:,np.newaxis])
+
+    return lower, upper, np.prod(upper - lower, axis=1)
+
+
+def _get_lifted_tree(centers, radii, labels, lower, upper):
+
+    # KD-tree of the centers lifted to 5D: (center, sqrt(R**2 - r**2), label*separation), with R the
+    # largest radius. For a point lifted as (point, 0, label*separation), the squared distance to a
+    # sphere of its group is its power distance d**2 - r**2 plus R**2, so the point is inside the
+    # union of the spheres of its group iff its nearest lifted center is within R. The separation
+    # between groups is larger than any distance inside a group, so the nearest center is always
+    # one of its own group.
+
+    max_radius = radii.max()
+    separation = 2.0 * (np.linalg.norm(upper - lower, axis=1).max() + max_radius)
+
+    lifted = np.column_stack([centers, np.sqrt(max_radius**2 - radii**2), labels * separation])
+
+    return cKDTree(lifted), separation
+
+
+def _get_inside_mask(tree, max_radius, separation, points, point_labels):
+
+    lifted = np.column_stack([points, np.zeros(points.shape[0]), point_labels * separation])
+    distances, _ = tree.query(lifted, workers=-1)
+
+    return distances <= max_radius
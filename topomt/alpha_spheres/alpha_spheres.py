@@ -1,8 +1,21 @@
 from topomt import pyunitwizard as puw
 from topomt._private.digestion import digest
+from topomt._private.exceptions import ArgumentError
+from ._construction import _build_filtered_alpha_spheres, _build_periodic_alpha_spheres, _get_periodic_images
+from ._construction import _get_radius_window_mask, _is_cell_too_small
+from ._incremental import _update_delaunay
+from ._chemistry import _get_polar_mask
+from ._volume import _get_union_volumes_monte_carlo, _get_union_volumes_grid
 import numpy as np
-from scipy.spatial import Voronoi
-from scipy.spatial.distance import euclidean
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import warnings
 
 class AlphaSpheres():
 
@@ -24,81 +37,416 @@ class AlphaSpheres():
         Indices of points in the surface of each alpha-sphere.
     n_alpha_spheres: int
         Number of alpha-spheres in the set.
+    method: str
+        Method used to build the set of alpha-spheres: 'voronoi' or 'weighted_voronoi'.
+    point_radii: ndarray (shape=[n_points], dtype=float)
+        Radii of the points, only when the set was built with the method 'weighted_voronoi'.
+    kept_indices: ndarray (shape=[n_alpha_spheres], dtype=int)
+        Index of each alpha-sphere in the raw triangulation the set was built from. None if the
+        set was built by tiles.
+    length_unit: unit
+        Length unit of the coordinates and radii stored in the object.
+    point_elements: ndarray (shape=[n_points], dtype=str)
+        Element of each point, once set with `set_point_elements`.
+    min_apolar_contacts: int
+        Minimum number of apolar points in contact with an apolar alpha-sphere.
+    n_polar_contacts: ndarray (shape=[n_alpha_spheres], dtype=int)
+        Number of polar points in contact with each alpha-sphere. None until the elements of the
+        points are set.
+    is_apolar: ndarray (shape=[n_alpha_spheres], dtype=bool)
+        Whether each alpha-sphere is apolar. None until the elements of the points are set.
+
+    Notes
+    -----
+    Coordinates and radii are stored as plain float64 arrays in `length_unit`. The attributes
+    `points`, `centers`, `radii` and `point_radii` wrap these arrays as quantities on access, while
+    the methods of the class and the pocket detection methods work with the raw arrays.
 
     """
 
     @digest()
-    def __init__(self, points=None, radii=None, method='voronoi', skip_digestion=False):
-
-        # method can be 'voronoi' or 'weighted_voronoi' in future implementations
+    def __init__(self, points=None, radii=None, method='voronoi', min_radius=None, max_radius=None, tile_size=None,
+                 n_workers=None, box=None, skip_digestion=False):
 
         """Creating a new instance of AlphaSpheres
 
-
         Parameters
         ----------
+        points : ndarray (shape=[n_points,3], dtype=float)
+            Coordinates of the points used to generate the set of alpha-spheres.
+        radii : ndarray (shape=[n_points], dtype=float), default None
+            Radii of the points (van der Waals radii of the atoms, for instance). Required by the
+            method 'weighted_voronoi'.
+        method : {'voronoi', 'weighted_voronoi'}, default 'voronoi'
+            - 'voronoi': the alpha-spheres are the circumspheres of the Delaunay tetrahedra.
+            - 'weighted_voronoi': the alpha-spheres are the spheres orthogonal to the points' spheres
+              of the tetrahedra of the regular (power) triangulation, weighted with `radii`.
+        min_radius : quantity, default None
+            If given, alpha-spheres with a radius smaller than `min_radius` are not included in the set.
+        max_radius : quantity, default None
+            If given, alpha-spheres with a radius larger than `max_radius` are not included in the set.
+        tile_size : quantity, default None
+            If given, the set is built by cubic spatial tiles of this side, each one triangulated
+            independently with a halo wide enough for `max_radius`, which is then required. The
+            peak of memory is bounded by the number of points in a tile and its halo.
+        n_workers : int, default None
+            Number of processes building tiles at the same time, when `tile_size` is given.
+        box : quantity (shape=[3,3]), default None
+            Vectors of the periodic cell, one per row. If given, periodic boundary conditions are
+            applied and `max_radius` is required. The cell must be wider than twice `max_radius`.
 
         Examples
         --------
-
-        See Also
-        --------
+        >>> import topomt as tmt
+        >>> points = ([[-1.,  2.,  0.],
+        >>>            [ 0.,  2.,  1.],
+        >>>            [ 1., -2.,  1.],
+        >>>            [ 0.,  1.,  1.],
+        >>>            [ 0.,  0.,  0.],
+        >>>            [-1., -1.,  0.]])
+        >>> aspheres = tmt.alpha_spheres.AlphaSpheres(points)
+        >>> aspheres.n_alpha_spheres
+        4
 
         Notes
         -----
+        With the method 'weighted_voronoi' the center of each alpha-sphere is the vertex of the
+        power diagram shared by its four points, and its radius is the one of the sphere orthogonal
+        to the four points' spheres: ``radius**2 = |center-point|**2 - point_radius**2``. Points
+        buried by their neighbors do not take part in the triangulation, and those tetrahedra whose
+        orthogonal sphere is imaginary (fully inside the points' spheres) are not alpha-spheres.
+
+        Filtering with `min_radius` and `max_radius` at construction time is equivalent to calling
+        `remove_small_alpha_spheres` and `remove_big_alpha_spheres` afterwards, but the discarded
+        tetrahedra never reach the attributes of the object.
+
+        The tiled build returns the same alpha-spheres as the global build filtered with
+        `max_radius`, sorted by their points of contact instead of in the triangulation order.
+
+        With periodic boundary conditions the points are wrapped into the cell and only those
+        closer than `max_radius` to a face are replicated. The alpha-spheres centered in the cell
+        are kept, and their points of contact refer to the original points. Distances between
+        centers follow the minimum image convention.
 
         """
 
-        self.points=None
+        self._points=None
         self.n_points=None
-        self.centers=None
+        self._centers=None
         self.points_of_alpha_sphere=None
-        self.radii=None
+        self._radii=None
         self.n_alpha_spheres=None
+        self.method=method
+        self._point_radii=None
+        self.kept_indices=None
+        self.length_unit=None
+        self._min_radius=None
+        self._max_radius=None
+        self._tile_size=None
+        self._n_workers=n_workers
+        self._simplices=None
+        self._simplex_neighbors=None
+        self._update_backoff=0
+        self._n_skipped_updates=0
+        self.point_elements=None
+        self._point_is_polar=None
+        self.min_apolar_contacts=3
+        self._point_to_alpha_spheres=None
+        self._box=None
 
         if points is not None:
 
-            self.points = points
-            self.n_points = points.shape[0]
+            points_value, length_unit = puw.get_value_and_unit(points)
+            points_value = np.asarray(points_value, dtype=np.float64)
 
-            # Voronoi class to build the alpha-spheres
+            self._points = points_value
+            self.n_points = points_value.shape[0]
+            self.length_unit = length_unit
 
-            points_value, length_unit = puw.get_value_and_unit(points)
-            voronoi = Voronoi(points_value)
+            if method == 'weighted_voronoi':
+
+                # The points are weighted with the square of their radii
+
+                if radii is None:
+                    raise ArgumentError('radii', value=radii, caller='AlphaSpheres',
+                                        message=' The method weighted_voronoi needs the radii of the points. ')
+
+                self._point_radii = np.asarray(self._get_value(radii), dtype=np.float64)
+
+            if tile_size is not None and max_radius is None:
+                raise ArgumentError('max_radius', value=max_radius, caller='AlphaSpheres',
+                                    message=' The tiled build needs max_radius to define the halo of the tiles. ')
+
+            self._min_radius = self._get_value(min_radius)
+            self._max_radius = self._get_value(max_radius)
+            self._tile_size = self._get_value(tile_size)
+
+            if box is not None:
+                self._set_box(box)
+
+            self._build()
+
+    @property
+    def points(self):
+        return self._get_quantity(self._points)
+
+    @property
+    def centers(self):
+        return self._get_quantity(self._centers)
+
+    @property
+    def radii(self):
+        return self._get_quantity(self._radii)
+
+    @property
+    def point_radii(self):
+        return self._get_quantity(self._point_radii)
+
+    @property
+    def box(self):
+        return self._get_quantity(self._box)
+
+    @property
+    def n_polar_contacts(self):
+        if self._point_is_polar is None:
+            return None
+        return np.count_nonzero(self._point_is_polar[self.points_of_alpha_sphere], axis=1)
+
+    @property
+    def is_apolar(self):
+        if self._point_is_polar is None:
+            return None
+        return 4 - self.n_polar_contacts >= self.min_apolar_contacts
+
+    def _get_quantity(self, value):
+
+        # Raw arrays are wrapped with the length unit only when accessed from the public API
+
+        if value is None or self.length_unit is None:
+            return value
+
+        return puw.quantity(value, self.length_unit)
+
+    def _get_value(self, quantity):
+
+        # Values of input lengths in the length unit of the object
+
+        if quantity is None or not puw.is_quantity(quantity):
+            return quantity
 
-            # The alpha-spheres centers are the voronoi vertices
+        return puw.get_value(quantity, to_unit=self.length_unit)
 
-            self.centers = puw.quantity(voronoi.vertices, length_unit)
-            self.n_alpha_spheres = voronoi.vertices.shape[0]
+    def _set_box(self, box):
 
-            # Let's compute the 4 atoms' sets in contact with each alpha-sphere
+        # Periodic cell in the length unit of the object, checked against the halo of max_radius
 
-            self.points_of_alpha_sphere = [[] for ii in range(self.n_alpha_spheres)]
+        box = np.asarray(self._get_value(box), dtype=np.float64).reshape(3, 3)
 
-            n_regions = len(voronoi.regions)
-            region_point={voronoi.point_region[ii]:ii for ii in range(self.n_points)}
+        if self._max_radius is None:
+            raise ArgumentError('max_radius', value=self._max_radius, caller='AlphaSpheres',
+                                message=' Periodic boundary conditions need max_radius to define the halo. ')
 
-            for region_index in range(n_regions):
-                region=voronoi.regions[region_index]
-                if len(region)>0:
-                    point_index=region_point[region_index]
-                    for vertex_index in region:
-                        if vertex_index != -1:
-                            self.points_of_alpha_sphere[vertex_index].append(point_index)
-            for ii in range(self.n_alpha_spheres):
-                self.points_of_alpha_sphere[ii] = sorted(self.points_of_alpha_sphere[ii])
+        halo = self._max_radius
+        if self._point_radii is not None:
+            halo = np.sqrt(halo**2 + np.max(self._point_radii)**2)
 
+        if _is_cell_too_small(box, halo):
+            raise ArgumentError('box', value=box, caller='AlphaSpheres',
+                                message=' The periodic cell must be wider than twice the halo of max_radius. ')
 
-            # Let's finally compute the radius of each alpha-sphere
+        self._box = box
 
-            self.radii = []
+    def _build(self):
 
-            for ii in range(self.n_alpha_spheres):
-                radius = euclidean(voronoi.vertices[ii], points_value[self.points_of_alpha_sphere[ii][0]])
-                self.radii.append(radius)
+        # Alpha-spheres of self._points inside the radius window, from scratch. The whole Delaunay
+        # triangulation is kept for the incremental updates.
 
-            self.points_of_alpha_sphere = np.array(self.points_of_alpha_sphere)
-            self.radii = puw.quantity(np.array(self.radii), length_unit)
+        weights = None if self._point_radii is None else self._point_radii**2
+
+        if self._box is not None:
+            points_of_alpha_sphere, centers, radii = _build_periodic_alpha_spheres(self._points, self._box,
+                    self._max_radius, min_radius=self._min_radius, weights=weights, tile_size=self._tile_size,
+                    n_workers=self._n_workers)
+            self._simplices = None
+            self._simplex_neighbors = None
+            self._set_alpha_spheres(points_of_alpha_sphere, centers, radii, None)
+            return
+
+        points_of_alpha_sphere, centers, radii, kept_indices, simplices = _build_filtered_alpha_spheres(
+                self._points, weights=weights, min_radius=self._min_radius, max_radius=self._max_radius,
+                tile_size=self._tile_size, n_workers=self._n_workers, return_simplices=True)
+
+        self._simplices = simplices if self.method == 'voronoi' else None
+        self._simplex_neighbors = None
+
+        self._set_alpha_spheres(points_of_alpha_sphere, centers, radii, kept_indices)
+
+    def _set_alpha_spheres(self, points_of_alpha_sphere, centers, radii, kept_indices):
+
+        self.points_of_alpha_sphere = points_of_alpha_sphere
+        self.n_alpha_spheres = points_of_alpha_sphere.shape[0]
+        self._centers = centers
+        self._radii = radii
+        self.kept_indices = kept_indices
+        self._point_to_alpha_spheres = None
+
+    def update(self, points, box=None):
+
+        """Updating the set of alpha-spheres to new coordinates of the same points
+        The alpha-spheres are computed again for the new coordinates, and the set of alpha-spheres
+        is the one of a new object built with the same arguments. Only the set is the same: after
+        a local repair of the triangulation (see Notes) the alpha-spheres are not in the same
+        order, so their indices and `kept_indices` differ from those of a new object. Alpha-spheres
+        removed with `remove_alpha_spheres` are restored.
+
+        Parameters
+        ----------
+        points : ndarray (shape=[n_points,3], dtype=float)
+            New coordinates of the points, in the same order.
+        box : quantity (shape=[3,3]), default None
+            New periodic cell, if the set was built with periodic boundary conditions.
+
+        Examples
+        --------
+        >>> import topomt as tmt
+        >>> alpha_spheres = tmt.alpha_spheres.AlphaSpheres(coordinates[0], max_radius='6 angstroms')
+        >>> for frame_coordinates in coordinates[1:]:
+        ...     alpha_spheres.update(frame_coordinates)
+
+        Notes
+        -----
+        With the method 'voronoi', no tiles and no periodic cell the previous Delaunay triangulation is reused:
+        every tetrahedron is checked at once with the new coordinates and only the regions where
+        the empty-sphere condition breaks are triangulated again. The full build is the fallback
+        when more than 2% of the tetrahedra are invalid or the local repair fails, and the only
+        path for the other methods. After a failed attempt the next ones are made after 3, 15 and
+        then 63 frames with the full build, so that large displacements cost about the same as the
+        full build. After a local repair the tetrahedra that remain valid keep their relative order
+        and the new ones are appended at the end.
+
+        This only pays off when the displacements are very small compared with the distances
+        between points. With 5000 random points at 0.1 points per cubic angstrom
+        (benchmarks/alpha_spheres_update.py), the update is about 1.7 times faster than the full
+        build at 0.0001 angstroms per frame and 1.2 times faster at 0.001 angstroms. From 0.01
+        angstroms per frame on, which includes the usual spacing of the frames of a molecular
+        dynamics trajectory, it is as fast as the full build and no faster.
+
+        """
+
+        points_value = np.asarray(self._get_value(points), dtype=np.float64)
+
+        if points_value.shape != self._points.shape:
+            raise ArgumentError('points', value=points, caller='AlphaSpheres.update',
+                                message=' The new coordinates must be those of the same points. ')
+
+        self._points = points_value
+
+        if box is not None:
+            self._set_box(box)
+
+        triangulation = None
+
+        # After a failed local repair the next ones are attempted less and less often, so that
+        # large displacements cost little more than the full build
+
+        if self._simplices is not None:
+            if self._n_skipped_updates < self._update_backoff:
+                self._n_skipped_updates += 1
+            else:
+                triangulation = _update_delaunay(points_value, self._simplices, self._simplex_neighbors)
+                self._n_skipped_updates = 0
+                self._update_backoff = 0 if triangulation is not None else min(4*self._update_backoff + 3, 63)
+
+        if triangulation is None:
+            self._build()
+            return
+
+        simplices, self._simplex_neighbors, centers, radii = triangulation
+        self._simplices = simplices
+
+        kept_indices = np.nonzero(_get_radius_window_mask(radii, self._min_radius, self._max_radius))[0]
+
+        self._set_alpha_spheres(simplices[kept_indices], centers[kept_indices], radii[kept_indices], kept_indices)
+
+    @classmethod
+    def _from_arrays(cls, points, centers, radii, points_of_alpha_sphere, length_unit=None, method='voronoi',
+                     point_radii=None, kept_indices=None, min_radius=None, max_radius=None, box=None):
+
+        # New instance from raw arrays already computed, without building the alpha-spheres
+
+        alpha_spheres = cls(skip_digestion=True)
+        alpha_spheres._min_radius = min_radius
+        alpha_spheres._max_radius = max_radius
+        alpha_spheres.method = method
+        alpha_spheres.length_unit = length_unit
+        alpha_spheres._points = points
+        alpha_spheres.n_points = points.shape[0]
+        alpha_spheres._point_radii = point_radii
+        alpha_spheres._centers = centers
+        alpha_spheres._radii = radii
+        alpha_spheres.points_of_alpha_sphere = points_of_alpha_sphere
+        alpha_spheres.n_alpha_spheres = points_of_alpha_sphere.shape[0]
+        alpha_spheres.kept_indices = kept_indices
+        alpha_spheres._box = box
+
+        return alpha_spheres
+
+    def set_point_elements(self, elements, min_apolar_contacts=3):
+
+        """Setting the elements of the points
+        The chemical type of the alpha-spheres is derived from the elements of the points in
+        contact with them, as in fpocket: a point is polar if the electronegativity of its element
+        is 2.8 or larger (N, O, F, Cl, Br), and an alpha-sphere is apolar if at least
+        `min_apolar_contacts` of its four points are apolar.
+
+        Parameters
+        ----------
+        elements : numpy.ndarray, list or tuple (shape=[n_points], dtype=str)
+            Element symbol of each point.
+        min_apolar_contacts : int, default 3
+            Minimum number of apolar points in contact with an apolar alpha-sphere.
+
+        Examples
+        --------
+        >>> alpha_spheres.set_point_elements(msm.get(molsys, selection=atom_indices, atom_type=True))
+        >>> alpha_spheres.is_apolar
+
+        """
+
+        elements = np.asarray(elements, dtype=str)
+
+        if elements.shape != (self.n_points,):
+            raise ArgumentError('elements', value=elements, caller='AlphaSpheres.set_point_elements',
+                                message=' One element per point is needed. ')
+
+        self.point_elements = elements
+        self._point_is_polar = _get_polar_mask(elements)
+        self.min_apolar_contacts = min_apolar_contacts
+
+    def subset(self, indices):
+
+        """Subset of alpha-spheres as a view, without copying the arrays of the set
+
+        Parameters
+        ----------
+        indices : numpy.ndarray, list, tuple or slice
+            Indices, or boolean mask, of the alpha-spheres defining the subset.
+
+        Returns
+        -------
+        AlphaSpheresView
+            View of the set with the selected alpha-spheres.
+
+        Examples
+        --------
+        >>> pocket = aspheres.subset([1, 3])
+        >>> pocket.get_points_of_alpha_spheres(range(pocket.n_alpha_spheres))
+
+        """
+
+        from .alpha_spheres_view import AlphaSpheresView
+
+        return AlphaSpheresView(self, indices)
 
     def remove_alpha_spheres(self, indices):
 
@@ -120,21 +468,26 @@ class AlphaSpheres():
         mask = np.ones([self.n_alpha_spheres], dtype=bool)
         mask[indices] = False
 
-        self.centers = self.centers[mask,:]
+        self._centers = self._centers[mask,:]
         self.points_of_alpha_sphere = self.points_of_alpha_sphere[mask,:]
-        self.radii = self.radii[mask]
+        self._radii = self._radii[mask]
         self.n_alpha_spheres = np.count_nonzero(mask)
 
+        if self.kept_indices is not None:
+            self.kept_indices = self.kept_indices[mask]
+
+        self._point_to_alpha_spheres = None
+
 
     def remove_small_alpha_spheres(self, minimum_radius):
 
-        indices_to_remove = np.where(self.radii < minimum_radius)
+        indices_to_remove = np.where(self._radii < self._get_value(minimum_radius))
         self.remove_alpha_spheres(indices_to_remove)
 
 
     def remove_big_alpha_spheres(self, maximum_radius):
 
-        indices_to_remove = np.where(self.radii > maximum_radius)
+        indices_to_remove = np.where(self._radii > self._get_value(maximum_radius))
         self.remove_alpha_spheres(indices_to_remove)
 
 
@@ -168,15 +521,51 @@ class AlphaSpheres():
 
         """
 
-        point_indices = set([])
+        indices = np.asarray(indices, dtype=np.int64)
 
-        for index in indices:
-            point_indices = point_indices.union(set(self.points_of_alpha_sphere[index]))
+        return np.unique(self.points_of_alpha_sphere[indices]).tolist()
 
-        return list(point_indices)
+    def get_point_to_alpha_spheres(self):
 
-    def get_neighbors(self, criterion: str = "point") -> dict[int, list[int]]:
-        """Return the symmetric dictionary of alpha-sphere neighbors.
+        """Get the inverse index from points to the alpha-spheres in contact with them
+        The index is built the first time it is requested and kept until the set of alpha-spheres
+        changes.
+
+        Return
+        ------
+        point_to_alpha_spheres : scipy.sparse.csr_matrix (shape=[n_points, n_alpha_spheres], dtype=int32)
+            Incidence matrix with an entry equal to 1 for every point and alpha-sphere in contact.
+            The alpha-spheres in contact with the point `i` are
+            ``indices[indptr[i]:indptr[i+1]]``.
+
+        Examples
+        --------
+        >>> point_to_alpha_spheres = aspheres.get_point_to_alpha_spheres()
+        >>> point_to_alpha_spheres[4].indices
+        array([0, 1, 2, 3], dtype=int32)
+
+        """
+
+        if self._point_to_alpha_spheres is None:
+            self._point_to_alpha_spheres = self._get_incidence().T.tocsr()
+            self._point_to_alpha_spheres.sort_indices()
+
+        return self._point_to_alpha_spheres
+
+    def _get_incidence(self):
+
+        # (n_alpha_spheres, n_points) incidence matrix of points_of_alpha_sphere
+
+        n_as = self.n_alpha_spheres
+        n_contacts = self.points_of_alpha_sphere.shape[1]
+
+        return csr_matrix((np.ones(n_as*n_contacts, dtype=np.int32),
+                           self.points_of_alpha_sphere.ravel(),
+                           np.arange(0, n_as*n_contacts+1, n_contacts)),
+                          shape=(n_as, self.n_points))
+
+    def get_neighbor_graph(self, criterion: str = "point", weighted: bool = False) -> csr_matrix:
+        """Return the sparse, symmetric graph of alpha-sphere neighbors.
 
         Parameters
         ----------
@@ -184,18 +573,20 @@ class AlphaSpheres():
             - "point": neighbors that share at least 1 point (atom).
             - "edge": neighbors that share at least 2 points (a edge).
             - "face": neighbors that share at least 3 points (a face).
+        weighted : bool, default False
+            If True, the value of each entry is the number of points shared by the two
+            alpha-spheres. Otherwise all entries are 1.
 
         Returns
         -------
-        neighbors : dict[int, list[int]]
-            Dictionary where each key is the alpha-sphere index and the value is
-            the sorted list of neighbor alpha-sphere indices.
+        graph : scipy.sparse.csr_matrix (shape=[n_alpha_spheres, n_alpha_spheres], dtype=int32)
+            Adjacency matrix of the neighbor graph, with sorted column indices and no diagonal.
 
         Notes
         -----
-        This method assumes ``self.points_of_alpha_sphere`` is an array-like
-        where each element is the iterable of point indices touched by that
-        alpha-sphere.
+        The number of points shared by every pair of alpha-spheres is obtained at once as the
+        product of the (n_alpha_spheres, n_points) incidence matrix of ``points_of_alpha_sphere``
+        by the cached inverse index returned by `get_point_to_alpha_spheres`.
         """
 
         criterion_map = {
@@ -210,49 +601,504 @@ class AlphaSpheres():
         min_shared = criterion_map[criterion]
 
         n_as = self.n_alpha_spheres
-        # índice inverso punto -> esferas
-        point_to_spheres: dict[int, list[int]] = {}
-
-        for as_idx in range(n_as):
-            pts = self.points_of_alpha_sphere[as_idx]
-            for p in pts:
-                point_to_spheres.setdefault(int(p), []).append(as_idx)
-
-        # diccionario de sets para ir construyendo vecinos simétricos
-        neighbors_sets: dict[int, set[int]] = {i: set() for i in range(n_as)}
-
-        # para cada esfera contamos cuántos puntos comparte con las demás
-        for as_idx in range(n_as):
-            shared_counts: dict[int, int] = {}
-            pts = self.points_of_alpha_sphere[as_idx]
-            for p in pts:
-                for other_idx in point_to_spheres[int(p)]:
-                    if other_idx == as_idx:
-                        continue
-                    shared_counts[other_idx] = shared_counts.get(other_idx, 0) + 1
-
-            # filtramos según el mínimo de puntos compartidos
-            for other_idx, count in shared_counts.items():
-                if count >= min_shared:
-                    neighbors_sets[as_idx].add(other_idx)
-                    neighbors_sets[other_idx].add(as_idx)  # simetría
-
-        # lo devolvemos ya como dict de listas ordenadas
+
+        graph = (self._get_incidence() @ self.get_point_to_alpha_spheres()).tocoo()
+
+        mask = (graph.row != graph.col) & (graph.data >= min_shared)
+        data = graph.data[mask] if weighted else np.ones(np.count_nonzero(mask), dtype=np.int32)
+
+        graph = csr_matrix((data, (graph.row[mask], graph.col[mask])), shape=(n_as, n_as))
+        graph.sort_indices()
+
+        return graph
+
+    def get_neighbors(self, criterion: str = "point") -> dict[int, list[int]]:
+        """Return the symmetric dictionary of alpha-sphere neighbors.
+
+        Parameters
+        ----------
+        criterion : {"point", "edge", "face"}
+            - "point": neighbors that share at least 1 point (atom).
+            - "edge": neighbors that share at least 2 points (a edge).
+            - "face": neighbors that share at least 3 points (a face).
+
+        Returns
+        -------
+        neighbors : dict[int, list[int]]
+            Dictionary where each key is the alpha-sphere index and the value is
+            the sorted list of neighbor alpha-sphere indices.
+
+        Notes
+        -----
+        This is a view, as a dictionary, of the sparse graph returned by
+        ``get_neighbor_graph``. Alpha-spheres without neighbors are not included.
+        """
+
+        graph = self.get_neighbor_graph(criterion)
+        indptr = graph.indptr
+        indices = graph.indices
+
         neighbors: dict[int, list[int]] = {
-            i: sorted(list(s))
-            for i, s in neighbors_sets.items()
-            if len(s) > 0
+            i: indices[indptr[i]:indptr[i+1]].tolist()
+            for i in np.flatnonzero(np.diff(indptr)).tolist()
         }
 
         return neighbors
 
     def get_centers_distance(self, i: int, j: int):
-        """Return the Euclidean distance (Å) between the centers of two alpha-spheres."""
-        diff = self.centers[i] - self.centers[j]
-        return (diff[0]**2+diff[1]**2+diff[2]**2) ** 0.5
+        """Return the Euclidean distance between the centers of two alpha-spheres."""
+        diff = self._get_minimum_image(self._centers[i] - self._centers[j])
+        return self._get_quantity(np.sqrt(diff @ diff))
+
+    def get_centers_distances(self, pairs):
+        """Return the Euclidean distances between the centers of pairs of alpha-spheres.
+
+        Parameters
+        ----------
+        pairs : numpy.ndarray, list or tuple (shape=[n_pairs, 2], dtype=int)
+            Indices of the two alpha-spheres of each pair.
+
+        Returns
+        -------
+        distances : ndarray (shape=[n_pairs], dtype=float)
+            Distances between the centers of each pair of alpha-spheres.
+        """
+
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        centers = self._centers
+        diff = self._get_minimum_image(centers[pairs[:,0]] - centers[pairs[:,1]])
+        return self._get_quantity(np.sqrt(np.einsum('ij,ij->i', diff, diff)))
+
+    def get_edge_lengths(self, graph):
+        """Return the distances between the centers of the alpha-spheres linked in a graph.
+
+        Parameters
+        ----------
+        graph : scipy.sparse matrix (shape=[n_alpha_spheres, n_alpha_spheres])
+            Graph of alpha-spheres, as the one returned by ``get_neighbor_graph``.
+
+        Returns
+        -------
+        lengths : ndarray (shape=[n_edges], dtype=float)
+            Distance between the centers of the alpha-spheres of every stored entry of `graph`,
+            in the same order as ``graph.tocsr().data``.
+        """
+
+        graph = graph.tocsr()
+        rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+        centers = self._centers
+        diff = self._get_minimum_image(centers[rows] - centers[graph.indices])
+        return self._get_quantity(np.sqrt(np.einsum('ij,ij->i', diff, diff)))
+
+    def _get_minimum_image(self, vectors):
+
+        # Shortest periodic image of difference vectors, exact for orthorhombic cells
+
+        if self._box is None:
+            return vectors
+
+        fractional = vectors @ np.linalg.inv(self._box)
+        fractional -= np.round(fractional)
+
+        return fractional @ self._box
+
+    def _get_boxsize(self):
+
+        # Side lengths of an orthorhombic periodic cell, as cKDTree's boxsize. None otherwise.
+
+        if self._box is None or np.count_nonzero(self._box - np.diag(np.diag(self._box))):
+            return None
+
+        return np.diag(self._box).copy()
+
+    def get_buriedness(self, shell_radii):
+
+        """Number of points around the center of every alpha-sphere
+        The buriedness of an alpha-sphere is the number of points (heavy atoms, for instance)
+        closer than a given radius to its center. Alpha-spheres in the surface of the molecule
+        have fewer points around than those deep inside a cavity.
+
+        Parameters
+        ----------
+        shell_radii : quantity (shape=[] or [n_shells])
+            Radius, or radii, of the spheres around the centers where the points are counted.
+
+        Returns
+        -------
+        numpy.ndarray (shape=[n_alpha_spheres] or [n_alpha_spheres, n_shells], dtype=int)
+            Number of points closer than each radius to the center of each alpha-sphere.
+
+        Examples
+        --------
+        >>> counts = alpha_spheres.get_buriedness(puw.quantity([6.0, 8.0, 10.0], 'angstroms'))
+
+        Notes
+        -----
+        All shells of all centers are counted with a single query to a KD-tree of the points, run
+        in parallel over all the available cores. With a periodic cell, the tree also holds the
+        images of the points within the largest shell radius around the cell.
+
+        """
+
+        shell_radii = np.asarray(self._get_value(shell_radii), dtype=np.float64)
+        n_shells = shell_radii.size
+
+        points = self._points
+        if self._box is not None:
+            points, _ = _get_periodic_images(points, self._box, shell_radii.max())
+
+        tree = cKDTree(points)
+        centers = np.repeat(self._centers, n_shells, axis=0)
+        radii = np.tile(shell_radii.ravel(), self.n_alpha_spheres)
+        counts = tree.query_ball_point(centers, radii, return_length=True, workers=-1)
+
+        if shell_radii.ndim == 0:
+            return counts
+
+        return counts.reshape(self.n_alpha_spheres, n_shells)
+
+    def get_volumes(self, groups=None, method='monte_carlo', relative_error=0.01, spacing=None, seed=None,
+                    return_errors=False):
+
+        """Volume of the union of the alpha-spheres of every group
+        Pockets, for instance, are groups of alpha-spheres. The volumes of all the groups are
+        estimated in a single call.
+
+        Parameters
+        ----------
+        groups : list of lists of int, default None
+            Indices of the alpha-spheres of every group. If None, a single group with all the
+            alpha-spheres.
+        method : {'monte_carlo', 'grid'}, default 'monte_carlo'
+            Monte Carlo integration in the bounding box of every group, or count of the voxels of a
+            regular grid whose center is inside the union.
+        relative_error : float, default 0.01
+            Target relative standard error of the Monte Carlo estimates.
+        spacing : quantity, default None
+            Side of the voxels with the method 'grid'. If None, a tenth of the mean radius of the
+            alpha-spheres of the groups.
+        seed : int or numpy.random.Generator, default None
+            Seed of the random numbers of the method 'monte_carlo'.
+        return_errors : bool, default False
+            Return also the relative standard errors of the Monte Carlo estimates.
+
+        Returns
+        -------
+        quantity (shape=[n_groups])
+            Volume of every group.
+        numpy.ndarray (shape=[n_groups], dtype=float)
+            Relative standard errors, only with `return_errors=True` and the method 'monte_carlo'.
+
+        Examples
+        --------
+        >>> volumes = alpha_spheres.get_volumes(pockets, seed=0)
+
+        Notes
+        -----
+        With a periodic cell the alpha-spheres of every group are taken at the image closest to
+        the first alpha-sphere of the group. The random points, or the voxels, of all the groups
+        are tested together against a KD-tree of the centers, and every group stops drawing
+        points as soon as it reaches the target error.
+
+        """
+
+        if groups is None:
+            groups = [np.arange(self.n_alpha_spheres)]
+
+        if method not in ['monte_carlo', 'grid']:
+            raise ArgumentError('method', value=method, caller='AlphaSpheres.get_volumes', message=None)
+
+        sizes = np.array([len(group) for group in groups], dtype=np.int64)
+        if np.any(sizes == 0):
+            raise ArgumentError('groups', value=groups, caller='AlphaSpheres.get_volumes',
+                                message=' Every group needs at least one alpha-sphere. ')
+
+        n_groups = sizes.shape[0]
+        spheres = np.concatenate([np.asarray(group, dtype=np.int64) for group in groups])
+        labels = np.repeat(np.arange(n_groups), sizes)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        # Spheres of every group around the same periodic image
+        reference = self._centers[spheres[starts]]
+        centers = reference[labels] + self._get_minimum_image(self._centers[spheres] - reference[labels])
+        radii = self._radii[spheres]
+
+        errors = None
+        if method == 'monte_carlo':
+            volumes, errors = _get_union_volumes_monte_carlo(centers, radii, labels, n_groups,
+                                                             relative_error=relative_error, seed=seed)
+        else:
+            spacing = 0.1 * radii.mean() if spacing is None else self._get_value(spacing)
+            volumes = _get_union_volumes_grid(centers, radii, labels, n_groups, spacing)
+
+        if self.length_unit is not None:
+            volumes = puw.quantity(volumes, self.length_unit**3)
+
+        if return_errors:
+            return volumes, errors
+
+        return volumes
+
+    @classmethod
+    @digest()
+    def from_trajectory(cls, molecular_system, selection='all', structure_indices='all', radii=None,
+                        method='voronoi', min_radius=None, max_radius=None, tile_size=None, pbc=False,
+                        n_workers=None, syntax='MolSysMT', skip_digestion=False):
+        """Sets of alpha-spheres of several structures of a molecular system.
+
+        Parameters
+        ----------
+        molecular_system : molecular system
+            Molecular system in any form supported by MolSysMT.
+        selection : str or list, default 'all'
+            Atoms whose coordinates are the points of the alpha-spheres.
+        structure_indices : 'all' or list, default 'all'
+            Structures (frames) of the molecular system.
+        radii : quantity (shape=[n_points]), default None
+            Radii of the points, as in ``AlphaSpheres``, common to all structures.
+        method : {'voronoi', 'weighted_voronoi'}, default 'voronoi'
+            Method used to build the alpha-spheres, as in ``AlphaSpheres``.
+        min_radius : quantity, default None
+            Minimum radius of the alpha-spheres, as in ``AlphaSpheres``.
+        max_radius : quantity, default None
+            Maximum radius of the alpha-spheres, as in ``AlphaSpheres``. Required with `pbc`.
+        tile_size : quantity, default None
+            Side of the tiles of the build, as in ``AlphaSpheres``.
+        pbc : bool, default False
+            If True, the periodic cell of every structure, taken from the molecular system, is
+            used to build its alpha-spheres with periodic boundary conditions.
+        n_workers : int, default None
+            Number of processes building structures at the same time when iterating over the
+            trajectory. With None or 1 the structures are processed one after the other.
+        syntax : str, default 'MolSysMT'
+            Syntax of `selection`.
+
+        Returns
+        -------
+        alpha_spheres_trajectory : AlphaSpheresTrajectory
+            Frame-indexed collection of sets of alpha-spheres, created on access.
+
+        Notes
+        -----
+        No structure is built here: the alpha-spheres of a structure are computed when it is
+        indexed or reached while iterating. When iterating with `n_workers` larger than 1, the
+        coordinates of all the structures are written once in a block of shared memory which
+        every worker process maps, so no coordinates are pickled with the tasks. The periodic cell
+        of each structure is sent with its task.
+
+        """
+
+        import molsysmt as msm
+        from .alpha_spheres_trajectory import _get_alpha_spheres_trajectory
+
+        atom_indices = msm.select(molecular_system, selection=selection, syntax=syntax)
+        coordinates = msm.get(molecular_system, element='atom', selection=atom_indices,
+                              structure_indices=structure_indices, coordinates=True)
+
+        box = None
+        if pbc:
+            box = msm.get(molecular_system, element='system', structure_indices=structure_indices, box=True)
+            if box is None:
+                warnings.warn("pbc=True but the molecular system has no periodic cell; periodicity is ignored.")
+
+        if isinstance(structure_indices, str) and structure_indices == 'all':
+            n_structures = msm.get(molecular_system, element='system', n_structures=True)
+            structure_indices = np.arange(n_structures)
+
+        return _get_alpha_spheres_trajectory(coordinates, np.atleast_1d(structure_indices), radii=radii,
+                                             method=method, min_radius=min_radius, max_radius=max_radius,
+                                             tile_size=tile_size, box=box, n_workers=n_workers)
+
+    def save(self, path, key=None):
+        """Save the set of alpha-spheres to disk.
+
+        Parameters
+        ----------
+        path : str or Path
+            Output path. If it ends with '.npz' a single NumPy archive is written. Otherwise a
+            directory is created with one '.npy' file per array and a 'metadata.json' file.
+        key : str, default None
+            Cache key stored with the metadata, as the one returned by ``get_cache_key``.
+
+        Notes
+        -----
+        Only the directory bundle can be memory-mapped by ``AlphaSpheres.load``.
+        """
+
+        path = Path(path)
+
+        arrays = {
+            'points': self._points,
+            'centers': self._centers,
+            'radii': self._radii,
+            'points_of_alpha_sphere': self.points_of_alpha_sphere,
+        }
+        if self._point_radii is not None:
+            arrays['point_radii'] = self._point_radii
+        if self.kept_indices is not None:
+            arrays['kept_indices'] = self.kept_indices
+        if self.point_elements is not None:
+            arrays['point_elements'] = self.point_elements
+        if self._box is not None:
+            arrays['box'] = self._box
+
+        metadata = {
+            'length_unit': None if self.length_unit is None else str(self.length_unit),
+            'method': self.method,
+            'n_points': int(self.n_points),
+            'n_alpha_spheres': int(self.n_alpha_spheres),
+            'min_radius': None if self._min_radius is None else float(self._min_radius),
+            'max_radius': None if self._max_radius is None else float(self._max_radius),
+            'min_apolar_contacts': int(self.min_apolar_contacts),
+            'arrays': sorted(arrays),
+            'key': key,
+        }
+
+        if path.suffix == '.npz':
+            np.savez(path, metadata=np.array(json.dumps(metadata)), **arrays)
+        else:
+            path.mkdir(parents=True, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(path / f'{name}.npy', np.ascontiguousarray(array))
+            with open(path / 'metadata.json', 'w') as fp:
+                json.dump(metadata, fp)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a set of alpha-spheres saved with ``AlphaSpheres.save``.
+
+        Parameters
+        ----------
+        path : str or Path
+            Path of the '.npz' archive or of the directory bundle.
+        mmap : bool, default True
+            If True, the arrays of a directory bundle are memory-mapped read-only
+            (``mmap_mode='r'``), so that processes loading the same bundle share the same pages.
+            Arrays of a '.npz' archive are always read into memory.
+
+        Returns
+        -------
+        alpha_spheres : AlphaSpheres
+            The set of alpha-spheres.
+        """
+
+        path = Path(path)
+
+        if path.suffix == '.npz':
+            with np.load(path) as archive:
+                metadata = json.loads(str(archive['metadata']))
+                arrays = {name: archive[name] for name in metadata['arrays']}
+        else:
+            with open(path / 'metadata.json', 'r') as fp:
+                metadata = json.load(fp)
+            mmap_mode = 'r' if mmap else None
+            arrays = {name: np.load(path / f'{name}.npy', mmap_mode=mmap_mode) for name in metadata['arrays']}
+
+        length_unit = metadata['length_unit']
+        if length_unit is not None:
+            _, length_unit = puw.get_value_and_unit(puw.quantity(1.0, length_unit))
+
+        alpha_spheres = cls._from_arrays(arrays['points'], arrays['centers'], arrays['radii'],
+                                         arrays['points_of_alpha_sphere'], length_unit=length_unit,
+                                         method=metadata['method'], point_radii=arrays.get('point_radii'),
+                                         kept_indices=arrays.get('kept_indices'),
+                                         min_radius=metadata.get('min_radius'),
+                                         max_radius=metadata.get('max_radius'), box=arrays.get('box'))
+
+        if 'point_elements' in arrays:
+            alpha_spheres.set_point_elements(arrays['point_elements'],
+                                             min_apolar_contacts=metadata.get('min_apolar_contacts', 3))
+
+        return alpha_spheres
+
+    @staticmethod
+    def get_cache_key(points, selection='all', method='voronoi', **parameters):
+        """Content hash identifying a set of alpha-spheres.
+
+        Parameters
+        ----------
+        points : ndarray (shape=[n_points,3], dtype=float)
+            Coordinates of the points used to generate the set of alpha-spheres.
+        selection : str or list, default 'all'
+            Selection of atoms the points come from.
+        method : str, default 'voronoi'
+            Method used to build the set.
+        **parameters
+            Any other argument of ``AlphaSpheres`` changing the result (`radii`, `min_radius`,
+            `max_radius`...).
+
+        Returns
+        -------
+        key : str
+            SHA-256 hexadecimal digest of the coordinates, the selection, the method and the
+            parameters.
+        """
+
+        def feed(value):
+            if puw.is_quantity(value):
+                value = puw.get_value(puw.standardize(value))
+            if isinstance(value, np.ndarray):
+                hasher.update(np.ascontiguousarray(value, dtype=np.float64).tobytes())
+            else:
+                hasher.update(repr(value).encode())
+
+        hasher = hashlib.sha256()
+        feed(points)
+        feed(selection)
+        feed(method)
+        for name in sorted(parameters):
+            hasher.update(name.encode())
+            feed(parameters[name])
+
+        return hasher.hexdigest()
+
+    @classmethod
+    def from_cache(cls, cache_dir, points, selection='all', method='voronoi', **parameters):
+        """Load a set of alpha-spheres from a cache directory, building and caching it if missing.
+
+        Parameters
+        ----------
+        cache_dir : str or Path
+            Directory with the cached sets, one bundle per cache key.
+        points : ndarray (shape=[n_points,3], dtype=float)
+            Coordinates of the points used to generate the set of alpha-spheres.
+        selection : str or list, default 'all'
+            Selection of atoms the points come from. Only used to compute the cache key.
+        method : str, default 'voronoi'
+            Method used to build the set.
+        **parameters
+            Other arguments of ``AlphaSpheres``.
+
+        Returns
+        -------
+        alpha_spheres : AlphaSpheres
+            The set of alpha-spheres, memory-mapped when it comes from the cache.
+        """
+
+        key_parameters = {name: value for name, value in parameters.items() if name != 'n_workers'}
+        key = cls.get_cache_key(points, selection=selection, method=method, **key_parameters)
+        path = Path(cache_dir) / key
+
+        if (path / 'metadata.json').exists():
+            return cls.load(path, mmap=True)
+
+        alpha_spheres = cls(points=points, method=method, **parameters)
+
+        # Written in a temporary directory and renamed, so concurrent processes never read a
+        # half-written bundle.
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=cache_dir, prefix=f'.{key}-'))
+        alpha_spheres.save(tmp_path, key=key)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        return alpha_spheres
 
     def show_alpha_spheres(self, view=None, indices='all', show_points=True, sphere_color=[0.8,0.8,0.8],
-                            point_color=[0.8,0.0,0.0], point_radius='0.2 angstrom'):
+                            point_color=[0.8,0.0,0.0], point_radius='0.2 angstrom', min_radius=None,
+                            max_radius=None, max_spheres=None, sampling='stride', seed=None):
 
         """3D spatial view of alpha-spheres and points
         An NGLview view is returned with alpha-spheres (gray color) and points (red color).
@@ -261,6 +1107,17 @@ class AlphaSpheres():
         ----------
         indices : numpy.ndarray, list or tuple (dtype:ints)
             List, tuple or numpy.ndarray with the alpha-sphere indices defining the subset.
+        min_radius : quantity, default None
+            If given, alpha-spheres with a smaller radius are not drawn.
+        max_radius : quantity, default None
+            If given, alpha-spheres with a larger radius are not drawn.
+        max_spheres : int, default None
+            If given, and there are more alpha-spheres to draw, only a sample of `max_spheres`
+            alpha-spheres is drawn.
+        sampling : {'stride', 'random'}, default 'stride'
+            How the sample is taken: alpha-spheres at a regular stride, or at random.
+        seed : int, default None
+            Seed of the random sample.
 
         Returns
         -------
@@ -279,6 +1136,11 @@ class AlphaSpheres():
         >>> aspheres = tmt.alpha_spheres.AlphaSpheres(points)
         >>> view = aspheres.show_alpha_spheres([1,3])
         >>> view
+
+        Notes
+        -----
+        All the alpha-spheres are sent to the widget as a single buffer of positions, colors and
+        radii, and so are the points.
         """
 
         if view is None:
@@ -287,24 +1149,47 @@ class AlphaSpheres():
 
             view = nv.NGLWidget()
 
-        point_indices = []
-
-        if indices=='all':
-            indices=range(self.n_alpha_spheres)
-            point_indices=range(self.n_points)
+        if isinstance(indices, str) and indices=='all':
+            indices = np.arange(self.n_alpha_spheres)
+            point_indices = np.arange(self.n_points)
         else:
-            point_indices=self.get_points_of_alpha_spheres(indices)
+            indices = np.asarray(indices, dtype=np.int64)
+            point_indices = None
+
+        radii = self._radii[indices]
+
+        # Level of detail: radius window and sample
+
+        if min_radius is not None or max_radius is not None:
+            mask = _get_radius_window_mask(radii, self._get_value(min_radius), self._get_value(max_radius))
+            indices = indices[mask]
+            radii = radii[mask]
+            point_indices = None
+
+        if max_spheres is not None and indices.shape[0] > max_spheres:
+            if sampling == 'stride':
+                sample = np.arange(0, indices.shape[0], -(-indices.shape[0] // max_spheres))
+            elif sampling == 'random':
+                rng = np.random.default_rng(seed)
+                sample = np.sort(rng.choice(indices.shape[0], size=max_spheres, replace=False))
+            else:
+                raise ValueError(f"sampling must be one of ('stride', 'random'), got {sampling!r}")
+            indices = indices[sample]
+            radii = radii[sample]
+            point_indices = None
 
         if show_points:
-            for index in point_indices:
-                atom_coordinates_value = puw.get_value(self.points[index,:])
-                point_radius_value = puw.get_value(point_radius)
-                view.shape.add_sphere(list(atom_coordinates_value), point_color, point_radius_value)
-
-        for index in indices:
-            sphere_coordinates_value = puw.get_value(self.centers[index,:])
-            sphere_radius_value = puw.get_value(self.radii[index])
-            view.shape.add_sphere(list(sphere_coordinates_value), sphere_color, sphere_radius_value)
+            if point_indices is None:
+                point_indices = np.unique(self.points_of_alpha_sphere[indices])
+            point_radius_value = puw.get_value(point_radius, to_unit=self.length_unit)
+            n_points = point_indices.shape[0]
+            view.shape.add_buffer('sphere', position=self._points[point_indices].ravel().tolist(),
+                                  color=np.tile(point_color, n_points).tolist(),
+                                  radius=np.full(n_points, point_radius_value).tolist())
+
+        n_spheres = indices.shape[0]
+        view.shape.add_buffer('sphere', position=self._centers[indices].ravel().tolist(),
+                              color=np.tile(sphere_color, n_spheres).tolist(),
+                              radius=radii.tolist())
 
         return view
-
@@ -0,0 +1,231 @@
+from topomt import pyunitwizard as puw
+from topomt._private.exceptions import ArgumentError
+from ._construction import _build_filtered_alpha_spheres, _build_periodic_alpha_spheres, _is_cell_too_small
+from .alpha_spheres import AlphaSpheres
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+class AlphaSpheresTrajectory():
+
+    """Sets of alpha-spheres of the structures of a trajectory
+
+    Frame-indexed collection returned by `AlphaSpheres.from_trajectory`. It keeps only the
+    coordinates of the structures and the parameters of the build: the alpha-spheres of a
+    structure are computed when it is accessed, and they are not kept by the collection.
+    Iterating over the collection with `n_workers` larger than 1 streams the structures from a
+    pool of processes, in order and with a bounded number of structures in flight. With periodic
+    cells, every structure is built with its own cell.
+
+    Attributes
+    ----------
+    structure_indices : numpy.ndarray (shape=[n_structures], dtype=int)
+        Indices of the structures in the original molecular system.
+    n_structures : int
+        Number of structures.
+    length_unit : unit
+        Length unit of the coordinates and radii of all the sets.
+    method : str
+        Method used to build the alpha-spheres.
+    n_workers : int
+        Number of processes used when iterating over the structures.
+    n_alpha_spheres : numpy.ndarray (shape=[n_structures], dtype=int)
+        Number of alpha-spheres of every structure. The first access builds every structure once,
+        as iterating does, keeping only the counts.
+
+    Examples
+    --------
+    >>> import topomt as tmt
+    >>> trajectory = tmt.alpha_spheres.AlphaSpheres.from_trajectory(molsys, selection='protein', n_workers=4)
+    >>> alpha_spheres = trajectory[10]
+    >>> n_alpha_spheres = [frame.n_alpha_spheres for frame in trajectory]
+
+    """
+
+    def __init__(self, coordinates, structure_indices, length_unit=None, method='voronoi', point_radii=None,
+                 min_radius=None, max_radius=None, tile_size=None, boxes=None, n_workers=None):
+
+        self._coordinates = coordinates
+        self.structure_indices = np.asarray(structure_indices)
+        self.n_structures = coordinates.shape[0]
+        self.length_unit = length_unit
+        self.method = method
+        self.n_workers = n_workers
+        self._point_radii = point_radii
+        self._min_radius = min_radius
+        self._max_radius = max_radius
+        self._tile_size = tile_size
+        self._boxes = boxes
+        self._n_alpha_spheres = None
+
+        weights = None if point_radii is None else point_radii**2
+        self._parameters = (weights, min_radius, max_radius, tile_size)
+
+    def __len__(self):
+        return self.n_structures
+
+    def __getitem__(self, index):
+
+        if isinstance(index, (slice, list, np.ndarray)):
+            indices = np.arange(self.n_structures)[index]
+            return AlphaSpheresTrajectory(self._coordinates[indices], self.structure_indices[indices],
+                                          length_unit=self.length_unit, method=self.method,
+                                          point_radii=self._point_radii, min_radius=self._min_radius,
+                                          max_radius=self._max_radius, tile_size=self._tile_size,
+                                          boxes=None if self._boxes is None else self._boxes[indices],
+                                          n_workers=self.n_workers)
+
+        frame = _build_frame_alpha_spheres(self._coordinates[index], self._get_box(index), *self._parameters)
+
+        return self._get_alpha_spheres(index, frame)
+
+    def __iter__(self):
+        for index, frame in enumerate(self._iter_frames()):
+            yield self._get_alpha_spheres(index, frame)
+
+    @property
+    def n_alpha_spheres(self):
+
+        # Counting needs every structure built once; only the counts are kept
+
+        if self._n_alpha_spheres is None:
+            self._n_alpha_spheres = np.array([frame[1].shape[0] for frame in self._iter_frames()],
+                                             dtype=np.int64)
+
+        return self._n_alpha_spheres
+
+    def _get_box(self, index):
+        return None if self._boxes is None else self._boxes[index]
+
+    def _get_alpha_spheres(self, index, frame):
+
+        points_of_alpha_sphere, centers, radii, kept_indices = frame
+
+        return AlphaSpheres._from_arrays(self._coordinates[index], centers, radii, points_of_alpha_sphere,
+                                         length_unit=self.length_unit, method=self.method,
+                                         point_radii=self._point_radii, kept_indices=kept_indices,
+                                         min_radius=self._min_radius, max_radius=self._max_radius,
+                                         box=self._get_box(index))
+
+    def _iter_frames(self):
+
+        # Raw arrays of every structure, in order, built when they are requested
+
+        if self.n_workers is None or self.n_workers == 1 or self.n_structures == 1:
+            for index in range(self.n_structures):
+                yield _build_frame_alpha_spheres(self._coordinates[index], self._get_box(index),
+                                                 *self._parameters)
+            return
+
+        # The coordinates are shared by all workers instead of being pickled with every task; the
+        # cell of a structure, if any, travels with its task
+
+        coordinates = self._coordinates
+        shm = shared_memory.SharedMemory(create=True, size=coordinates.nbytes)
+        try:
+            shared_coordinates = np.ndarray(coordinates.shape, dtype=coordinates.dtype, buffer=shm.buf)
+            shared_coordinates[:] = coordinates
+
+            with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_attach_shared_coordinates,
+                                     initargs=(shm.name, coordinates.shape, coordinates.dtype.str)) as executor:
+                # At most two structures per worker in flight to keep the memory bounded
+                pending = deque()
+                for index in range(self.n_structures):
+                    pending.append(executor.submit(_build_shared_frame_alpha_spheres, index,
+                                                   self._get_box(index), *self._parameters))
+                    if len(pending) >= 2 * self.n_workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+
+            del shared_coordinates
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+def _get_alpha_spheres_trajectory(coordinates, structure_indices, radii=None, method='voronoi', min_radius=None,
+                                  max_radius=None, tile_size=None, box=None, n_workers=None):
+
+    # Coordinates as a quantity with shape [n_structures, n_points, 3]
+
+    coordinates, length_unit = puw.get_value_and_unit(coordinates)
+    coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+
+    def get_value(quantity):
+        if quantity is None or not puw.is_quantity(quantity):
+            return quantity
+        return puw.get_value(quantity, to_unit=length_unit)
+
+    if method not in ['voronoi', 'weighted_voronoi']:
+        raise ArgumentError('method', value=method, caller='AlphaSpheres.from_trajectory', message=None)
+
+    point_radii = None
+
+    if method == 'weighted_voronoi':
+        if radii is None:
+            raise ArgumentError('radii', value=radii, caller='AlphaSpheres.from_trajectory',
+                                message=' The method weighted_voronoi needs the radii of the points. ')
+        point_radii = np.asarray(get_value(radii), dtype=np.float64)
+
+    if tile_size is not None and max_radius is None:
+        raise ArgumentError('max_radius', value=max_radius, caller='AlphaSpheres.from_trajectory',
+                            message=' The tiled build needs max_radius to define the halo of the tiles. ')
+
+    max_radius = get_value(max_radius)
+
+    boxes = None
+
+    if box is not None:
+
+        # One periodic cell per structure, each checked against the halo of max_radius
+
+        if max_radius is None:
+            raise ArgumentError('max_radius', value=max_radius, caller='AlphaSpheres.from_trajectory',
+                                message=' Periodic boundary conditions need max_radius to define the halo. ')
+
+        boxes = np.asarray(get_value(box), dtype=np.float64)
+        boxes = np.ascontiguousarray(np.broadcast_to(boxes.reshape(-1, 3, 3), (coordinates.shape[0], 3, 3)))
+
+        halo = max_radius
+        if point_radii is not None:
+            halo = np.sqrt(halo**2 + np.max(point_radii)**2)
+
+        if any(_is_cell_too_small(frame_box, halo) for frame_box in boxes):
+            raise ArgumentError('box', value=box, caller='AlphaSpheres.from_trajectory',
+                                message=' The periodic cell must be wider than twice the halo of max_radius. ')
+
+    return AlphaSpheresTrajectory(coordinates, structure_indices, length_unit=length_unit, method=method,
+                                  point_radii=point_radii, min_radius=get_value(min_radius),
+                                  max_radius=max_radius, tile_size=get_value(tile_size), boxes=boxes,
+                                  n_workers=n_workers)
+
+
+_shared_coordinates = None
+
+def _attach_shared_coordinates(name, shape, dtype):
+
+    # Initializer of every worker: view of the coordinates in shared memory
+
+    global _shared_coordinates, _shared_memory
+    _shared_memory = shared_memory.SharedMemory(name=name)
+    _shared_coordinates = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_shared_memory.buf)
+
+
+def _build_shared_frame_alpha_spheres(index, box, weights, min_radius, max_radius, tile_size):
+
+    return _build_frame_alpha_spheres(_shared_coordinates[index], box, weights, min_radius, max_radius,
+                                      tile_size)
+
+
+def _build_frame_alpha_spheres(points, box, weights, min_radius, max_radius, tile_size):
+
+    if box is not None:
+        points_of_alpha_sphere, centers, radii = _build_periodic_alpha_spheres(np.array(points), box, max_radius,
+                min_radius=min_radius, weights=weights, tile_size=tile_size)
+        return points_of_alpha_sphere, centers, radii, None
+
+    return _build_filtered_alpha_spheres(np.array(points), weights=weights, min_radius=min_radius,
+                                         max_radius=max_radius, tile_size=tile_size)
+
@@ -0,0 +1,210 @@
+from .alpha_spheres import AlphaSpheres
+import numpy as np
+
+class AlphaSpheresView():
+
+    """Subset of a set of alpha-spheres without copies
+
+    View returned by `AlphaSpheres.subset`. It keeps a reference to the arrays of the parent set
+    and the indices of the alpha-spheres of the subset, and gathers the per-sphere arrays
+    (`points_of_alpha_sphere`, `centers`, `radii`...) only when they are accessed. Subsets of a
+    view and removals from a view compose the indices, and the arrays of the parent set are never
+    copied. The methods of `AlphaSpheres` to query the set are available on the view as well.
+
+    Attributes
+    ----------
+    parent : AlphaSpheres
+        Set of alpha-spheres the view refers to.
+    indices : ndarray (shape=[n_alpha_spheres], dtype=int)
+        Indices of the alpha-spheres of the view in `parent`.
+    n_alpha_spheres: int
+        Number of alpha-spheres in the view.
+
+    Examples
+    --------
+    >>> import topomt as tmt
+    >>> aspheres = tmt.alpha_spheres.AlphaSpheres(points)
+    >>> pocket = aspheres.subset(pocket_indices)
+    >>> pocket.remove_small_alpha_spheres('3.4 angstroms')
+    >>> pocket_points = pocket.get_points_of_alpha_spheres(range(pocket.n_alpha_spheres))
+
+    Notes
+    -----
+    The view reflects the parent set as it was when the view was created. Removing alpha-spheres
+    from the parent set, or updating it, leaves its views out of date.
+
+    """
+
+    def __init__(self, parent, indices):
+
+        if isinstance(indices, slice):
+            indices = np.arange(*indices.indices(parent.n_alpha_spheres))
+        else:
+            indices = np.asarray(indices)
+            if indices.dtype == bool:
+                indices = np.nonzero(indices)[0]
+            indices = indices.astype(np.int64, copy=False)
+
+        # A view of a view refers directly to the original set
+
+        if isinstance(parent, AlphaSpheresView):
+            indices = parent.indices[indices]
+            parent = parent.parent
+
+        self.parent = parent
+        self.indices = indices
+        self._point_to_alpha_spheres = None
+
+    @property
+    def n_alpha_spheres(self):
+        return self.indices.shape[0]
+
+    @property
+    def points_of_alpha_sphere(self):
+        return self.parent.points_of_alpha_sphere[self.indices]
+
+    @property
+    def _centers(self):
+        return self.parent._centers[self.indices]
+
+    @property
+    def _radii(self):
+        return self.parent._radii[self.indices]
+
+    @property
+    def kept_indices(self):
+        if self.parent.kept_indices is None:
+            return None
+        return self.parent.kept_indices[self.indices]
+
+    # Attributes of the points, shared with the parent set
+
+    @property
+    def n_points(self):
+        return self.parent.n_points
+
+    @property
+    def _points(self):
+        return self.parent._points
+
+    @property
+    def _point_radii(self):
+        return self.parent._point_radii
+
+    @property
+    def _point_is_polar(self):
+        return self.parent._point_is_polar
+
+    @property
+    def point_elements(self):
+        return self.parent.point_elements
+
+    @property
+    def min_apolar_contacts(self):
+        return self.parent.min_apolar_contacts
+
+    @property
+    def length_unit(self):
+        return self.parent.length_unit
+
+    @property
+    def method(self):
+        return self.parent.method
+
+    @property
+    def _min_radius(self):
+        return self.parent._min_radius
+
+    @property
+    def _max_radius(self):
+        return self.parent._max_radius
+
+    @property
+    def _box(self):
+        return self.parent._box
+
+    points = AlphaSpheres.points
+    centers = AlphaSpheres.centers
+    radii = AlphaSpheres.radii
+    point_radii = AlphaSpheres.point_radii
+    box = AlphaSpheres.box
+    n_polar_contacts = AlphaSpheres.n_polar_contacts
+    is_apolar = AlphaSpheres.is_apolar
+
+    _get_quantity = AlphaSpheres._get_quantity
+    _get_value = AlphaSpheres._get_value
+    _get_incidence = AlphaSpheres._get_incidence
+    _get_minimum_image = AlphaSpheres._get_minimum_image
+    _get_boxsize = AlphaSpheres._get_boxsize
+
+    remove_small_alpha_spheres = AlphaSpheres.remove_small_alpha_spheres
+    remove_big_alpha_spheres = AlphaSpheres.remove_big_alpha_spheres
+    get_points_of_alpha_spheres = AlphaSpheres.get_points_of_alpha_spheres
+    get_point_to_alpha_spheres = AlphaSpheres.get_point_to_alpha_spheres
+    get_neighbor_graph = AlphaSpheres.get_neighbor_graph
+    get_neighbors = AlphaSpheres.get_neighbors
+    get_centers_distance = AlphaSpheres.get_centers_distance
+    get_centers_distances = AlphaSpheres.get_centers_distances
+    get_edge_lengths = AlphaSpheres.get_edge_lengths
+    get_buriedness = AlphaSpheres.get_buriedness
+    get_volumes = AlphaSpheres.get_volumes
+    save = AlphaSpheres.save
+    show_alpha_spheres = AlphaSpheres.show_alpha_spheres
+
+    def subset(self, indices):
+
+        """Subset of the view, as a new view of the parent set
+
+        Parameters
+        ----------
+        indices : numpy.ndarray, list, tuple or slice
+            Indices, or boolean mask, of the alpha-spheres of this view defining the subset.
+
+        Returns
+        -------
+        AlphaSpheresView
+            View of the parent set with the selected alpha-spheres.
+
+        """
+
+        return AlphaSpheresView(self, indices)
+
+    def remove_alpha_spheres(self, indices):
+
+        """Removing alpha-spheres from the view
+        Only the indices of the view change: the arrays of the parent set are left untouched.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray, list or tuple (dtype:ints)
+            Indices of the alpha-spheres of the view to be removed.
+
+        """
+
+        mask = np.ones([self.n_alpha_spheres], dtype=bool)
+        mask[indices] = False
+
+        self.indices = self.indices[mask]
+        self._point_to_alpha_spheres = None
+
+    def to_alpha_spheres(self):
+
+        """New set of alpha-spheres with copies of the arrays of the view
+
+        Returns
+        -------
+        AlphaSpheres
+            Independent set of alpha-spheres.
+
+        """
+
+        alpha_spheres = AlphaSpheres._from_arrays(self._points, self._centers, self._radii,
+                                                  self.points_of_alpha_sphere, length_unit=self.length_unit,
+                                                  method=self.method, point_radii=self._point_radii,
+                                                  kept_indices=self.kept_indices, min_radius=self._min_radius,
+                                                  max_radius=self._max_radius, box=self._box)
+
+        if self.point_elements is not None:
+            alpha_spheres.set_point_elements(self.point_elements, min_apolar_contacts=self.min_apolar_contacts)
+
+        return alpha_spheres
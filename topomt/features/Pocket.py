@@ -3,6 +3,25 @@ import copy
 
 class Pocket(Feature2D):
 
+    """Pocket of a topography
+
+    Pockets found by `topomt.methods.fpocket2` and `topomt.methods.fpocket4` with
+    `output_type='topography'` carry, besides the atom indices, the attributes `alpha_sphere_indices`,
+    `center`, `n_alpha_spheres`, `mean_alpha_sphere_radius`, `min_alpha_sphere_radius`,
+    `max_alpha_sphere_radius`, `apolar_fraction`, `polarity`, `hydrophobicity`, `buriedness`,
+    `buriedness_radius`, `score` and `heuristic_druggability`.
+
+    Notes
+    -----
+    `score` and `heuristic_druggability` are ad-hoc heuristics of TopoMT, not fpocket's score and
+    Drug Score (the `druggability_score` of the pockets read from fpocket's output). The
+    coefficients of `heuristic_druggability` were picked by hand and are not calibrated against any
+    data set. Every descriptor is computed from the pocket alone, so pockets of different
+    structures or frames can be compared. `buriedness` is the mean number of atoms within
+    `buriedness_radius` (the argument of the pipeline) of the centers of the alpha-spheres.
+
+    """
+
     def __init__(self, feature_id=None, atom_indices=None, atom_labels=None, atom_label_format=None, source=None,
                  source_id=None, topography=None, **kwargs):
         super().__init__(feature_id=feature_id, feature_type='pocket', atom_indices=atom_indices,
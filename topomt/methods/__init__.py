@@ -1,2 +1,5 @@
 from .fpocket2 import fpocket2
+from .fpocket2_sweep import fpocket2_sweep
 from .fpocket4 import fpocket4
+from .pocket_dendrogram import PocketDendrogram
+from .profiler import Profiler
@@ -0,0 +1,248 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from topomt import pyunitwizard as puw
+from topomt._private.edges_list import components_from_labels
+
+# Descriptores ad hoc de TopoMT, no los de fpocket. Coeficientes de la druggability heurística:
+# escogidos a mano al introducirla, sin ajustar a ningún conjunto de datos, solo para que los
+# bolsillos más grandes, apolares, hidrofóbicos y enterrados queden por delante. Término
+# independiente, hidrofobicidad (Kyte-Doolittle / 4.5), fracción apolar, ocupación de la capa de
+# buriedness y log del número de esferas
+_HEURISTIC_DRUGGABILITY_COEFFICIENTS = np.array([-6.0, 1.5, 2.0, 3.0, 0.8])
+
+# Átomos pesados por nm^3 en el interior de una proteína (1.35 g/cm^3, ~14.5 Da por átomo pesado),
+# referencia fija de la ocupación de la capa de buriedness
+_PROTEIN_ATOM_DENSITY = 55.0
+
+
+def _get_pocket_descriptors(alpha_spheres, pockets, point_hydropathy=None, buriedness_radius=None):
+    """Descriptors of all the pockets found on a set of alpha-spheres, in one pass.
+
+    Parameters
+    ----------
+    alpha_spheres : AlphaSpheres
+        Set of alpha-spheres the pockets refer to.
+    pockets : list[list[int]]
+        Indices of the alpha-spheres of each pocket, none of them empty.
+    point_hydropathy : numpy.ndarray (shape=[n_points], dtype=float), optional
+        Hydropathy (Kyte-Doolittle) of the residue of every point, NaN if unknown.
+    buriedness_radius : quantity, optional
+        Radius of the shell used to count the points around the center of every alpha-sphere.
+
+    Returns
+    -------
+    descriptors : dict
+        Arrays with one value per pocket: 'n_alpha_spheres', 'center', 'mean_radius',
+        'min_radius', 'max_radius' (without units, in the length unit of `alpha_spheres`),
+        'n_atoms', 'apolar_fraction', 'polarity', 'hydrophobicity', 'buriedness', 'score' and
+        'heuristic_druggability', plus 'point_to_pocket', the sparse incidence (shape=[n_points,
+        n_pockets], csc) of the points lining every pocket.
+
+    Notes
+    -----
+    All descriptors are segment reductions (`np.add.reduceat` over the spheres grouped by
+    pocket, or sparse products with the point-to-pocket incidence), without loops over the
+    pockets.
+
+    - apolar_fraction: fraction of apolar alpha-spheres (NaN without point elements).
+    - polarity: fraction of polar atoms among the atoms lining the pocket (NaN without elements).
+    - hydrophobicity: mean hydropathy of the atoms lining the pocket (NaN without hydropathy).
+    - buriedness: mean number of points within `buriedness_radius` of the sphere centers (NaN
+      without radius).
+
+    Every descriptor depends only on the pocket itself, so the values of pockets of different
+    structures or frames can be compared. The two scores are ad-hoc heuristics of TopoMT, not
+    fpocket's score or Drug Score. Both use the shell occupancy: the buriedness divided by the
+    number of heavy atoms a shell of `buriedness_radius` holds inside a protein
+    (`_PROTEIN_ATOM_DENSITY`, 55 per cubic nanometer).
+
+    - score: ranking score ``log(1 + n_alpha_spheres) * (1 + apolar_fraction) / 2 *
+      shell_occupancy``, where missing descriptors count as 1.
+    - heuristic_druggability: logistic function of the hydrophobicity, apolar fraction, shell
+      occupancy and size, in [0, 1]. Its coefficients (`_HEURISTIC_DRUGGABILITY_COEFFICIENTS`)
+      were picked by hand and are not fitted to any data set. They only make the larger, more
+      apolar, more hydrophobic and more buried pockets rank higher.
+    """
+
+    n_pockets = len(pockets)
+    sizes = np.array([len(pocket) for pocket in pockets])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    spheres = np.concatenate(pockets).astype(np.int64)
+    labels = np.repeat(np.arange(n_pockets), sizes)
+
+    # átomos de cada pocket: (punto -> esferas) @ (esfera -> pocket), de una vez para todos
+    sphere_to_pocket = csr_matrix((np.ones(spheres.shape[0], dtype=np.int32), (spheres, labels)),
+                                  shape=(alpha_spheres.n_alpha_spheres, n_pockets))
+    point_to_pocket = (alpha_spheres.get_point_to_alpha_spheres() @ sphere_to_pocket).tocsc()
+    point_to_pocket.sort_indices()
+    point_to_pocket.data[:] = 1
+    n_atoms = np.diff(point_to_pocket.indptr)
+
+    # centro: media de las imágenes más cercanas a la primera esfera de cada pocket
+    centers = alpha_spheres._centers
+    reference = centers[spheres[starts]]
+    offsets = alpha_spheres._get_minimum_image(centers[spheres] - reference[labels])
+    pocket_centers = reference + np.add.reduceat(offsets, starts, axis=0) / sizes[:, np.newaxis]
+
+    radii = alpha_spheres._radii[spheres]
+
+    descriptors = {
+        'n_alpha_spheres': sizes,
+        'center': pocket_centers,
+        'mean_radius': np.add.reduceat(radii, starts) / sizes,
+        'min_radius': np.minimum.reduceat(radii, starts),
+        'max_radius': np.maximum.reduceat(radii, starts),
+        'n_atoms': n_atoms,
+        'point_to_pocket': point_to_pocket,
+    }
+
+    # química: esferas apolares y átomos polares que tapizan el pocket
+    nan = np.full(n_pockets, np.nan)
+    apolar_fraction = nan
+    polarity = nan
+    if alpha_spheres._point_is_polar is not None:
+        apolar_fraction = np.add.reduceat(alpha_spheres.is_apolar[spheres].astype(np.float64), starts) / sizes
+        polarity = (point_to_pocket.T @ alpha_spheres._point_is_polar.astype(np.float64)) / n_atoms
+
+    hydrophobicity = nan
+    if point_hydropathy is not None:
+        point_hydropathy = np.asarray(point_hydropathy, dtype=np.float64)
+        known = np.isfinite(point_hydropathy)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            hydrophobicity = (point_to_pocket.T @ np.where(known, point_hydropathy, 0.0)) / \
+                             (point_to_pocket.T @ known.astype(np.float64))
+
+    buriedness = nan
+    shell_occupancy = nan
+    if buriedness_radius is not None:
+        counts = alpha_spheres.get_buriedness(buriedness_radius).astype(np.float64)
+        buriedness = np.add.reduceat(counts[spheres], starts) / sizes
+        shell_occupancy = buriedness / _get_shell_atom_count(alpha_spheres, buriedness_radius)
+
+    # puntuaciones: los descriptores ausentes no penalizan el score ni cuentan en la druggability
+    score = np.log1p(sizes) * (1.0 + np.nan_to_num(apolar_fraction, nan=1.0)) / 2.0 * \
+            np.nan_to_num(shell_occupancy, nan=1.0)
+
+    features = np.column_stack([np.ones(n_pockets), hydrophobicity / 4.5, apolar_fraction, shell_occupancy,
+                                np.log(sizes)])
+    logits = np.nan_to_num(features) @ _HEURISTIC_DRUGGABILITY_COEFFICIENTS
+    heuristic_druggability = 1.0 / (1.0 + np.exp(-logits))
+
+    descriptors.update({
+        'apolar_fraction': apolar_fraction,
+        'polarity': polarity,
+        'hydrophobicity': hydrophobicity,
+        'buriedness': buriedness,
+        'score': score,
+        'heuristic_druggability': heuristic_druggability,
+    })
+
+    return descriptors
+
+
+def _get_shell_atom_count(alpha_spheres, buriedness_radius):
+
+    # Átomos pesados en una esfera de radio buriedness_radius dentro de una proteína
+
+    radius = alpha_spheres._get_value(buriedness_radius)
+    if alpha_spheres.length_unit is not None:
+        radius = puw.get_value(puw.quantity(radius, alpha_spheres.length_unit), to_unit='nm')
+
+    return _PROTEIN_ATOM_DENSITY * 4.0 / 3.0 * np.pi * radius**3
+
+
+def _add_pockets_to_topography(topography, alpha_spheres, pockets, atom_indices, point_hydropathy=None,
+                               buriedness_radius=None):
+    """Add the pockets found on a set of alpha-spheres to a topography as Pocket features.
+
+    Parameters
+    ----------
+    topography : Topography
+        Topography of the molecular system the alpha-spheres were built on.
+    alpha_spheres : AlphaSpheres
+        Set of alpha-spheres the pockets refer to.
+    pockets : list[list[int]]
+        Indices of the alpha-spheres of each pocket.
+    atom_indices : numpy.ndarray (shape=[n_points], dtype=int)
+        Atom index, in the molecular system of the topography, of every point of the set.
+    point_hydropathy : numpy.ndarray (shape=[n_points], dtype=float), optional
+        Hydropathy of the residue of every point, for the hydrophobicity and the heuristic druggability.
+    buriedness_radius : quantity, optional
+        Radius of the shell used for the buriedness of the pockets, the same `buriedness_radius`
+        the pipeline used to filter the alpha-spheres. With None the buriedness is NaN.
+
+    Returns
+    -------
+    feature_ids : list[str]
+        Ids of the new Pocket features, in the order of `pockets`.
+    """
+
+    pockets = [pocket for pocket in pockets if len(pocket) > 0]
+    if len(pockets) == 0:
+        return []
+
+    atom_indices = np.asarray(atom_indices)
+    length_unit = alpha_spheres.length_unit
+
+    descriptors = _get_pocket_descriptors(alpha_spheres, pockets, point_hydropathy=point_hydropathy,
+                                          buriedness_radius=buriedness_radius)
+    point_to_pocket = descriptors['point_to_pocket']
+
+    feature_ids = []
+    for ii, pocket in enumerate(pockets):
+        points = point_to_pocket.indices[point_to_pocket.indptr[ii]:point_to_pocket.indptr[ii+1]]
+        feature_id = topography.add_new_feature(
+            feature_type='pocket',
+            atom_indices=atom_indices[points].tolist(),
+            alpha_sphere_indices=np.asarray(pocket),
+            center=puw.quantity(descriptors['center'][ii], length_unit),
+            n_alpha_spheres=int(descriptors['n_alpha_spheres'][ii]),
+            mean_alpha_sphere_radius=puw.quantity(descriptors['mean_radius'][ii], length_unit),
+            min_alpha_sphere_radius=puw.quantity(descriptors['min_radius'][ii], length_unit),
+            max_alpha_sphere_radius=puw.quantity(descriptors['max_radius'][ii], length_unit),
+            apolar_fraction=float(descriptors['apolar_fraction'][ii]),
+            polarity=float(descriptors['polarity'][ii]),
+            hydrophobicity=float(descriptors['hydrophobicity'][ii]),
+            buriedness=float(descriptors['buriedness'][ii]),
+            buriedness_radius=buriedness_radius,
+            score=float(descriptors['score'][ii]),
+            heuristic_druggability=float(descriptors['heuristic_druggability'][ii]),
+        )
+        feature_ids.append(feature_id)
+
+    return feature_ids
+
+
+def _get_pockets_from_labels(alpha, labels, min_pock_nb_asph, apolar_min_ratio):
+
+    # Bolsillos de un corte del dendrograma tras los filtros finales
+
+    # etiquetas 0..k-1 en orden de la primera esfera de cada cluster (el de connected_components)
+    labels = _get_canonical_labels(labels)
+    sizes = np.bincount(labels)
+
+    # --- Filtro tamaño mínimo ---
+    keep = sizes >= min_pock_nb_asph
+
+    # --- Filtro apolar opcional (desactivado por defecto) ---
+    if apolar_min_ratio is not None:
+        # fracción de esferas apolares de cada bolsillo, de una vez para todos
+        n_apolar = np.bincount(labels, weights=alpha.is_apolar, minlength=sizes.shape[0])
+        keep &= n_apolar >= apolar_min_ratio * sizes
+
+    # Agrupar índices por etiqueta
+    pockets = components_from_labels(labels)
+
+    return [pocket for pocket, kept in zip(pockets, keep) if kept]
+
+
+def _get_canonical_labels(labels):
+
+    # Etiquetas 0..k-1 numeradas por el menor índice de cada cluster
+
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(first.shape[0], dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(first.shape[0])
+
+    return rank[inverse.ravel()]
@@ -1,13 +1,19 @@
 import warnings
 
+import numpy as np
 import molsysmt as msm
 from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 from topomt import Topography
 from topomt.alpha_spheres import AlphaSpheres
 from topomt import pyunitwizard as puw
 from topomt._private.digestion import digest
-from topomt._private.edges_list import connected_components_union_find
+from topomt.alpha_spheres._chemistry import _get_hydropathy
+from ._pockets import _add_pockets_to_topography
+from .profiler import _get_profiler, _null_profiler
+from topomt._private.edges_list import connected_components_union_find, components_from_labels
 
 
 @digest()
@@ -22,7 +28,12 @@ def fpocket2(
     max_pair_dist: str = '2.5 angstroms',  # ≤ 2.5 en fpocket
     min_contacts: int = 2,  # 2 en el paper / código
     min_spheres_per_pocket: int = 36,  # 35 en paper / 36 en código
+    min_buriedness: int | None = None,  # átomos pesados mínimos alrededor del centro (None => sin filtro)
+    buriedness_radius: str = '8.0 angstroms',
     pbc: bool = False,
+    cache_dir: str | None = None,
+    output_type: str = 'indices',  # 'indices' | 'topography'
+    profile: bool = False,
     syntax: str = 'MolSysMT',
     skip_digestion: bool = False,
 ):
@@ -32,87 +43,225 @@ def fpocket2(
     Step 1: local clustering of nearby alpha-spheres.
     Step 2: merge clusters whose geometric centers are close.
     Step 3: refine by merging clusters that have enough sphere-sphere contacts.
+
+    With output_type='indices' the pockets are returned as lists of alpha-sphere indices. With
+    output_type='topography' the Topography of the system is returned instead, with a Pocket
+    feature per pocket (atom indices, center, number of alpha-spheres, radius statistics, chemical
+    descriptors, and an ad-hoc score and uncalibrated heuristic druggability).
+
+    With profile=True a (result, report) tuple is returned, where report holds the wall time,
+    peak memory and counters of every stage (see topomt.methods.Profiler).
     """
 
-    # 0) topografía + selección
-    topo = Topography(molecular_system=molecular_system, structure_indices=structure_indices)
-    molsys = topo._molsys
-
-    atom_indices = msm.select(molecular_system=molsys, selection=selection, syntax=syntax)
-
-    # quitar agua/iones/small mols
-    to_remove = msm.select(
-        molecular_system=molsys,
-        selection="group_type in ['water', 'ion', 'small molecule']",
-        mask=atom_indices,
-        syntax='MolSysMT',
-    )
-    if len(to_remove) > 0:
-        n_waters, n_ions, n_small = msm.get(
+    with _get_profiler(profile) as profiler:
+
+        topo, alpha_spheres, atom_indices = _get_fpocket2_alpha_spheres(molecular_system, selection,
+                                                                       structure_indices, min_radius, max_radius,
+                                                                       min_buriedness, buriedness_radius, pbc,
+                                                                       cache_dir, syntax, profiler=profiler)
+
+        with profiler.stage('fpocket2.neighbor_graph'):
+            graph, edge_lengths = _get_fpocket2_neighbor_graph(alpha_spheres)
+            profiler.count(n_alpha_spheres=alpha_spheres.n_alpha_spheres, n_edges=graph.nnz // 2)
+
+        with profiler.stage('fpocket2.step1'):
+            alpha_components_step1 = _fpocket2_step1(alpha_spheres, graph, edge_lengths, max_neighbor_dist)
+            profiler.count(n_clusters=len(alpha_components_step1))
+
+        with profiler.stage('fpocket2.step2'):
+            alpha_components_step2 = _fpocket2_step2(alpha_spheres, alpha_components_step1, max_cluster_dist)
+            profiler.count(n_clusters=len(alpha_components_step2))
+
+        with profiler.stage('fpocket2.step3'):
+            pockets = _fpocket2_step3(alpha_spheres, alpha_components_step2, max_pair_dist, min_contacts)
+            profiler.count(n_clusters=len(pockets))
+
+        # AJUSTE 2:
+        # descartar pockets demasiado pequeños, como hace fpocket con min_pock_nb_asph
+        with profiler.stage('fpocket2.filter'):
+            pockets = [p for p in pockets if len(p) >= min_spheres_per_pocket]
+            profiler.count(n_pockets=len(pockets))
+
+        result = pockets
+        if output_type == 'topography':
+            with profiler.stage('fpocket2.topography'):
+                # hidropatía del residuo de cada átomo para la hidrofobicidad y la druggability heurística
+                group_names = msm.get(molecular_system=topo._molsys, element='atom', selection=atom_indices,
+                                      group_name=True)
+                _add_pockets_to_topography(topo, alpha_spheres, pockets, atom_indices,
+                                           point_hydropathy=_get_hydropathy(group_names),
+                                           buriedness_radius=buriedness_radius)
+            result = topo
+
+    if profile:
+        return result, profiler.report
+
+    return result
+
+
+def _get_fpocket2_alpha_spheres(molecular_system, selection, structure_indices, min_radius, max_radius,
+                                min_buriedness, buriedness_radius, pbc, cache_dir, syntax, profiler=_null_profiler):
+
+    # Etapa común a todos los parámetros de clustering: topografía, selección de átomos y
+    # alpha-spheres filtradas (radio, buriedness) con su tipado químico
+
+    topo, atom_indices, coords, box, atom_types = _get_fpocket2_atoms(molecular_system, selection,
+                                                                      structure_indices, pbc, syntax,
+                                                                      profiler=profiler)
+
+    with profiler.stage('fpocket2.alpha_spheres'):
+        # esferas alfa, filtradas por radio durante la construcción
+        if cache_dir is None:
+            alpha_spheres = AlphaSpheres(points=coords, radii=None, min_radius=min_radius, max_radius=max_radius,
+                                         box=box)
+        else:
+            # reutiliza (mapeadas en memoria) las esferas ya calculadas para las mismas coordenadas
+            alpha_spheres = AlphaSpheres.from_cache(cache_dir, coords, selection=selection, min_radius=min_radius,
+                                                         max_radius=max_radius, box=box)
+        profiler.count(n_points=alpha_spheres.n_points, n_alpha_spheres=alpha_spheres.n_alpha_spheres)
+
+    # tipado químico (polar/apolar) de las esferas a partir de los elementos de los átomos
+    alpha_spheres.set_point_elements(atom_types)
+
+    # descarta esferas expuestas (pocos átomos alrededor) antes del clustering
+    if min_buriedness is not None:
+        with profiler.stage('fpocket2.buriedness'):
+            buriedness = alpha_spheres.get_buriedness(buriedness_radius)
+            exposed = np.nonzero(buriedness < min_buriedness)[0]
+            alpha_spheres.remove_alpha_spheres(exposed)
+            profiler.count(n_removed=exposed.shape[0], n_alpha_spheres=alpha_spheres.n_alpha_spheres)
+
+    return topo, alpha_spheres, atom_indices
+
+
+def _get_fpocket2_atoms(molecular_system, selection, structure_indices, pbc, syntax, profiler=_null_profiler):
+
+    # Etapa previa a las alpha-spheres, que no depende de ningún parámetro de radio: topografía,
+    # selección de átomos pesados, coordenadas, caja (con pbc) y tipos de átomo
+
+    with profiler.stage('fpocket2.selection'):
+        # 0) topografía + selección
+        topo = Topography(molecular_system=molecular_system, structure_indices=structure_indices)
+        molsys = topo._molsys
+
+        atom_indices = msm.select(molecular_system=molsys, selection=selection, syntax=syntax)
+
+        # quitar agua/iones/small mols
+        to_remove = msm.select(
+            molecular_system=molsys,
+            selection="group_type in ['water', 'ion', 'small molecule']",
+            mask=atom_indices,
+            syntax='MolSysMT',
+        )
+        if len(to_remove) > 0:
+            n_waters, n_ions, n_small = msm.get(
+                molecular_system=molsys,
+                selection=to_remove,
+                n_waters=True,
+                n_ions=True,
+                n_small_molecules=True,
+            )
+            warnings.warn(
+                f"Removing {len(to_remove)} atoms from fpocket analysis "
+                f"(waters={n_waters}, ions={n_ions}, small_molecules={n_small})."
+            )
+            atom_indices = list(set(atom_indices) - set(to_remove))
+
+        # quitar H
+        atom_indices = msm.select(
             molecular_system=molsys,
-            selection=to_remove,
-            n_waters=True,
-            n_ions=True,
-            n_small_molecules=True,
+            selection='atom_type not in ["H"]',
+            mask=atom_indices,
+            syntax='MolSysMT',
         )
-        warnings.warn(
-            f"Removing {len(to_remove)} atoms from fpocket analysis "
-            f"(waters={n_waters}, ions={n_ions}, small_molecules={n_small})."
+
+        # coords
+        coordinates = msm.get(
+            molecular_system=molsys,
+            selection=atom_indices,
+            structure_indices=structure_indices,
+            coordinates=True,
         )
-        atom_indices = list(set(atom_indices) - set(to_remove))
-
-    # quitar H
-    atom_indices = msm.select(
-        molecular_system=molsys,
-        selection='atom_type not in ["H"]',
-        mask=atom_indices,
-        syntax='MolSysMT',
-    )
-
-    # coords
-    coordinates = msm.get(
-        molecular_system=molsys,
-        selection=atom_indices,
-        structure_indices=structure_indices,
-        coordinates=True,
-    )
-    coords = coordinates[0]
-
-    # esferas alfa
-    alpha_spheres = AlphaSpheres(points=coords, radii=None)
-
-    # filtro de radio
-    alpha_spheres.remove_small_alpha_spheres(min_radius)
-    alpha_spheres.remove_big_alpha_spheres(max_radius)
+        coords = coordinates[0]
+        profiler.count(n_atoms=len(atom_indices))
+
+        # celda periódica: imágenes de los átomos cerca de las caras y distancias con mínima imagen
+        box = None
+        if pbc:
+            box = msm.get(molecular_system=molsys, element='system', structure_indices=structure_indices,
+                          box=True)
+            if box is None:
+                warnings.warn("pbc=True pero el sistema no tiene caja; se ignora la periodicidad.")
+            else:
+                box = box[0]
+
+        atom_types = msm.get(molecular_system=molsys, element='atom', selection=atom_indices, atom_type=True)
+
+    return topo, atom_indices, coords, box, atom_types
+
+
+def _get_fpocket2_neighbor_graph(alpha_spheres):
+
+    # vecinos que comparten una arista y distancia entre sus centros (sin unidades); no depende de
+    # max_neighbor_dist, así que se calcula una sola vez por conjunto de alpha-spheres
+    graph = alpha_spheres.get_neighbor_graph('edge')
+    edge_lengths = puw.get_value(alpha_spheres.get_edge_lengths(graph), to_unit=alpha_spheres.length_unit)
+
+    return graph, edge_lengths
+
+
+def _get_periodic_tree_factory(alpha_spheres):
+
+    # árboles periódicos (solo cajas ortorrómbicas, limitación de cKDTree)
+    boxsize = alpha_spheres._get_boxsize()
+    if alpha_spheres._box is not None and boxsize is None:
+        warnings.warn("Caja no ortorrómbica: los pasos 2 y 3 no aplican la mínima imagen.")
+
+    def periodic_tree(points):
+        if boxsize is None:
+            return cKDTree(points)
+        return cKDTree(np.mod(points, boxsize), boxsize=boxsize)
+
+    return periodic_tree
+
+
+def _fpocket2_step1(alpha_spheres, graph, edge_lengths, max_neighbor_dist):
 
     # ================================
     # PASO 1: clustering local
     # ================================
-    neighbors = alpha_spheres.get_neighbors('edge')
-    edges_step1 = []
-    for ii, neighs in neighbors.items():
-        for jj in neighs:
-            # asumimos que get_neighbors no repite pares
-            dd = alpha_spheres.get_centers_distance(ii, jj)
-            if dd <= max_neighbor_dist:
-                edges_step1.append([ii, jj])
-
-    alpha_components_step1 = connected_components_union_find(edges_step1)
+    max_neighbor_dist_val = puw.get_value(max_neighbor_dist, to_unit=alpha_spheres.length_unit)
+
+    # vecinos filtrados de una vez por distancia entre centros (sin tocar el grafo compartido)
+    graph = graph.copy()
+    graph.data[edge_lengths > max_neighbor_dist_val] = 0
+    graph.eliminate_zeros()
+
+    _, labels_step1 = connected_components(graph, directed=False)
     # fuera los de tamaño 1 (una sola alpha-sphere no es pocket)
-    alpha_components_step1 = [comp for comp in alpha_components_step1 if len(comp) > 1]
+    return components_from_labels(labels_step1, min_size=2)
+
+
+def _fpocket2_step2(alpha_spheres, alpha_components_step1, max_cluster_dist):
 
     # =====================================
     # PASO 2: agrupar clusters por distancia
     # =====================================
+    centers_vals = alpha_spheres._centers
+
     cluster_centers = []
     for comp in alpha_components_step1:
-        cluster_centers.append(alpha_spheres.centers[comp].mean(axis=0))
+        # con pbc, media de las imágenes más cercanas a la primera esfera del cluster
+        offsets = alpha_spheres._get_minimum_image(centers_vals[comp] - centers_vals[comp[0]])
+        comp_centers = centers_vals[comp[0]] + offsets
+        cluster_centers.append(comp_centers.mean(axis=0))
+
+    cluster_centers_vals = np.vstack(cluster_centers)
+    max_cluster_dist_val = puw.get_value(max_cluster_dist, to_unit=alpha_spheres.length_unit)
 
-    cluster_centers = puw.utils.numpy.vstack(cluster_centers)
-    cluster_centers_vals, cluster_centers_unit = puw.get_value_and_unit(cluster_centers)
-    max_cluster_dist_val = puw.get_value(max_cluster_dist, to_unit=cluster_centers_unit)
+    periodic_tree = _get_periodic_tree_factory(alpha_spheres)
 
-    tree_clusters = cKDTree(cluster_centers_vals)
+    tree_clusters = periodic_tree(cluster_centers_vals)
     cluster_edges = list(tree_clusters.query_pairs(r=max_cluster_dist_val))
     cluster_groups = connected_components_union_find(cluster_edges)
 
@@ -123,43 +272,49 @@ def fpocket2(
             merged.extend(alpha_components_step1[idx])
         alpha_components_step2.append(merged)
 
+    # ordenar clusters por tamaño (desc) para unir primero los grandes
+    alpha_components_step2.sort(key=len, reverse=True)
+
+    return alpha_components_step2
+
+
+def _fpocket2_step3(alpha_spheres, alpha_components_step2, max_pair_dist, min_contacts):
+
     # ==========================================
     # PASO 3: refinar uniendo por pares de esferas
     # ==========================================
+    centers_vals = alpha_spheres._centers
+    max_pair_dist_val = puw.get_value(max_pair_dist, to_unit=alpha_spheres.length_unit)
 
-    # valores numéricos para las distancias
-    centers_vals, centers_unit = puw.get_value_and_unit(alpha_spheres.centers)
-    max_pair_dist_val = puw.get_value(max_pair_dist, to_unit=centers_unit)
+    periodic_tree = _get_periodic_tree_factory(alpha_spheres)
 
-    # ordenar clusters por tamaño (desc) para unir primero los grandes
-    alpha_components_step2.sort(key=len, reverse=True)
-
-    # construir un árbol por cluster provisional
-    trees = []
-    for comp in alpha_components_step2:
-        pts = centers_vals[comp]
-        trees.append(cKDTree(pts))
-
-    comp_edges = []
+    # un único árbol con las esferas de los clusters que pueden llegar a min_contacts
     n_comp = len(alpha_components_step2)
-    for i in range(n_comp):
+    sizes = np.array([len(comp) for comp in alpha_components_step2])
+    cluster_labels = np.full(centers_vals.shape[0], -1, dtype=np.int64)
+    for idx, comp in enumerate(alpha_components_step2):
         # early-out si el cluster es demasiado pequeño incluso para contactar
-        if len(alpha_components_step2[i]) < min_contacts:
-            continue
-        for j in range(i + 1, n_comp):
-            if len(alpha_components_step2[j]) < min_contacts:
-                continue
+        if sizes[idx] >= min_contacts:
+            cluster_labels[comp] = idx
 
-            # contactos de esferas entre cluster i y j
-            contacts = trees[i].query_ball_tree(trees[j], r=max_pair_dist_val)
+    spheres = np.nonzero(cluster_labels >= 0)[0]
+    pairs = periodic_tree(centers_vals[spheres]).query_pairs(r=max_pair_dist_val, output_type='ndarray')
 
-            # AJUSTE 1:
-            # contar TODAS las parejas (como hace fpocket en su single-linkage),
-            # no el nº de esferas distintas en contacto.
-            n_pairs = sum(len(lst) for lst in contacts)
+    # contactos de esferas entre clusters distintos, como par (i<j) de clusters
+    pair_labels = np.sort(cluster_labels[spheres[pairs]], axis=1)
+    pair_labels = pair_labels[pair_labels[:, 0] != pair_labels[:, 1]]
 
-            if n_pairs >= min_contacts:
-                comp_edges.append([i, j])
+    # AJUSTE 1:
+    # contar TODAS las parejas (como hace fpocket en su single-linkage),
+    # no el nº de esferas distintas en contacto.
+    n_pairs = coo_matrix((np.ones(pair_labels.shape[0], dtype=np.int64), (pair_labels[:, 0], pair_labels[:, 1])),
+                         shape=(n_comp, n_comp)).tocsr()
+    n_pairs.sum_duplicates()
+    n_pairs = n_pairs.tocoo()
+
+    # aristas en el mismo orden (i, j) lexicográfico que el doble bucle sobre clusters
+    connected = n_pairs.data >= min_contacts
+    comp_edges = np.column_stack([n_pairs.row[connected], n_pairs.col[connected]]).tolist()
 
     if comp_edges:
         pocket_groups = connected_components_union_find(comp_edges)
@@ -172,9 +327,4 @@ def fpocket2(
     else:
         pockets = alpha_components_step2
 
-    # AJUSTE 2:
-    # descartar pockets demasiado pequeños, como hace fpocket con min_pock_nb_asph
-    pockets = [p for p in pockets if len(p) >= min_spheres_per_pocket]
-
     return pockets
-
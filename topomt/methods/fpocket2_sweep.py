@@ -0,0 +1,190 @@
+import numpy as np
+
+from topomt import pyunitwizard as puw
+from topomt._private.digestion import digest
+from topomt.alpha_spheres import AlphaSpheres
+from topomt.alpha_spheres._construction import _get_radius_window_mask
+from .fpocket2 import _get_fpocket2_atoms, _get_fpocket2_neighbor_graph
+from .fpocket2 import _fpocket2_step1, _fpocket2_step2, _fpocket2_step3
+
+# Parámetros de los que depende cada etapa (además de los de las etapas anteriores); la
+# triangulación solo depende de max_radius con pbc (anchura de las imágenes alrededor de la celda)
+_TRIANGULATION_PARAMETERS = ('max_radius',)
+_ALPHA_SPHERES_PARAMETERS = ('min_radius', 'max_radius', 'min_buriedness', 'buriedness_radius')
+_STEP2_PARAMETERS = ('max_cluster_dist',)
+_STEP3_PARAMETERS = ('max_pair_dist', 'min_contacts')
+
+
+@digest()
+def fpocket2_sweep(
+    molecular_system,
+    param_grid,
+    selection: str = 'all',
+    structure_indices: int = 0,
+    min_radius: str = '3.0 angstroms',
+    max_radius: str = '6.0 angstroms',
+    max_neighbor_dist: str = '1.73 angstroms',
+    max_cluster_dist: str = '4.5 angstroms',
+    max_pair_dist: str = '2.5 angstroms',
+    min_contacts: int = 2,
+    min_spheres_per_pocket: int = 36,
+    min_buriedness: int | None = None,
+    buriedness_radius: str = '8.0 angstroms',
+    pbc: bool = False,
+    cache_dir: str | None = None,
+    syntax: str = 'MolSysMT',
+    skip_digestion: bool = False,
+):
+    """
+    Run fpocket2 over a grid of parameters reusing the intermediate stages.
+
+    Every stage of fpocket2 is computed once per distinct set of the parameters it depends on:
+    the selection of atoms and the triangulation once for the whole grid, the alpha-spheres (a
+    view of the triangulation with the radius window and the buriedness filter) and their
+    neighbor graph once per (min_radius, max_radius, min_buriedness, buriedness_radius), step 1
+    once per max_neighbor_dist, step 2 once per max_cluster_dist and step 3 once per
+    (max_pair_dist, min_contacts). The arguments not in `param_grid` take the value given to the
+    function. With pbc the images replicated around the cell depend on max_radius, so there is a
+    triangulation per distinct max_radius.
+
+    param_grid is a dict mapping parameter names to lists of values, whose combinations are all
+    run, or an explicit list of dicts.
+
+    Returns a list of (parameters, pockets) tuples in the order of the grid, with the pockets as
+    fpocket2 returns them with output_type='indices'. The parameters are the dicts of the
+    explicit list given as param_grid, or the combinations of the values given in the dict,
+    as they were passed (not converted).
+    """
+
+    defaults = {
+        'min_radius': min_radius,
+        'max_radius': max_radius,
+        'max_neighbor_dist': max_neighbor_dist,
+        'max_cluster_dist': max_cluster_dist,
+        'max_pair_dist': max_pair_dist,
+        'min_contacts': min_contacts,
+        'min_spheres_per_pocket': min_spheres_per_pocket,
+        'min_buriedness': min_buriedness,
+        'buriedness_radius': buriedness_radius,
+    }
+    combinations = [{**defaults, **params} for _, params in param_grid]
+    results = [None] * len(combinations)
+
+    # selección de átomos, coordenadas y caja: no dependen de ningún parámetro de la rejilla
+    _, _, coords, box, atom_types = _get_fpocket2_atoms(molecular_system, selection, structure_indices, pbc,
+                                                        syntax)
+
+    triangulation_parameters = () if box is None else _TRIANGULATION_PARAMETERS
+
+    for triangulation_indices in _group_by(combinations, range(len(combinations)), triangulation_parameters):
+
+        # una triangulación con la ventana de radios que cubre todas sus combinaciones
+        min_radius_all = _get_extreme_radius([combinations[ii]['min_radius'] for ii in triangulation_indices], min)
+        max_radius_all = _get_extreme_radius([combinations[ii]['max_radius'] for ii in triangulation_indices], max)
+        if cache_dir is None:
+            all_alpha_spheres = AlphaSpheres(points=coords, radii=None, min_radius=min_radius_all,
+                                             max_radius=max_radius_all, box=box)
+        else:
+            all_alpha_spheres = AlphaSpheres.from_cache(cache_dir, coords, selection=selection,
+                                                        min_radius=min_radius_all, max_radius=max_radius_all,
+                                                        box=box)
+        all_alpha_spheres.set_point_elements(atom_types)
+
+        buriedness_cache = {}
+
+        for alpha_indices in _group_by(combinations, triangulation_indices, _ALPHA_SPHERES_PARAMETERS):
+
+            # alpha-spheres de la combinación: vista de la triangulación con su ventana de radios y
+            # sin las esferas expuestas, compartida por todas las ramas
+            params = combinations[alpha_indices[0]]
+            mask = _get_radius_window_mask(all_alpha_spheres._radii,
+                                           all_alpha_spheres._get_value(params['min_radius']),
+                                           all_alpha_spheres._get_value(params['max_radius']))
+            if params['min_buriedness'] is not None:
+                buriedness_key = _get_parameters_key(params, ('buriedness_radius',))
+                if buriedness_key not in buriedness_cache:
+                    buriedness_cache[buriedness_key] = all_alpha_spheres.get_buriedness(params['buriedness_radius'])
+                mask &= buriedness_cache[buriedness_key] >= params['min_buriedness']
+
+            alpha_spheres = all_alpha_spheres.subset(mask)
+            graph, edge_lengths = _get_fpocket2_neighbor_graph(alpha_spheres)
+
+            # una rama por max_neighbor_dist, una tras otra: el trabajo de cada rama es sobre todo
+            # Python y arrays pequeños, que un pool de hilos no paraleliza (GIL)
+            for branch in _group_by(combinations, alpha_indices, ('max_neighbor_dist',)):
+                pockets_list = _run_fpocket2_branch(alpha_spheres, graph, edge_lengths,
+                                                    [combinations[ii] for ii in branch])
+                for index, pockets in zip(branch, pockets_list):
+                    results[index] = (param_grid[index][0], pockets)
+
+    return results
+
+
+def _run_fpocket2_branch(alpha_spheres, graph, edge_lengths, combinations):
+
+    # Pasos 1 a 3 de todas las combinaciones con el mismo max_neighbor_dist, con los resultados
+    # intermedios en caché por clave de parámetros
+
+    alpha_components_step1 = _fpocket2_step1(alpha_spheres, graph, edge_lengths,
+                                             combinations[0]['max_neighbor_dist'])
+
+    step2_cache = {}
+    step3_cache = {}
+    results = []
+
+    for params in combinations:
+
+        step2_key = _get_parameters_key(params, _STEP2_PARAMETERS)
+        if step2_key not in step2_cache:
+            step2_cache[step2_key] = _fpocket2_step2(alpha_spheres, alpha_components_step1,
+                                                     params['max_cluster_dist'])
+
+        step3_key = step2_key + _get_parameters_key(params, _STEP3_PARAMETERS)
+        if step3_key not in step3_cache:
+            step3_cache[step3_key] = _fpocket2_step3(alpha_spheres, step2_cache[step2_key],
+                                                     params['max_pair_dist'], params['min_contacts'])
+
+        # AJUSTE 2: descartar pockets demasiado pequeños
+        pockets = [p for p in step3_cache[step3_key] if len(p) >= params['min_spheres_per_pocket']]
+        results.append(pockets)
+
+    return results
+
+
+def _get_extreme_radius(radii, extreme):
+
+    # radio menor (min) o mayor (max) de una lista de radios; None si alguno es None (sin límite)
+
+    if any(radius is None for radius in radii):
+        return None
+
+    return extreme(radii, key=lambda radius: puw.get_value(puw.standardize(radius)))
+
+
+def _group_by(combinations, indices, names):
+
+    # índices de las combinaciones agrupados por el valor de los parámetros `names`, en orden de
+    # primera aparición
+
+    groups = {}
+    for index in indices:
+        groups.setdefault(_get_parameters_key(combinations[index], names), []).append(index)
+
+    return list(groups.values())
+
+
+def _get_parameters_key(params, names):
+
+    def get_key(value):
+        if isinstance(value, str) or value is None:
+            return value
+        if puw.is_quantity(value):
+            value, unit = puw.get_value_and_unit(puw.standardize(value))
+            return (get_key(value), str(unit))
+        if isinstance(value, np.ndarray):
+            return (value.dtype.str, value.shape, value.tobytes())
+        if isinstance(value, (list, tuple)):
+            return tuple(get_key(item) for item in value)
+        return value
+
+    return tuple(get_key(params[name]) for name in names)
@@ -1,13 +1,22 @@
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import molsysmt as msm
 from scipy.spatial.distance import pdist, squareform
-from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.cluster.hierarchy import linkage, fcluster, maxdists, leaves_list
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 from topomt import Topography
 from topomt.alpha_spheres import AlphaSpheres
 from topomt import pyunitwizard as puw
 from topomt._private.digestion import digest
+from topomt.alpha_spheres._chemistry import _get_hydropathy
+from ._pockets import _add_pockets_to_topography, _get_pockets_from_labels
+from .profiler import _get_profiler, _null_profiler
+from topomt._private.edges_list import components_from_labels
+from .pocket_dendrogram import PocketDendrogram
 
 
 _LINKAGE_MAP = {
@@ -25,6 +34,12 @@ _METRIC_MAP = {
     # si se pasan, caemos a 'euclidean' con aviso.
 }
 
+# Métricas de Minkowski (orden p) que admite el KD-tree para clusterizar sin pdist
+_SPARSE_METRICS = {
+    'euclidean': 2,
+    'cityblock': 1,
+}
+
 
 @digest()
 def fpocket4(
@@ -42,57 +57,189 @@ def fpocket4(
     # Filtros finales
     min_pock_nb_asph: int = 15,      # -i 15
     apolar_min_ratio: float | None = None,  # FP4 por defecto desactiva filtro (0.0 en help => keep all)
+    min_buriedness: int | None = None,  # átomos pesados mínimos alrededor del centro (None => sin filtro)
+    buriedness_radius: str = '8.0 angstroms',
     # Varios
     pbc: bool = False,
+    cache_dir: str | None = None,
+    output_type: str = 'indices',  # 'indices' | 'topography' | 'dendrogram'
+    n_workers: int | None = None,  # hilos para el enlace por componentes
+    profile: bool = False,
     syntax: str = 'MolSysMT',
     skip_digestion: bool = False,
 ):
     """
     FPocket4-like pipeline usando HAC:
       1) Genera alfa-esferas y filtra por radios [min_radius, max_radius].
-      2) Construye matriz de distancias entre centros de alfa-esferas (métrica -e).
+      2) Distancias entre centros de alfa-esferas (métrica -e).
       3) HAC con método de enlace -C; corta dendrograma a distancia clust_cut_dist (-D).
+         Con métrica euclídea o cityblock no se construye la matriz de distancias completa: las
+         esferas se separan en componentes conexas a distancia clust_cut_dist (KD-tree) y el
+         enlace se calcula en cada componente (en n_workers hilos), con el mismo resultado que
+         el dendrograma global. El centroide se comprueba y, si no hay garantía, usa pdist.
       4) Filtra bolsillos por tamaño mínimo (>= min_pock_nb_asph) y, opcionalmente, por fracción apolar.
-    Devuelve: lista de listas de índices de alfa-esferas por pocket.
+    Devuelve: lista de listas de índices de alfa-esferas por pocket (output_type='indices'), o la
+    Topography del sistema con un Pocket por bolsillo, con sus descriptores y puntuaciones
+    (output_type='topography'), o un PocketDendrogram con el dendrograma completo
+    (output_type='dendrogram'), que se corta después a cualquier clust_cut_dist con .cut() sin
+    recalcular esferas ni distancias; necesita la matriz de distancias completa.
+    Los bolsillos se ordenan por su menor índice de alfa-esfera, con los índices de cada uno en
+    orden creciente, con cualquier método de enlace y también en PocketDendrogram.cut. Versiones
+    anteriores los ordenaban por la etiqueta de fcluster, así que los identificadores de los
+    bolsillos de un mismo corte pueden cambiar de orden respecto a ellas.
+    Con profile=True devuelve (resultado, informe) con tiempo, memoria y contadores por etapa.
     """
-    # --- Selección y limpieza básica (sin aguas/iones/small, sin H) ---
-    topo = Topography(molecular_system=molecular_system, structure_indices=structure_indices)
-    molsys = topo._molsys
-
-    atom_indices = msm.select(molecular_system=molsys, selection=selection, syntax=syntax)
-    remove_idx = msm.select(
-        molecular_system=molsys,
-        selection="group_type in ['water', 'ion', 'small molecule']",
-        mask=atom_indices, syntax='MolSysMT',
-    )
-    if len(remove_idx) > 0:
-        atom_indices = list(set(atom_indices) - set(remove_idx))
-
-    atom_indices = msm.select(
-        molecular_system=molsys,
-        selection='atom_type not in ["H"]',
-        mask=atom_indices, syntax='MolSysMT',
-    )
-
-    coords = msm.get(
-        molecular_system=molsys,
-        selection=atom_indices,
-        structure_indices=structure_indices,
-        coordinates=True,
-    )[0]
-
-    # --- Alfa-esferas + filtros de radio ---
-    alpha = AlphaSpheres(points=coords, radii=None)
-    alpha.remove_small_alpha_spheres(min_radius)
-    alpha.remove_big_alpha_spheres(max_radius)
-
-    n_as = alpha.centers.shape[0]
+    with _get_profiler(profile) as profiler:
+
+        with profiler.stage('fpocket4.selection'):
+            # --- Selección y limpieza básica (sin aguas/iones/small, sin H) ---
+            topo = Topography(molecular_system=molecular_system, structure_indices=structure_indices)
+            molsys = topo._molsys
+
+            atom_indices = msm.select(molecular_system=molsys, selection=selection, syntax=syntax)
+            remove_idx = msm.select(
+                molecular_system=molsys,
+                selection="group_type in ['water', 'ion', 'small molecule']",
+                mask=atom_indices, syntax='MolSysMT',
+            )
+            if len(remove_idx) > 0:
+                atom_indices = list(set(atom_indices) - set(remove_idx))
+
+            atom_indices = msm.select(
+                molecular_system=molsys,
+                selection='atom_type not in ["H"]',
+                mask=atom_indices, syntax='MolSysMT',
+            )
+
+            coords = msm.get(
+                molecular_system=molsys,
+                selection=atom_indices,
+                structure_indices=structure_indices,
+                coordinates=True,
+            )[0]
+            profiler.count(n_atoms=len(atom_indices))
+
+        with profiler.stage('fpocket4.alpha_spheres'):
+            # --- Celda periódica (imágenes cerca de las caras, distancias con mínima imagen) ---
+            box = None
+            if pbc:
+                box = msm.get(molecular_system=molsys, element='system', structure_indices=structure_indices,
+                              box=True)
+                if box is None:
+                    warnings.warn("pbc=True pero el sistema no tiene caja; se ignora la periodicidad.")
+                else:
+                    box = box[0]
+
+            # --- Alfa-esferas filtradas por radio durante la construcción ---
+            if cache_dir is None:
+                alpha = AlphaSpheres(points=coords, radii=None, min_radius=min_radius, max_radius=max_radius,
+                                     box=box)
+            else:
+                # reutiliza (mapeadas en memoria) las esferas ya calculadas para las mismas coordenadas
+                alpha = AlphaSpheres.from_cache(cache_dir, coords, selection=selection, min_radius=min_radius,
+                                                max_radius=max_radius, box=box)
+            profiler.count(n_points=alpha.n_points, n_alpha_spheres=alpha.n_alpha_spheres)
+
+        # tipado químico (polar/apolar) de las esferas a partir de los elementos de los átomos
+        alpha.set_point_elements(msm.get(molecular_system=molsys, element='atom', selection=atom_indices,
+                                         atom_type=True))
+
+        # descarta esferas expuestas (pocos átomos alrededor) antes del clustering
+        if min_buriedness is not None:
+            with profiler.stage('fpocket4.buriedness'):
+                buriedness = alpha.get_buriedness(buriedness_radius)
+                exposed = np.nonzero(buriedness < min_buriedness)[0]
+                alpha.remove_alpha_spheres(exposed)
+                profiler.count(n_removed=exposed.shape[0], n_alpha_spheres=alpha.n_alpha_spheres)
+
+        if output_type == 'dendrogram':
+            # dendrograma completo, para cortarlo luego a cualquier distancia sin recalcular nada
+            link, metric, boxsize = _get_linkage_settings(alpha, linkage_method, distance_metric)
+            Z = np.zeros((0, 4))
+            if alpha.n_alpha_spheres > 1:
+                Z = _get_linkage_matrix(alpha, link, metric, boxsize, profiler=profiler)
+            result = PocketDendrogram(alpha, Z, linkage_method=link, distance_metric=metric)
+        else:
+            pockets = _fpocket4_clustering(alpha, clust_cut_dist, linkage_method, distance_metric, min_pock_nb_asph,
+                                           apolar_min_ratio, n_workers=n_workers, profiler=profiler)
+            result = pockets
+
+        if output_type == 'topography':
+            with profiler.stage('fpocket4.topography'):
+                # hidropatía del residuo de cada átomo para la hidrofobicidad y la druggability heurística
+                group_names = msm.get(molecular_system=topo._molsys, element='atom', selection=atom_indices,
+                                      group_name=True)
+                _add_pockets_to_topography(topo, alpha, pockets, atom_indices,
+                                           point_hydropathy=_get_hydropathy(group_names),
+                                           buriedness_radius=buriedness_radius)
+            result = topo
+
+    if profile:
+        return result, profiler.report
+
+    return result
+
+
+def _fpocket4_clustering(alpha, clust_cut_dist, linkage_method, distance_metric, min_pock_nb_asph,
+                         apolar_min_ratio, n_workers=None, profiler=_null_profiler):
+
+    # Clustering jerárquico de las alfa-esferas ya filtradas y filtros finales de los bolsillos
+
+    n_as = alpha.n_alpha_spheres
     if n_as == 0:
         return []
     if n_as == 1:
-        return [[]] if min_pock_nb_asph <= 1 else []
+        # una sola esfera es un cluster de tamaño 1, con los mismos filtros finales que el resto
+        return _get_pockets_from_labels(alpha, np.zeros(1, dtype=np.int64), min_pock_nb_asph, apolar_min_ratio)
 
     # --- Métrica y método de enlace ---
+    link, metric, boxsize = _get_linkage_settings(alpha, linkage_method, distance_metric)
+
+    # --- Distancias y corte en unidades coherentes ---
+    centers_vals, centers_unit = alpha._centers, alpha.length_unit
+    cut_val = puw.get_value(clust_cut_dist, to_unit=centers_unit)
+
+    labels = None
+
+    # Sin matriz de distancias completa: componentes conexas de los pares a distancia <= cut_val
+    # (el centroide en una caja periódica no tiene esta garantía y va siempre por pdist)
+    if metric in _SPARSE_METRICS and not (link == 'centroid' and alpha._box is not None):
+
+        with profiler.stage('fpocket4.distances', n_alpha_spheres=n_as):
+            components = _get_cut_components(centers_vals, cut_val, metric, boxsize)
+            profiler.count(n_components=int(components.max()) + 1)
+
+        with profiler.stage('fpocket4.linkage', method=link):
+            if link == 'single':
+                # Enlace simple: cortar el dendrograma a cut_val es tomar las propias componentes
+                labels = components
+            else:
+                # Ningún cluster por debajo del corte cruza dos componentes: enlace exacto en cada una
+                labels = _get_partitioned_linkage_labels(centers_vals, components, cut_val, link, metric,
+                                                         boxsize, n_workers=n_workers)
+            if labels is not None:
+                profiler.count(n_clusters=int(labels.max()) + 1)
+
+    if labels is None:
+
+        # --- Clustering jerárquico y corte por distancia ---
+        Z = _get_linkage_matrix(alpha, link, metric, boxsize, profiler=profiler)
+        # criterion='distance' => umbral directo en la misma unidad que D (centers_unit)
+        labels = fcluster(Z, t=cut_val, criterion='distance')
+        profiler.count(n_clusters=int(labels.max()))
+
+    with profiler.stage('fpocket4.filter'):
+        pockets = _get_pockets_from_labels(alpha, labels, min_pock_nb_asph, apolar_min_ratio)
+        profiler.count(n_pockets=len(pockets))
+
+    return pockets
+
+
+def _get_linkage_settings(alpha, linkage_method, distance_metric):
+
+    # Método de enlace y métrica de SciPy a partir de los códigos de fpocket4, y caja ortorrómbica
+    # para la mínima imagen (None si no hay caja o no es ortorrómbica)
+
     link = _LINKAGE_MAP.get(linkage_method.lower(), None)
     if link is None:
         warnings.warn(f"linkage_method '{linkage_method}' no reconocido; usando 'single'.")
@@ -103,51 +250,159 @@ def fpocket4(
         warnings.warn(f"distance_metric '{distance_metric}' no apropiada para coords 3D; usando 'euclidean'.")
         metric = 'euclidean'
 
-    # --- Distancias y corte en unidades coherentes ---
-    centers_vals, centers_unit = puw.get_value_and_unit(alpha.centers)
-    cut_val = puw.get_value(clust_cut_dist, to_unit=centers_unit)
-
-    # pdist exige ndarray float (sin unidades)
-    D = pdist(centers_vals, metric=metric)
-
     # SciPy: 'centroid' requiere euclidiana; avisamos si no cuadra
     if link == 'centroid' and metric != 'euclidean':
         warnings.warn("Centroid linkage requiere distancia euclídea; forzando 'euclidean'.")
-        D = pdist(centers_vals, metric='euclidean')
-
-    # --- Clustering jerárquico y corte por distancia ---
-    Z = linkage(D, method=link)
-    # criterion='distance' => umbral directo en la misma unidad que D (centers_unit)
-    labels = fcluster(Z, t=cut_val, criterion='distance')
-
-    # Agrupar índices por etiqueta
-    pockets = []
-    for lab in np.unique(labels):
-        comp = np.where(labels == lab)[0].tolist()
-        pockets.append(comp)
-
-    # --- Filtro tamaño mínimo ---
-    pockets = [p for p in pockets if len(p) >= min_pock_nb_asph]
-
-    # --- Filtro apolar opcional (desactivado por defecto) ---
-    if apolar_min_ratio is not None:
-        ap_mask = getattr(alpha, 'is_apolar', None)
-        types = getattr(alpha, 'types', None) if ap_mask is None else None
-        out = []
-        if ap_mask is None and types is None:
-            warnings.warn("AlphaSpheres no expone tipado apolar; se omite filtro apolar.")
-            return pockets
-        for comp in pockets:
-            if len(comp) == 0:
-                continue
-            if ap_mask is not None:
-                nap = int(np.sum(ap_mask[np.array(comp, int)]))
-            else:
-                # Ajusta si tu codificación de 'types' marca apolar de otra forma
-                nap = int(np.sum((types[np.array(comp, int)] == 1)))
-            if (nap / len(comp)) >= apolar_min_ratio:
-                out.append(comp)
-        pockets = out
+        metric = 'euclidean'
 
-    return pockets
+    boxsize = alpha._get_boxsize()
+    if alpha._box is not None and (boxsize is None or metric not in _SPARSE_METRICS):
+        warnings.warn(f"Mínima imagen solo para cajas ortorrómbicas y métricas euclidean/cityblock; "
+                      f"distancias '{metric}' sin periodicidad.")
+
+    return link, metric, boxsize
+
+
+def _get_linkage_matrix(alpha, link, metric, boxsize, profiler=_null_profiler):
+
+    # Dendrograma global con la matriz de distancias completa
+
+    with profiler.stage('fpocket4.distances', n_alpha_spheres=alpha.n_alpha_spheres):
+        # pdist exige ndarray float (sin unidades)
+        D = _get_pdist(alpha._centers, metric, boxsize)
+        profiler.count(n_pairs=D.shape[0])
+
+    with profiler.stage('fpocket4.linkage', method=link):
+        Z = linkage(D, method=link)
+
+    return Z
+
+
+def _get_cut_components(centers, cut_val, metric, boxsize=None):
+
+    # Componentes conexas del grafo de pares de centros a distancia <= cut_val, buscados con un
+    # KD-tree (periódico en cajas ortorrómbicas)
+
+    n_centers = centers.shape[0]
+
+    if boxsize is None:
+        tree = cKDTree(centers)
+    else:
+        tree = cKDTree(np.mod(centers, boxsize), boxsize=boxsize)
+    pairs = tree.query_pairs(r=cut_val, p=_SPARSE_METRICS[metric], output_type='ndarray')
+
+    graph = coo_matrix((np.ones(pairs.shape[0], dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+                       shape=(n_centers, n_centers))
+    _, labels = connected_components(graph, directed=False)
+
+    return labels
+
+
+def _get_partitioned_linkage_labels(centers, components, cut_val, link, metric, boxsize=None, n_workers=None):
+
+    # Enlace completo, medio o del centroide cortado a cut_val, componente a componente.
+    # Completo y medio: la distancia entre dos clusters de componentes distintas es al menos la
+    # menor distancia entre sus esferas, > cut_val, así que nunca se unen por debajo del corte y el
+    # resultado es el del dendrograma global. Centroide: dos centroides pueden quedar más cerca que
+    # cualquier par de sus esferas; se comprueba a posteriori, con los centroides de todos los nodos
+    # de cada componente, y se devuelve None si no hay garantía.
+
+    members = components_from_labels(components, min_size=3)
+
+    def cluster_component(indices):
+        Z = linkage(_get_pdist(centers[indices], metric, boxsize), method=link)
+        return fcluster(Z, t=cut_val, criterion='distance'), Z
+
+    if n_workers is None or n_workers == 1 or len(members) < 2:
+        results = [cluster_component(indices) for indices in members]
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(cluster_component, members))
+
+    # etiquetas globales: las componentes de una o dos esferas (a distancia <= cut_val) son un
+    # cluster cada una, con la etiqueta de la componente; el resto, con su propio rango
+    labels = components.copy()
+    offset = components.max() + 1
+    for indices, (sub_labels, _) in zip(members, results):
+        labels[indices] = sub_labels + offset
+        offset += sub_labels.max() + 1
+
+    if link == 'centroid':
+        # esferas de las componentes pequeñas, centroides de las de dos esferas y de todos los nodos
+        # de las demás
+        component_sizes = np.bincount(components)
+        small = np.nonzero(component_sizes[components] < 3)[0]
+        pairs = np.nonzero(component_sizes == 2)[0]
+        pair_centers = np.zeros((component_sizes.shape[0], 3))
+        np.add.at(pair_centers, components[small], centers[small])
+        node_centers = [centers[small], pair_centers[pairs] / 2.0]
+        node_components = [components[small], pairs]
+        for indices, (_, Z) in zip(members, results):
+            node_centers.append(_get_node_centroids(centers[indices], Z))
+            node_components.append(np.full(node_centers[-1].shape[0], components[indices[0]]))
+        if not _are_centroids_separated(np.concatenate(node_centers), np.concatenate(node_components), cut_val):
+            return None
+
+    return labels
+
+
+def _get_node_centroids(points, Z):
+
+    # Centroides de las esferas y de todos los clusters del dendrograma, también los unidos por
+    # encima del corte: el enlace del centroide no es monótono y un cluster unido por encima del
+    # corte puede quedar a menos de cut_val de un cluster de otra componente.
+    # Las hojas de cada nodo son contiguas en el orden de leaves_list y empiezan en su hoja más a la
+    # izquierda (la de Z[:, 0] repetidamente): cada centroide es una diferencia de sumas acumuladas
+
+    n_points = points.shape[0]
+    sizes = np.concatenate([np.ones(n_points, dtype=np.int64), Z[:, 3].astype(np.int64)])
+
+    # hoja más a la izquierda de cada nodo, por saltos de puntero
+    leftmost = np.concatenate([np.arange(n_points), Z[:, 0].astype(np.int64)])
+    while np.any(leftmost >= n_points):
+        leftmost = leftmost[leftmost]
+
+    order = leaves_list(Z)
+    position = np.empty(n_points, dtype=np.int64)
+    position[order] = np.arange(n_points)
+    starts = position[leftmost]
+
+    # sumas respecto al centro de las esferas, para no perder precisión
+    origin = points.mean(axis=0)
+    sums = np.concatenate([np.zeros((1, 3)), np.cumsum(points[order] - origin, axis=0)])
+
+    return (sums[starts + sizes] - sums[starts]) / sizes[:, np.newaxis] + origin
+
+
+def _are_centroids_separated(centroids, centroid_components, cut_val):
+
+    # Ningún par de clusters de componentes distintas a distancia <= cut_val: el enlace global nunca
+    # los une por debajo del corte y coincide con el de cada componente
+
+    pairs = cKDTree(centroids).query_pairs(r=cut_val, output_type='ndarray')
+
+    return not np.any(centroid_components[pairs[:, 0]] != centroid_components[pairs[:, 1]])
+
+
+def _get_pdist(points, metric, boxsize=None):
+
+    # Distancias condensadas, con mínima imagen si hay caja ortorrómbica y la métrica lo admite
+
+    if boxsize is not None and metric in _SPARSE_METRICS:
+        return _get_periodic_pdist(points, boxsize, metric)
+
+    return pdist(points, metric=metric)
+
+
+def _get_periodic_pdist(points, boxsize, metric):
+
+    # Distancias condensadas con mínima imagen en una caja ortorrómbica, eje a eje
+    # (cada término es la distancia 1D periódica, así que no hace falta la matriz de diferencias)
+
+    D = np.zeros(points.shape[0] * (points.shape[0] - 1) // 2)
+    for axis in range(3):
+        delta = np.mod(pdist(points[:, [axis]], metric='cityblock'), boxsize[axis])
+        delta = np.minimum(delta, boxsize[axis] - delta)
+        D += delta**2 if metric == 'euclidean' else delta
 
+    return np.sqrt(D) if metric == 'euclidean' else D
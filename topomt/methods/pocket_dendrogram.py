@@ -0,0 +1,126 @@
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, maxdists
+
+from ._pockets import _get_pockets_from_labels
+
+
+class PocketDendrogram():
+
+    """Dendrogram of the alpha-spheres of fpocket4, to be cut at any distance
+
+    Returned by `fpocket4` with `output_type='dendrogram'`. It keeps the linkage matrix of the
+    alpha-spheres and the set of alpha-spheres itself, so the pockets of any `clust_cut_dist` are
+    obtained without computing again the alpha-spheres, the distances or the linkage.
+
+    Attributes
+    ----------
+    alpha_spheres : AlphaSpheres
+        Set of alpha-spheres clustered, after the filters of fpocket4.
+    Z : numpy.ndarray (shape=[n_alpha_spheres-1, 4], dtype=float)
+        Linkage matrix, as returned by `scipy.cluster.hierarchy.linkage`, with the distances in
+        the length unit of `alpha_spheres`.
+    linkage_method : str
+        Linkage method ('single', 'complete', 'average' or 'centroid').
+    distance_metric : str
+        Distance metric ('euclidean', 'cityblock' or 'correlation').
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import topomt as tmt
+    >>> from topomt import pyunitwizard as puw
+    >>> dendrogram = tmt.methods.fpocket4(molsys, output_type='dendrogram')
+    >>> pockets = dendrogram.cut(puw.quantity(3.0, 'angstroms'), min_pock_nb_asph=15)
+    >>> n_pockets = dendrogram.get_pocket_counts(puw.quantity(np.arange(1.0, 6.0, 0.5), 'angstroms'))
+
+    """
+
+    def __init__(self, alpha_spheres, Z, linkage_method='single', distance_metric='euclidean'):
+
+        self.alpha_spheres = alpha_spheres
+        self.Z = Z
+        self.linkage_method = linkage_method
+        self.distance_metric = distance_metric
+
+    @property
+    def n_alpha_spheres(self):
+        return self.alpha_spheres.n_alpha_spheres
+
+    @property
+    def length_unit(self):
+        return self.alpha_spheres.length_unit
+
+    def cut(self, clust_cut_dist, min_pock_nb_asph=15, apolar_min_ratio=None):
+
+        """Pockets of the dendrogram cut at a distance
+
+        Parameters
+        ----------
+        clust_cut_dist : quantity
+            Distance at which the dendrogram is cut.
+        min_pock_nb_asph : int, default 15
+            Minimum number of alpha-spheres of a pocket.
+        apolar_min_ratio : float, default None
+            Minimum fraction of apolar alpha-spheres of a pocket. If None, no filter.
+
+        Returns
+        -------
+        list of lists of int
+            Indices of the alpha-spheres of every pocket, as returned by `fpocket4`.
+
+        """
+
+        if self.n_alpha_spheres == 0:
+            return []
+
+        if self.n_alpha_spheres == 1:
+            labels = np.zeros(1, dtype=np.int64)
+        else:
+            cut_val = self.alpha_spheres._get_value(clust_cut_dist)
+            labels = fcluster(self.Z, t=cut_val, criterion='distance')
+
+        return _get_pockets_from_labels(self.alpha_spheres, labels, min_pock_nb_asph, apolar_min_ratio)
+
+    def get_pocket_counts(self, clust_cut_dists, min_pock_nb_asph=15):
+
+        """Number of pockets of the dendrogram cut at several distances
+
+        Parameters
+        ----------
+        clust_cut_dists : quantity (shape=[n_distances])
+            Distances at which the dendrogram is cut.
+        min_pock_nb_asph : int, default 15
+            Minimum number of alpha-spheres of a pocket.
+
+        Returns
+        -------
+        numpy.ndarray (shape=[n_distances], dtype=int)
+            Number of pockets at every distance.
+
+        Notes
+        -----
+        All the distances are evaluated in one pass over the linkage matrix: every merge replaces
+        its two clusters with the merged one, so the number of clusters with at least
+        `min_pock_nb_asph` alpha-spheres after the merges below a cut is a cumulative sum. As
+        `fcluster`, a merge is below the cut when all the merges of its subtree are, which also
+        holds for non-monotonic dendrograms (centroid linkage).
+
+        """
+
+        cut_vals = np.atleast_1d(self.alpha_spheres._get_value(clust_cut_dists))
+        n_alpha_spheres = self.n_alpha_spheres
+        n_big_leaves = n_alpha_spheres if min_pock_nb_asph <= 1 else 0
+
+        if n_alpha_spheres < 2:
+            return np.full(cut_vals.shape[0], n_big_leaves, dtype=np.int64)
+
+        sizes = np.concatenate([np.ones(n_alpha_spheres), self.Z[:, 3]])
+        children = self.Z[:, :2].astype(np.int64)
+        is_big = sizes >= min_pock_nb_asph
+        delta = is_big[n_alpha_spheres:].astype(np.int64) - is_big[children].sum(axis=1)
+
+        heights = maxdists(self.Z)
+        order = np.argsort(heights, kind='stable')
+        counts = np.concatenate([[n_big_leaves], n_big_leaves + np.cumsum(delta[order])])
+
+        return counts[np.searchsorted(heights[order], cut_vals, side='right')]
@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import time
+import tracemalloc
+
+_active_profiler = ContextVar('topomt_active_profiler', default=None)
+
+
+class Profiler():
+
+    """Wall time, peak memory and counters of the stages of the pocket pipelines
+
+    Used as a context manager, every pipeline run inside the block records its stages in the
+    profiler. The pipelines also accept `profile=True` to get the report of a single run. The
+    report is emitted at INFO level through the 'pocketmt' logger when the block or the run ends.
+
+    Attributes
+    ----------
+    stages : list of dict
+        One record per stage, in execution order, with the keys 'name', 'wall_time' (seconds),
+        'peak_memory' (bytes allocated on top of the memory in use when the stage started, as
+        traced by tracemalloc) and 'counters'.
+
+    Examples
+    --------
+    >>> import topomt as tmt
+    >>> with tmt.methods.Profiler() as profiler:
+    ...     pockets = tmt.methods.fpocket2(molsys)
+    >>> profiler.report['stages'][0]['name']
+    'fpocket2.selection'
+
+    Notes
+    -----
+    Stages are not nested: a stage started inside another one resets the peak memory of the
+    outer stage.
+
+    """
+
+    def __init__(self, logger_name='pocketmt'):
+
+        self.stages = []
+        self.logger_name = logger_name
+        self._token = None
+        self._stop_tracing = False
+
+    def __enter__(self):
+
+        self._start_tracing()
+        self._token = _active_profiler.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        _active_profiler.reset(self._token)
+        self._token = None
+        self._stop()
+        if exc_type is None:
+            self.log()
+        return False
+
+    def _start_tracing(self):
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._stop_tracing = True
+
+    def _stop(self):
+
+        if self._stop_tracing:
+            tracemalloc.stop()
+            self._stop_tracing = False
+
+    @contextmanager
+    def stage(self, name, **counters):
+
+        """Record a stage of a pipeline
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+        **counters
+            Initial counters of the stage. More can be added with `count`.
+
+        """
+
+        record = {'name': name, 'wall_time': None, 'peak_memory': None, 'counters': dict(counters)}
+        self.stages.append(record)
+
+        memory_start = 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        time_start = time.perf_counter()
+
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - time_start
+            if tracemalloc.is_tracing():
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1] - memory_start
+
+    def count(self, **counters):
+
+        """Add counters to the last stage recorded"""
+
+        if self.stages:
+            self.stages[-1]['counters'].update(counters)
+
+    @property
+    def report(self):
+
+        return {
+            'stages': self.stages,
+            'wall_time': sum(record['wall_time'] or 0.0 for record in self.stages),
+            'peak_memory': max([record['peak_memory'] or 0 for record in self.stages], default=0),
+        }
+
+    def log(self):
+
+        """Emit the report through the logger, one line per stage"""
+
+        logger = logging.getLogger(self.logger_name)
+
+        for record in self.stages:
+            counters = ' '.join(f'{key}={value}' for key, value in record['counters'].items())
+            peak_memory = record['peak_memory']
+            peak_memory = 'n/a' if peak_memory is None else f'{peak_memory/2**20:.1f} MiB'
+            logger.info(f"{record['name']}: {record['wall_time']:.4f} s, peak {peak_memory} {counters}".rstrip())
+
+
+class _NullProfiler():
+
+    # Same interface as Profiler, recording nothing, when profiling is off
+
+    @contextmanager
+    def stage(self, name, **counters):
+        yield {'name': name, 'counters': dict(counters)}
+
+    def count(self, **counters):
+        pass
+
+
+_null_profiler = _NullProfiler()
+
+
+@contextmanager
+def _get_profiler(profile=False):
+
+    # Profiler of a pipeline run: the one of the enclosing `with Profiler()` block, a new one for
+    # profile=True (logged when the run ends), or one recording nothing
+
+    active = _active_profiler.get()
+
+    if active is not None:
+        yield active
+    elif profile:
+        with Profiler() as profiler:
+            yield profiler
+    else:
+        yield _null_profiler